@@ -0,0 +1,48 @@
+# data/async_adapter.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+# Shared pool for adapters that don't bring their own
+_default_executor: Optional[ThreadPoolExecutor] = None
+
+def get_default_executor() -> ThreadPoolExecutor:
+    """Get the process-wide thread pool used for blocking backend calls"""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="backend")
+    return _default_executor
+
+class ThreadPoolBackendAdapter:
+    """Async facade over a data backend
+    
+    Calling `aget_order`, `asearch_faqs`, ... uses the backend's native async
+    method when it has one, otherwise runs the blocking method of the same name
+    (`get_order`, `search_faqs`, ...) in a thread pool so the event loop stays free.
+    Any other attribute is passed straight through to the backend.
+    """
+    
+    def __init__(self, backend: Any, executor: Optional[ThreadPoolExecutor] = None):
+        self.backend = backend
+        self.executor = executor or get_default_executor()
+    
+    def __getattr__(self, name: str) -> Any:
+        backend = self.__dict__["backend"]
+        
+        native = getattr(backend, name, None)
+        if native is not None:
+            has_blocking_twin = name.startswith("a") and callable(getattr(backend, name[1:], None))
+            if asyncio.iscoroutinefunction(native) or not has_blocking_twin:
+                return native
+        
+        blocking = getattr(backend, name[1:], None) if name.startswith("a") else None
+        if blocking is None or not callable(blocking):
+            raise AttributeError(f"{type(backend).__name__} has no method '{name}' or '{name[1:]}'")
+        
+        async def run_in_pool(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(blocking, *args, **kwargs))
+        
+        run_in_pool.__name__ = name
+        return run_in_pool
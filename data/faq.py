@@ -1,13 +1,172 @@
 # data/faq.py
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import heapq
 import re
+import threading
+
+from faq_index import BM25Index
+from faq_semantic import SemanticFAQIndex
+from faq_vectors import FAQVectorIndex
+from keyword_matcher import KeywordMatcher
+from text_utils import tokenize, canonicalize_query
+
+def render_answer(question: str, answer: str, related_questions: Iterable[str] = ()) -> str:
+    """Markdown for an FAQ answer followed by any related questions"""
+    rendered = f"**{question}**\n\n{answer}"
+    related_questions = list(related_questions)
+    if related_questions:
+        rendered += "\n\n**Related Questions:**"
+        for i, related_question in enumerate(related_questions, 1):
+            rendered += f"\n{i}. {related_question}"
+    return rendered
+
+class FAQSnapshot:
+    """One version of the FAQ corpus together with every index built over it
+    
+    Searches read a single snapshot, so a reload swapping in a new one never
+    exposes a half-updated corpus.
+    """
+    
+    def __init__(self, faqs: Dict[str, Dict], keywords_map: Dict[str, List[str]], keyword_matcher: KeywordMatcher,
+                 index: BM25Index, semantic_index: SemanticFAQIndex, version: int):
+        self.faqs = faqs
+        self.keywords_map = keywords_map
+        self.keyword_matcher = keyword_matcher
+        self.index = index
+        self.semantic_index = semantic_index
+        self.version = version
+        self._vector_index = None
+        
+        # Rendered answers keyed by (faq_id, *related_ids); single answers are rendered up front
+        self.rendered_answers: Dict[Tuple[str, ...], str] = {}
+    
+    def vector_index(self) -> FAQVectorIndex:
+        """Batch scoring matrix, built on first use"""
+        if self._vector_index is None:
+            self._vector_index = FAQVectorIndex.build(self.index, self.keywords_map, self.keyword_matcher,
+                                                      self.semantic_index)
+        return self._vector_index
+    
+    def render_answer(self, faq_id: str, related_ids: Tuple[str, ...] = ()) -> str:
+        """Markdown answer for an FAQ with related questions, rendered once per ID tuple"""
+        key = (faq_id, *related_ids)
+        rendered = self.rendered_answers.get(key)
+        if rendered is None:
+            rendered = render_answer(self.faqs[faq_id]["question"], self.faqs[faq_id]["answer"],
+                                     (self.faqs[related_id]["question"] for related_id in related_ids))
+            self.rendered_answers[key] = rendered
+        return rendered
 
 class FAQDatabase:
     """Mock FAQ database with semantic search simulation"""
     
-    def __init__(self):
-        self.faqs = self._load_faqs()
-        self.keywords_map = self._build_keywords_map()
+    # Runner-up results scoring above this fraction of the best are shown as related questions
+    RELATED_SCORE_RATIO = 0.7
+    
+    def __init__(self, source=None):
+        # Optional FAQFileSource / FAQRedisSource; without one the built-in corpus is used
+        self.source = source
+        self._reload_lock = threading.Lock()
+        self._snapshot = self._build_snapshot(self._read_corpus(), version=1)
+    
+    @property
+    def faqs(self) -> Dict[str, Dict]:
+        """Current FAQ corpus"""
+        return self._snapshot.faqs
+    
+    @property
+    def keywords_map(self) -> Dict[str, List[str]]:
+        """Keyword to FAQ IDs map for the current corpus"""
+        return self._snapshot.keywords_map
+    
+    @property
+    def keyword_matcher(self) -> KeywordMatcher:
+        """Keyword automaton for the current corpus"""
+        return self._snapshot.keyword_matcher
+    
+    @property
+    def index(self) -> BM25Index:
+        """BM25 index over the current corpus"""
+        return self._snapshot.index
+    
+    @property
+    def semantic_index(self) -> SemanticFAQIndex:
+        """Semantic index over the current corpus"""
+        return self._snapshot.semantic_index
+    
+    @property
+    def version(self) -> int:
+        """Current corpus version (bumped by every reload that changes something)"""
+        return self._snapshot.version
+    
+    def _read_corpus(self) -> Dict[str, Dict]:
+        """Read the corpus from the configured source"""
+        return self.source.load() if self.source else self._load_faqs()
+    
+    def _build_snapshot(self, faqs: Dict[str, Dict], version: int, previous: Optional[FAQSnapshot] = None,
+                        changed: Iterable[str] = ()) -> FAQSnapshot:
+        """Build indexes for a corpus, re-indexing only the changed entries when a previous snapshot is given"""
+        keywords_map = self._build_keywords_map(faqs)
+        
+        if previous is None:
+            index = BM25Index.build(faqs)
+            semantic_index = SemanticFAQIndex.build(faqs)
+        else:
+            index = previous.index.copy()
+            for faq_id in changed:
+                if faq_id in faqs:
+                    index.add_document(faq_id, faqs[faq_id])
+                else:
+                    index.remove_document(faq_id)
+            semantic_index = SemanticFAQIndex.build(faqs, previous.semantic_index, changed)
+        
+        # The automaton only depends on the keyword vocabulary, which most edits leave unchanged
+        if previous is not None and keywords_map.keys() == previous.keywords_map.keys():
+            keyword_matcher = previous.keyword_matcher
+        else:
+            keyword_matcher = KeywordMatcher(keywords_map)
+        
+        snapshot = FAQSnapshot(faqs, keywords_map, keyword_matcher, index, semantic_index, version)
+        
+        # Carry over rendered answers that only mention unchanged FAQs, then render the rest
+        if previous is not None:
+            changed = set(changed)
+            snapshot.rendered_answers.update((key, rendered) for key, rendered in previous.rendered_answers.items()
+                                             if changed.isdisjoint(key))
+        for faq_id in faqs:
+            snapshot.render_answer(faq_id)
+        
+        return snapshot
+    
+    def set_source(self, source) -> None:
+        """Switch to a different corpus source (takes effect on the next reload)"""
+        self.source = source
+    
+    def reload(self, faqs: Optional[Dict[str, Dict]] = None) -> Dict[str, any]:
+        """Reload the corpus and swap in updated indexes
+        
+        Only added, updated and removed entries have their postings and vectors
+        rebuilt. Returns the changed FAQ IDs and the resulting corpus version.
+        """
+        with self._reload_lock:
+            new_faqs = faqs if faqs is not None else self._read_corpus()
+            current = self._snapshot
+            
+            added = [faq_id for faq_id in new_faqs if faq_id not in current.faqs]
+            updated = [faq_id for faq_id in new_faqs if faq_id in current.faqs and new_faqs[faq_id] != current.faqs[faq_id]]
+            removed = [faq_id for faq_id in current.faqs if faq_id not in new_faqs]
+            
+            if added or updated or removed:
+                self._snapshot = self._build_snapshot(new_faqs, current.version + 1, current, added + updated + removed)
+                print(f"🔄 FAQ corpus v{self._snapshot.version}: {len(added)} added, {len(updated)} updated, {len(removed)} removed")
+            
+            return {
+                "added": added,
+                "updated": updated,
+                "removed": removed,
+                "version": self._snapshot.version
+            }
         
     def _load_faqs(self) -> Dict[str, Dict]:
         """Load FAQ data"""
@@ -15,62 +174,72 @@ class FAQDatabase:
             "shipping_policy": {
                 "question": "What is your shipping policy?",
                 "answer": "We offer free standard shipping on orders over $50. Standard shipping takes 3-5 business days. Expedited shipping (1-2 days) is available for $9.99. International shipping is available to most countries.",
-                "keywords": ["shipping", "delivery", "free shipping", "expedited", "international", "how long"]
+                "keywords": ["shipping", "delivery", "free shipping", "expedited", "international", "how long"],
+                "examples": ["how long until my package arrives", "when will my stuff get here", "do you ship overseas", "cost to send to my house"]
             },
             "return_policy": {
                 "question": "What is your return policy?",
                 "answer": "We accept returns within 30 days of delivery. Items must be in original condition with tags attached. Return shipping is free for defective items. For other returns, return shipping costs $5.99.",
-                "keywords": ["return", "refund", "exchange", "30 days", "defective", "original condition"]
+                "keywords": ["return", "refund", "exchange", "30 days", "defective", "original condition"],
+                "examples": ["how do I send something back", "can I give an item back", "I want my money back", "bring back a purchase I don't like"]
             },
             "warranty": {
                 "question": "What warranty do you offer?",
                 "answer": "All electronics come with a 1-year manufacturer warranty. Extended warranties are available for purchase. Warranty covers manufacturing defects but not accidental damage.",
-                "keywords": ["warranty", "guarantee", "defect", "broken", "malfunction", "coverage"]
+                "keywords": ["warranty", "guarantee", "defect", "broken", "malfunction", "coverage", "stopped working", "not working"],
+                "examples": ["my device stopped working", "item arrived damaged and won't turn on", "is my gadget covered if it breaks"]
             },
             "payment_methods": {
                 "question": "What payment methods do you accept?",
                 "answer": "We accept all major credit cards (Visa, MasterCard, American Express), PayPal, Apple Pay, Google Pay, and Buy Now Pay Later options through Klarna and Afterpay.",
-                "keywords": ["payment", "credit card", "paypal", "apple pay", "google pay", "klarna", "afterpay", "buy now pay later"]
+                "keywords": ["payment", "credit card", "paypal", "apple pay", "google pay", "klarna", "afterpay", "buy now pay later"],
+                "examples": ["how can I pay", "can I pay in installments", "which cards can I use at checkout"]
             },
             "order_cancellation": {
                 "question": "Can I cancel my order?",
                 "answer": "You can cancel your order within 1 hour of placing it if it hasn't entered processing. After that, you'll need to wait for delivery and return the item following our return policy.",
-                "keywords": ["cancel", "cancellation", "cancel order", "stop order", "change order"]
+                "keywords": ["cancel", "cancellation", "cancel order", "stop order", "change order"],
+                "examples": ["I changed my mind about my purchase", "stop my purchase from going through", "undo my order"]
             },
             "track_order": {
                 "question": "How can I track my order?",
                 "answer": "Once your order ships, you'll receive a tracking number via email. You can track your package on our website or the carrier's website (FedEx, UPS, DHL, USPS).",
-                "keywords": ["track", "tracking", "where is my order", "tracking number", "shipment status"]
+                "keywords": ["track", "tracking", "where is my order", "tracking number", "shipment status"],
+                "examples": ["where is my package", "has my parcel shipped yet", "follow my delivery"]
             },
             "customer_support": {
                 "question": "How can I contact customer support?",
                 "answer": "You can reach our customer support team via email at support@example.com, phone at 1-800-SUPPORT (Mon-Fri 9AM-6PM EST), or live chat on our website 24/7.",
-                "keywords": ["contact", "support", "help", "phone", "email", "live chat", "customer service"]
+                "keywords": ["contact", "support", "help", "phone", "email", "live chat", "customer service"],
+                "examples": ["talk to a real person", "speak with an agent", "how do I reach you"]
             },
             "account_issues": {
                 "question": "I'm having trouble with my account",
                 "answer": "For account issues like password reset, login problems, or updating information, visit the 'My Account' section or contact support. You can reset your password using the 'Forgot Password' link.",
-                "keywords": ["account", "login", "password", "forgot password", "account issues", "profile", "sign in"]
+                "keywords": ["account", "login", "password", "forgot password", "account issues", "profile", "sign in"],
+                "examples": ["I can't log into my account", "locked out of my profile", "reset my login details"]
             },
             "product_availability": {
                 "question": "Is a product in stock?",
                 "answer": "Product availability is shown on each product page. If an item is out of stock, you can sign up for restock notifications. We typically restock popular items within 1-2 weeks.",
-                "keywords": ["stock", "availability", "out of stock", "restock", "inventory", "when available"]
+                "keywords": ["stock", "availability", "out of stock", "restock", "inventory", "when available"],
+                "examples": ["when will this be back", "is this item sold out", "notify me when available again"]
             },
             "bulk_orders": {
                 "question": "Do you offer bulk discounts?",
                 "answer": "Yes! We offer volume discounts for orders of 10+ units of the same item. Contact our sales team at sales@example.com for custom pricing on bulk orders.",
-                "keywords": ["bulk", "volume", "discount", "wholesale", "large order", "quantity discount"]
+                "keywords": ["bulk", "volume", "discount", "wholesale", "large order", "quantity discount"],
+                "examples": ["buying lots of units for my company", "price for buying many items", "business purchasing for a team"]
             }
         }
         
         return faqs
     
-    def _build_keywords_map(self) -> Dict[str, List[str]]:
+    def _build_keywords_map(self, faqs: Optional[Dict[str, Dict]] = None) -> Dict[str, List[str]]:
         """Build a map of keywords to FAQ IDs for quick searching"""
         keywords_map = {}
         
-        for faq_id, faq_data in self.faqs.items():
+        for faq_id, faq_data in (faqs if faqs is not None else self.faqs).items():
             for keyword in faq_data["keywords"]:
                 if keyword not in keywords_map:
                     keywords_map[keyword] = []
@@ -83,45 +252,91 @@ class FAQDatabase:
         import time
         time.sleep(0.2)  # Simulate search delay
         
+        return self._score_query(query)
+    
+    async def asearch_faqs(self, query: str) -> List[Tuple[str, Dict, float]]:
+        """Search FAQs without blocking the event loop"""
+        await asyncio.sleep(0.2)  # Simulate search delay
+        
+        return self._score_query(query)
+    
+    def search_faqs_batch(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[str, Dict, float]]]:
+        """Search FAQs for many queries at once (one result list per query)"""
+        import time
+        time.sleep(0.2)  # Simulate search delay (one round trip for the whole batch)
+        
+        snapshot = self._snapshot
+        return [[(faq_id, snapshot.faqs[faq_id], round(score, 4)) for faq_id, score in results]
+                for results in snapshot.vector_index().search_batch(queries, top_k)]
+    
+    def semantic_search(self, query: str, top_k: int = 5) -> List[Tuple[str, Dict, float]]:
+        """Find FAQs by meaning using local hashed n-gram vectors (no keyword overlap needed)"""
+        snapshot = self._snapshot
+        return [(faq_id, snapshot.faqs[faq_id], round(similarity, 4))
+                for faq_id, similarity in snapshot.semantic_index.search(query, top_k)]
+    
+    def cache_key(self, query: str) -> str:
+        """Key under which a query's search results can be shared with equivalent queries
+        
+        Results depend only on the query's stemmed content words (order does not
+        matter) and on which keyword phrases it contains, since phrase matching is
+        sensitive to word order and stopwords. Queries agreeing on both share a
+        key; a query with no content words falls back to its exact text.
+        """
+        canonical = canonicalize_query(query)
+        if not canonical:
+            return "exact:" + query.lower().strip()
+        
+        phrases = sorted(self._snapshot.keyword_matcher.find_all(query.lower()))
+        return canonical + ("|" + ",".join(phrases) if phrases else "")
+    
+    def render_search_results(self, results: List[Tuple[str, Dict, float]]) -> Optional[str]:
+        """Markdown for search results: the best answer, plus related questions when the runner-up is close"""
+        if not results:
+            return None
+        
+        faq_id, faq_data, score = results[0]
+        related = results[1:3] if len(results) > 1 and results[1][2] > score * self.RELATED_SCORE_RATIO else []
+        
+        snapshot = self._snapshot
+        if all(result[0] in snapshot.faqs for result in [results[0], *related]):
+            return snapshot.render_answer(faq_id, tuple(related_id for related_id, _, _ in related))
+        
+        # Results from before a reload that removed one of their FAQs
+        return render_answer(faq_data["question"], faq_data["answer"],
+                             (related_faq["question"] for _, related_faq, _ in related))
+    
+    def matches_any(self, query: str, faq_ids: Iterable[str]) -> bool:
+        """Whether any of the given FAQs appears in the results for a query"""
+        faq_ids = set(faq_ids)
+        return any(faq_id in faq_ids for faq_id, _, _ in self._score_query(query))
+    
+    def _score_query(self, query: str) -> List[Tuple[str, Dict, float]]:
+        """Score every FAQ against a query and return the top results"""
+        snapshot = self._snapshot
         query_lower = query.lower()
         scores = {}
         
-        # Score based on keyword matches
-        for keyword, faq_ids in self.keywords_map.items():
-            if keyword in query_lower:
-                for faq_id in faq_ids:
-                    if faq_id not in scores:
-                        scores[faq_id] = 0
-                    # Longer keyword matches get higher scores
-                    scores[faq_id] += len(keyword.split())
-        
-        # Score based on direct text matches in questions and answers
-        for faq_id, faq_data in self.faqs.items():
-            question_text = faq_data["question"].lower()
-            answer_text = faq_data["answer"].lower()
-            
-            # Check for exact phrase matches
-            if query_lower in question_text:
-                scores[faq_id] = scores.get(faq_id, 0) + 10
-            elif query_lower in answer_text:
-                scores[faq_id] = scores.get(faq_id, 0) + 5
-            
-            # Check for individual word matches
-            query_words = query_lower.split()
-            for word in query_words:
-                if len(word) > 2:  # Ignore short words
-                    if word in question_text:
-                        scores[faq_id] = scores.get(faq_id, 0) + 2
-                    elif word in answer_text:
-                        scores[faq_id] = scores.get(faq_id, 0) + 1
-        
-        # Sort by score and return top results
-        sorted_results = []
-        for faq_id, score in sorted(scores.items(), key=lambda x: x[1], reverse=True):
-            if score > 0:
-                sorted_results.append((faq_id, self.faqs[faq_id], score))
-        
-        return sorted_results[:5]  # Return top 5 results
+        # Score based on keyword matches, all found in one pass over the query
+        for keyword in snapshot.keyword_matcher.find_all(query_lower):
+            for faq_id in snapshot.keywords_map[keyword]:
+                # Longer keyword matches get higher scores
+                scores[faq_id] = scores.get(faq_id, 0) + len(keyword.split())
+        
+        # Score based on BM25 relevance over questions, answers and keywords
+        for faq_id, relevance in snapshot.index.score(tokenize(query)).items():
+            scores[faq_id] = scores.get(faq_id, 0) + relevance
+        
+        # Paraphrases with little word overlap still reach the FAQ they mean (only searched when lexical recall is weak)
+        if snapshot.semantic_index.needs_bonus(max(scores.values(), default=0.0)):
+            for faq_id, bonus in snapshot.semantic_index.bonus(query).items():
+                scores[faq_id] = scores.get(faq_id, 0) + bonus
+        
+        # Return top results by score
+        top_results = heapq.nlargest(5, ((faq_id, score) for faq_id, score in scores.items() if score > 0),
+                                     key=lambda item: item[1])
+        
+        return [(faq_id, snapshot.faqs[faq_id], round(score, 4)) for faq_id, score in top_results]
     
     def get_faq(self, faq_id: str) -> Optional[Dict]:
         """Get specific FAQ by ID"""
@@ -145,10 +360,34 @@ def search_faqs(query: str) -> List[Tuple[str, Dict, float]]:
     """Search FAQs by query"""
     return faq_db.search_faqs(query)
 
+def search_faqs_batch(queries: List[str]) -> List[List[Tuple[str, Dict, float]]]:
+    """Search FAQs for a batch of queries"""
+    return faq_db.search_faqs_batch(queries)
+
+async def asearch_faqs(query: str) -> List[Tuple[str, Dict, float]]:
+    """Search FAQs by query (async)"""
+    return await faq_db.asearch_faqs(query)
+
+def semantic_search(query: str, top_k: int = 5) -> List[Tuple[str, Dict, float]]:
+    """Find FAQs by meaning"""
+    return faq_db.semantic_search(query, top_k)
+
+def faq_cache_key(query: str) -> str:
+    """Shared cache key for a query"""
+    return faq_db.cache_key(query)
+
+def reload_faqs(faqs: Optional[Dict[str, Dict]] = None) -> Dict[str, any]:
+    """Reload the FAQ corpus"""
+    return faq_db.reload(faqs)
+
 def get_faq(faq_id: str) -> Optional[Dict]:
     """Get FAQ by ID"""
     return faq_db.get_faq(faq_id)
 
+def render_search_results(results: List[Tuple[str, Dict, float]]) -> Optional[str]:
+    """Render search results as a markdown answer"""
+    return faq_db.render_search_results(results)
+
 def get_best_faq_answer(query: str) -> Optional[str]:
     """Get the best FAQ answer for a query"""
     results = search_faqs(query)
@@ -0,0 +1,128 @@
+# data/faq_index.py
+import heapq
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from text_utils import tokenize
+
+class BM25Index:
+    """Inverted index over FAQ entries with BM25 ranking"""
+    
+    # Questions and keywords describe an FAQ better than its answer, so their terms count more
+    FIELD_WEIGHTS = {"question": 2, "keywords": 2, "answer": 1}
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        # Terms whose posting dicts this index may change in place (None: every term)
+        self._owned_terms: Optional[Set[str]] = None
+    
+    @classmethod
+    def build(cls, faqs: Dict[str, Dict], **params) -> "BM25Index":
+        """Build an index over a whole FAQ corpus"""
+        index = cls(**params)
+        for faq_id, faq_data in faqs.items():
+            index.add_document(faq_id, faq_data)
+        return index
+    
+    def copy(self) -> "BM25Index":
+        """Copy that can be updated while this index keeps serving reads
+        
+        Posting dicts are shared (copy-on-write): whichever index changes a term
+        first gets its own copy of that term's posting, so an update copies only
+        the postings of the terms it touches.
+        """
+        index = BM25Index(self.k1, self.b)
+        index.postings = dict(self.postings)
+        index.doc_terms = dict(self.doc_terms)
+        index.doc_lengths = dict(self.doc_lengths)
+        index.total_length = self.total_length
+        index._owned_terms = set()
+        self._owned_terms = set()
+        return index
+    
+    def _writable_posting(self, term: str) -> Dict[str, int]:
+        """Posting of a term that this index may change in place"""
+        posting = self.postings.get(term)
+        if posting is None:
+            posting = self.postings[term] = {}
+        elif self._owned_terms is not None and term not in self._owned_terms:
+            posting = self.postings[term] = dict(posting)
+        
+        if self._owned_terms is not None:
+            self._owned_terms.add(term)
+        return posting
+    
+    def _document_terms(self, faq_data: Dict) -> Counter:
+        """Weighted term frequencies for one FAQ entry"""
+        terms = Counter()
+        for field, weight in self.FIELD_WEIGHTS.items():
+            value = faq_data.get(field, "")
+            text = " ".join(value) if isinstance(value, list) else value
+            for token in tokenize(text):
+                terms[token] += weight
+        return terms
+    
+    def add_document(self, doc_id: str, faq_data: Dict) -> None:
+        """Index an FAQ entry (replacing any previous version)"""
+        if doc_id in self.doc_terms:
+            self.remove_document(doc_id)
+        
+        terms = self._document_terms(faq_data)
+        self.doc_terms[doc_id] = dict(terms)
+        self.doc_lengths[doc_id] = sum(terms.values())
+        self.total_length += self.doc_lengths[doc_id]
+        
+        for term, frequency in terms.items():
+            self._writable_posting(term)[doc_id] = frequency
+    
+    def remove_document(self, doc_id: str) -> None:
+        """Drop an FAQ entry from the index"""
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term in terms:
+            if term not in self.postings:
+                continue
+            posting = self._writable_posting(term)
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+    
+    def idf(self, term: str) -> float:
+        """Inverse document frequency of a term"""
+        doc_count = len(self.doc_terms)
+        doc_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+    
+    def score(self, query_terms: List[str]) -> Dict[str, float]:
+        """BM25 score of every document sharing at least one term with the query"""
+        if not self.doc_terms:
+            return {}
+        
+        average_length = self.total_length / len(self.doc_terms)
+        scores: Dict[str, float] = {}
+        
+        for term, query_frequency in Counter(query_terms).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            
+            idf = self.idf(term)
+            for doc_id, frequency in posting.items():
+                length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + query_frequency * idf * frequency * (self.k1 + 1) / (frequency + length_norm)
+        
+        return scores
+    
+    def search(self, query_terms: List[str], top_k: int = 5) -> List[Tuple[str, float]]:
+        """Top-k documents for a query, best first"""
+        scores = self.score(query_terms)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,328 @@
+# data/faq_semantic.py
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from text_utils import tokenize
+
+class HashedNgramEncoder:
+    """Encodes text as a fixed-width vector of hashed word and character n-grams
+    
+    Needs no model or network access: features are hashed with a stable CRC so
+    vectors are identical across processes, and each vector is L2-normalized so a
+    dot product is a cosine similarity.
+    """
+    
+    def __init__(self, dim: int = 2048, char_ngram_sizes: Tuple[int, ...] = (3, 4), char_weight: float = 0.5):
+        self.dim = dim
+        self.char_ngram_sizes = char_ngram_sizes
+        self.char_weight = char_weight
+    
+    def _features(self, text: str) -> Iterable[Tuple[str, float]]:
+        """Weighted features: words, unordered word pairs and character n-grams
+        
+        None of the features depend on word order, so queries with the same
+        canonical form (see text_utils.canonicalize_query) encode identically.
+        """
+        tokens = tokenize(text)
+        
+        for token in tokens:
+            yield f"w:{token}", 1.0
+            
+            # Character n-grams let "returns" and "returning" share features with "return"
+            padded = f"<{token}>"
+            for size in self.char_ngram_sizes:
+                for start in range(len(padded) - size + 1):
+                    yield f"c:{padded[start:start + size]}", self.char_weight
+        
+        for position, first in enumerate(tokens):
+            for second in tokens[position + 1:]:
+                yield "p:" + " ".join(sorted((first, second))), 1.0
+    
+    def encode(self, text: str) -> np.ndarray:
+        """Normalized feature vector for one text"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            # The top bit picks a sign so colliding features tend to cancel out
+            vector[hashed % self.dim] += weight if hashed & 0x80000000 else -weight
+        
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def encode_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Normalized feature vectors, one row per text"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.encode(text)
+        return matrix
+
+class RandomProjectionLSH:
+    """Approximate nearest neighbour index using random hyperplane signatures
+    
+    Vectors whose signatures collide in any table (or differ by one bit, with
+    multi-probe) become candidates, which are then reranked by exact cosine.
+    Without an explicit num_planes, the signature length grows with the
+    expected number of vectors so buckets stay around TARGET_BUCKET_SIZE
+    entries and the candidate set stays a small fraction of the index. Small
+    indexes are cheaper to scan in full, so below exact_below vectors every row
+    is a candidate.
+    """
+    
+    TARGET_BUCKET_SIZE = 8
+    MIN_PLANES = 6
+    MAX_PLANES = 20
+    
+    def __init__(self, dim: int, num_planes: Optional[int] = None, num_tables: int = 8, seed: int = 7,
+                 exact_below: int = 512, expected_size: int = 0):
+        self.exact_below = exact_below
+        self.seed = seed
+        num_planes = num_planes or self.planes_for(expected_size)
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((num_tables, num_planes, dim), dtype=np.float32)
+        self.bit_weights = 1 << np.arange(num_planes)
+        self.tables: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(num_tables)]
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        # Bucket id of every row in every table, kept so rows can be re-bucketed without hashing them again
+        self.signatures = np.zeros((num_tables, 0), dtype=np.int64)
+    
+    @classmethod
+    def planes_for(cls, size: int) -> int:
+        """Signature bits that spread size vectors over buckets of about TARGET_BUCKET_SIZE"""
+        planes = int(np.ceil(np.log2(max(size, 1) / cls.TARGET_BUCKET_SIZE))) if size > cls.TARGET_BUCKET_SIZE else 0
+        return min(max(planes, cls.MIN_PLANES), cls.MAX_PLANES)
+    
+    def _signatures(self, vectors: np.ndarray) -> np.ndarray:
+        """Bucket id of each vector in each table (shape: tables x vectors)"""
+        bits = np.einsum("tpd,nd->tnp", self.planes, vectors) > 0
+        return bits @ self.bit_weights
+    
+    def _bucket(self, offset: int, signatures: np.ndarray) -> None:
+        """File rows offset, offset + 1, ... under their signatures"""
+        for table, table_signatures in zip(self.tables, signatures):
+            for row, signature in enumerate(table_signatures.tolist(), offset):
+                table[signature].append(row)
+    
+    def add(self, vectors: np.ndarray) -> None:
+        """Add normalized vectors (row ids continue from the current size)"""
+        offset = len(self.vectors)
+        signatures = self._signatures(vectors)
+        self.vectors = np.vstack([self.vectors, vectors.astype(np.float32, copy=False)])
+        self.signatures = np.hstack([self.signatures, signatures])
+        self._bucket(offset, signatures)
+    
+    def updated(self, keep_rows: np.ndarray, vectors: np.ndarray) -> "RandomProjectionLSH":
+        """New index with this index's keep_rows (renumbered in order) followed by vectors
+        
+        Kept rows reuse their stored signatures, so only the new vectors are
+        hashed. This index is left unchanged and keeps serving searches.
+        """
+        num_tables, num_planes, dim = self.planes.shape
+        lsh = RandomProjectionLSH(dim, num_planes, num_tables, self.seed, self.exact_below)
+        lsh.vectors = self.vectors[keep_rows]
+        lsh.signatures = self.signatures[:, keep_rows]
+        lsh._bucket(0, lsh.signatures)
+        if len(vectors):
+            lsh.add(vectors)
+        return lsh
+    
+    def _candidates_for_signatures(self, signatures: np.ndarray, multi_probe: bool = True) -> List[int]:
+        """Row ids in the buckets of one vector's signatures (one per table)"""
+        found = set()
+        num_planes = len(self.bit_weights)
+        
+        for table, signature in zip(self.tables, signatures):
+            signature = int(signature)
+            found.update(table.get(signature, ()))
+            if multi_probe:
+                for bit in range(num_planes):
+                    found.update(table.get(signature ^ (1 << bit), ()))
+        
+        return sorted(found)
+    
+    def candidates(self, vector: np.ndarray, multi_probe: bool = True) -> List[int]:
+        """Row ids that share a bucket with the vector in any table"""
+        return self._candidates_for_signatures(self._signatures(vector[None, :])[:, 0], multi_probe)
+    
+    def rows_to_scan(self, vectors: np.ndarray, top_k: int) -> List[List[int]]:
+        """Rows search() compares each vector against: its candidates, or every row for small indexes or short buckets"""
+        all_rows = list(range(len(self.vectors)))
+        if len(self.vectors) < self.exact_below:
+            return [all_rows for _ in vectors]
+        
+        scan = []
+        for signatures in self._signatures(vectors).T:
+            rows = self._candidates_for_signatures(signatures)
+            scan.append(rows if len(rows) >= top_k else all_rows)
+        return scan
+    
+    def search(self, vector: np.ndarray, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (row id, cosine) pairs, falling back to a full scan for small indexes or short buckets"""
+        if not len(self.vectors):
+            return []
+        
+        rows = self.rows_to_scan(vector[None, :], top_k)[0]
+        similarities = self.vectors[rows] @ vector
+        best = np.argsort(-similarities, kind="stable")[:top_k]
+        return [(rows[position], float(similarities[position])) for position in best]
+
+class SemanticFAQIndex:
+    """Paraphrase-tolerant FAQ lookup over hashed n-gram vectors
+    
+    Every FAQ contributes several entries (its question, its multi-word keywords
+    and any example phrasings); an FAQ's similarity to a query is that of its
+    best entry.
+    
+    Similarity comes from shared words, word pairs and character n-grams, so a
+    paraphrase is only found if it shares vocabulary (or word stems) with one
+    of the entries. Pure synonyms are out of reach: "give back something I
+    bought" does not reach return_policy and "my headphones are faulty" does
+    not reach warranty. When such a query also shares an incidental word with
+    another FAQ ("the product broke after a week" and product_availability),
+    the lexical match wins. Example phrasings in the corpus are the way to
+    cover wordings like these.
+    """
+    
+    # Similarity below which a semantic match is ignored
+    MIN_SIMILARITY = 0.5
+    
+    # Scale of the semantic bonus relative to lexical (keyword + BM25) scores
+    BLEND_WEIGHT = 4.0
+    
+    # Best lexical score from which a query is considered found and the semantic bonus is skipped
+    LEXICAL_CONFIDENT_SCORE = 6.0
+    
+    def __init__(self, encoder: Optional[HashedNgramEncoder] = None):
+        self.encoder = encoder or HashedNgramEncoder()
+        self.lsh = RandomProjectionLSH(self.encoder.dim)
+        self.entry_faq_ids: List[str] = []
+        self.faq_vectors: Dict[str, np.ndarray] = {}
+    
+    @staticmethod
+    def _entry_texts(faq_data: Dict) -> List[str]:
+        """Texts that represent an FAQ in the index"""
+        texts = [faq_data.get("question", "")]
+        # Single-word keywords are left to lexical matching; alone they look similar to almost any query using that word
+        texts.extend(keyword for keyword in faq_data.get("keywords", []) if len(tokenize(keyword)) > 1)
+        texts.extend(faq_data.get("examples", []))
+        return [text for text in texts if tokenize(text)]
+    
+    @classmethod
+    def build(cls, faqs: Dict[str, Dict], previous: Optional["SemanticFAQIndex"] = None,
+              changed: Iterable[str] = (), **params) -> "SemanticFAQIndex":
+        """Build an index over a whole FAQ corpus
+        
+        With a previous index, only FAQs listed in changed are re-encoded and
+        re-hashed; the vectors and LSH signatures of every other FAQ are reused
+        unless the corpus grew or shrank enough to change the signature length.
+        """
+        index = cls(encoder=previous.encoder, **params) if previous else cls(**params)
+        changed = set(changed)
+        
+        for faq_id, faq_data in faqs.items():
+            if previous and faq_id not in changed and faq_id in previous.faq_vectors:
+                vectors = previous.faq_vectors[faq_id]
+            else:
+                vectors = index.encoder.encode_batch(cls._entry_texts(faq_data))
+            index.faq_vectors[faq_id] = vectors
+        
+        entry_count = sum(len(vectors) for vectors in index.faq_vectors.values())
+        num_planes = RandomProjectionLSH.planes_for(entry_count)
+        
+        if previous and previous.entry_faq_ids and previous.lsh.planes.shape[1] == num_planes:
+            # Same signature length: keep the unchanged rows and hash only the changed FAQs' vectors
+            keep_rows = np.array([row for row, faq_id in enumerate(previous.entry_faq_ids)
+                                  if faq_id not in changed and faq_id in faqs], dtype=np.int64)
+            new_faq_ids = [faq_id for faq_id in faqs if faq_id in changed or faq_id not in previous.faq_vectors]
+            index.entry_faq_ids = [previous.entry_faq_ids[row] for row in keep_rows]
+            for faq_id in new_faq_ids:
+                index.entry_faq_ids.extend([faq_id] * len(index.faq_vectors[faq_id]))
+            
+            new_vectors = [index.faq_vectors[faq_id] for faq_id in new_faq_ids]
+            index.lsh = previous.lsh.updated(
+                keep_rows, np.vstack(new_vectors) if new_vectors else np.zeros((0, index.encoder.dim), dtype=np.float32))
+        elif entry_count:
+            for faq_id, vectors in index.faq_vectors.items():
+                index.entry_faq_ids.extend([faq_id] * len(vectors))
+            index.lsh = RandomProjectionLSH(index.encoder.dim, expected_size=entry_count)
+            index.lsh.add(np.vstack(list(index.faq_vectors.values())))
+        return index
+    
+    def search(self, query: str, top_k: int = 5, min_similarity: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Top-k (faq_id, similarity) pairs for a query, best first"""
+        if min_similarity is None:
+            min_similarity = self.MIN_SIMILARITY
+        
+        vector = self.encoder.encode(query)
+        if not vector.any():
+            return []
+        
+        # Ask for extra entries since several may belong to the same FAQ
+        best: Dict[str, float] = {}
+        for row, similarity in self.lsh.search(vector, top_k * 4):
+            faq_id = self.entry_faq_ids[row]
+            if similarity >= min_similarity and similarity > best.get(faq_id, 0.0):
+                best[faq_id] = similarity
+        
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    
+    def needs_bonus(self, best_lexical_score: float) -> bool:
+        """Whether lexical matching found a query's FAQ too weakly to skip the semantic search"""
+        return best_lexical_score < self.LEXICAL_CONFIDENT_SCORE
+    
+    def bonus(self, query: str) -> Dict[str, float]:
+        """Semantic score to add to an FAQ's lexical score for a query"""
+        return {faq_id: self.BLEND_WEIGHT * similarity for faq_id, similarity in self.search(query)}
+    
+    def bonus_batch(self, queries: Sequence[str], faq_ids: List[str], top_k: int = 5,
+                    chunk_size: int = 16) -> np.ndarray:
+        """Semantic bonus matrix with one row per query and one column per FAQ in faq_ids
+        
+        Gives the same values as bonus() per query. Each chunk of queries is
+        compared with the union of its candidate entries in one matrix product;
+        a query then only keeps similarities to its own candidates.
+        """
+        bonuses = np.zeros((len(queries), len(faq_ids)), dtype=np.float64)
+        if not len(queries) or not self.entry_faq_ids or not faq_ids:
+            return bonuses
+        
+        columns = {faq_id: column for column, faq_id in enumerate(faq_ids)}
+        top_entries = top_k * 4
+        
+        for start in range(0, len(queries), chunk_size):
+            vectors = self.encoder.encode_batch(queries[start:start + chunk_size])
+            scan_rows = self.lsh.rows_to_scan(vectors, top_entries)
+            union = np.unique(np.concatenate([np.asarray(rows, dtype=np.int64) for rows in scan_rows]))
+            # Hashed n-gram vectors are sparse: only the dimensions these queries use can contribute
+            dims = np.flatnonzero(vectors.any(axis=0))
+            similarities = vectors[:, dims] @ self.lsh.vectors[np.ix_(union, dims)].T
+            
+            for offset, (vector, rows, row_similarities) in enumerate(zip(vectors, scan_rows, similarities)):
+                # Queries with no features match nothing, as in search()
+                if not vector.any():
+                    continue
+                
+                # Best entries among the query's own candidates, ties in row order like lsh.search()
+                positions = np.searchsorted(union, rows)
+                candidate_similarities = row_similarities[positions]
+                if len(positions) > top_entries:
+                    threshold = np.partition(candidate_similarities, -top_entries)[-top_entries]
+                    kept = np.flatnonzero(candidate_similarities >= threshold)
+                else:
+                    kept = np.arange(len(positions))
+                kept = kept[np.argsort(-candidate_similarities[kept], kind="stable")][:top_entries]
+                
+                best: Dict[str, float] = {}
+                for position in kept:
+                    faq_id = self.entry_faq_ids[union[positions[position]]]
+                    similarity = float(candidate_similarities[position])
+                    if similarity >= self.MIN_SIMILARITY and similarity > best.get(faq_id, 0.0):
+                        best[faq_id] = similarity
+                
+                for faq_id, similarity in sorted(best.items(), key=lambda item: item[1], reverse=True)[:top_k]:
+                    if faq_id in columns:
+                        bonuses[start + offset, columns[faq_id]] = self.BLEND_WEIGHT * similarity
+        
+        return bonuses
@@ -0,0 +1,92 @@
+# data/faq_source.py
+import json
+import os
+from typing import Dict, Optional
+
+REQUIRED_FAQ_FIELDS = ("question", "answer", "keywords")
+
+def validate_faqs(faqs: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Check that a loaded corpus has the fields search relies on"""
+    if not isinstance(faqs, dict):
+        raise ValueError("FAQ corpus must be an object mapping FAQ IDs to entries")
+    
+    for faq_id, faq_data in faqs.items():
+        missing = [field for field in REQUIRED_FAQ_FIELDS if field not in faq_data]
+        if missing:
+            raise ValueError(f"FAQ '{faq_id}' is missing {', '.join(missing)}")
+        if not isinstance(faq_data["keywords"], list):
+            raise ValueError(f"FAQ '{faq_id}' keywords must be a list")
+    
+    return faqs
+
+class FAQFileSource:
+    """FAQ corpus stored as a JSON file ({faq_id: {question, answer, keywords, examples}})"""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def load(self) -> Dict[str, Dict]:
+        """Read and validate the corpus"""
+        with open(self.path, "r", encoding="utf-8") as corpus_file:
+            return validate_faqs(json.load(corpus_file))
+    
+    def save(self, faqs: Dict[str, Dict]) -> None:
+        """Write the corpus (via a temporary file so readers never see a partial write)"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as corpus_file:
+            json.dump(faqs, corpus_file, indent=2)
+        os.replace(temp_path, self.path)
+    
+    def version(self) -> Optional[str]:
+        """Changes whenever the file is rewritten (None if it does not exist)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+class FAQRedisSource:
+    """FAQ corpus stored in a Redis hash (one JSON-encoded field per FAQ)
+    
+    Every write also bumps a version counter so watchers can tell the corpus
+    changed without reading the whole hash.
+    """
+    
+    def __init__(self, redis_client, key: str = "faq_corpus"):
+        self.redis_client = redis_client
+        self.key = key
+        self.version_key = f"{key}:version"
+    
+    def load(self) -> Dict[str, Dict]:
+        """Read and validate the corpus"""
+        entries = self.redis_client.hgetall(self.key)
+        return validate_faqs({faq_id: json.loads(value) for faq_id, value in entries.items()})
+    
+    def save(self, faqs: Dict[str, Dict]) -> None:
+        """Replace the whole corpus"""
+        validate_faqs(faqs)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(self.key)
+        if faqs:
+            pipe.hset(self.key, mapping={faq_id: json.dumps(faq_data) for faq_id, faq_data in faqs.items()})
+        pipe.incr(self.version_key)
+        pipe.execute()
+    
+    def put(self, faq_id: str, faq_data: Dict) -> None:
+        """Add or replace a single FAQ"""
+        validate_faqs({faq_id: faq_data})
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(self.key, faq_id, json.dumps(faq_data))
+        pipe.incr(self.version_key)
+        pipe.execute()
+    
+    def delete(self, faq_id: str) -> None:
+        """Remove a single FAQ"""
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hdel(self.key, faq_id)
+        pipe.incr(self.version_key)
+        pipe.execute()
+    
+    def version(self) -> Optional[str]:
+        """Current version counter (None if the corpus was never written)"""
+        return self.redis_client.get(self.version_key)
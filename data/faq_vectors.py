@@ -0,0 +1,147 @@
+# data/faq_vectors.py
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from faq_index import BM25Index
+from faq_semantic import SemanticFAQIndex
+from keyword_matcher import KeywordMatcher
+from text_utils import tokenize
+
+class FAQVectorIndex:
+    """Column-compressed weight matrix over the FAQ corpus for scoring many queries at once
+    
+    Each FAQ is a row holding its BM25 term weights followed by its keyword-phrase
+    bonuses. Only non-zero weights are stored, column by column (one column per
+    term or keyword phrase, like the BM25 postings), so memory grows with the
+    postings rather than with FAQs x vocabulary. A batch of queries is scored by
+    gathering the columns its terms and keyword hits touch. With a semantic
+    index attached its bonuses are added on top for queries whose lexical
+    scores are weak, giving the same scores as FAQDatabase._score_query.
+    """
+    
+    # Cap on the dense score matrix of one chunk of queries (queries x FAQs)
+    MAX_SCORE_CELLS = 1 << 24
+    
+    def __init__(self, faq_ids: List[str], columns: Dict[Tuple[str, str], int], column_starts: np.ndarray,
+                 column_rows: np.ndarray, column_weights: np.ndarray, matcher: KeywordMatcher,
+                 semantic: Optional[SemanticFAQIndex] = None):
+        self.faq_ids = faq_ids
+        self.columns = columns
+        # Column c holds rows column_rows[column_starts[c]:column_starts[c + 1]] with matching weights
+        self.column_starts = column_starts
+        self.column_rows = column_rows
+        self.column_weights = column_weights
+        self.matcher = matcher
+        self.semantic = semantic
+    
+    @classmethod
+    def build(cls, index: BM25Index, keywords_map: Dict[str, List[str]],
+              matcher: KeywordMatcher = None, semantic: Optional[SemanticFAQIndex] = None) -> "FAQVectorIndex":
+        """Precompute per-FAQ weights from a BM25 index and the keyword map"""
+        faq_ids = list(index.doc_terms)
+        rows = {faq_id: row for row, faq_id in enumerate(faq_ids)}
+        columns: Dict[Tuple[str, str], int] = {}
+        column_rows: List[List[int]] = []
+        column_weights: List[List[float]] = []
+        
+        # Term columns first, then one column per keyword phrase
+        average_length = index.total_length / len(faq_ids) if faq_ids else 0.0
+        for term, posting in index.postings.items():
+            columns[("term", term)] = len(columns)
+            idf = index.idf(term)
+            column_rows.append([rows[faq_id] for faq_id in posting])
+            column_weights.append([
+                idf * frequency * (index.k1 + 1)
+                / (frequency + index.k1 * (1 - index.b + index.b * index.doc_lengths[faq_id] / average_length))
+                for faq_id, frequency in posting.items()
+            ])
+        
+        # Longer keyword matches get higher scores
+        for keyword, keyword_faq_ids in keywords_map.items():
+            columns[("keyword", keyword)] = len(columns)
+            weights: Dict[int, float] = {}
+            for faq_id in keyword_faq_ids:
+                if faq_id in rows:
+                    weights[rows[faq_id]] = weights.get(rows[faq_id], 0.0) + len(keyword.split())
+            column_rows.append(list(weights))
+            column_weights.append(list(weights.values()))
+        
+        column_starts = np.zeros(len(columns) + 1, dtype=np.int64)
+        column_starts[1:] = np.cumsum([len(column) for column in column_rows])
+        return cls(faq_ids, columns, column_starts,
+                   np.fromiter((row for column in column_rows for row in column), dtype=np.int64, count=column_starts[-1]),
+                   np.fromiter((weight for column in column_weights for weight in column), dtype=np.float64,
+                               count=column_starts[-1]),
+                   matcher or KeywordMatcher(keywords_map), semantic)
+    
+    def _query_entries(self, queries: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Non-zero (query row, column, weight) entries: term counts and keyword hits"""
+        query_rows, query_columns, query_weights = [], [], []
+        
+        for row, query in enumerate(queries):
+            counts: Dict[int, float] = {}
+            for term in tokenize(query):
+                column = self.columns.get(("term", term))
+                if column is not None:
+                    counts[column] = counts.get(column, 0.0) + 1
+            for keyword in self.matcher.find_all(query):
+                counts[self.columns[("keyword", keyword)]] = 1
+            
+            query_rows.extend([row] * len(counts))
+            query_columns.extend(counts)
+            query_weights.extend(counts.values())
+        
+        return (np.array(query_rows, dtype=np.int64), np.array(query_columns, dtype=np.int64),
+                np.array(query_weights, dtype=np.float64))
+    
+    def score_batch(self, queries: Sequence[str]) -> np.ndarray:
+        """Score matrix with one row per query and one column per FAQ"""
+        doc_count = len(self.faq_ids)
+        query_rows, query_columns, query_weights = self._query_entries(queries)
+        
+        # Walk the stored columns each query entry touches, as BM25 walks postings
+        starts = self.column_starts[query_columns]
+        lengths = self.column_starts[query_columns + 1] - starts
+        positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        cells = np.repeat(query_rows, lengths) * doc_count + self.column_rows[positions]
+        values = np.repeat(query_weights, lengths) * self.column_weights[positions]
+        scores = np.bincount(cells, weights=values, minlength=len(queries) * doc_count).reshape(len(queries), doc_count)
+        
+        if self.semantic is not None and len(queries):
+            best_lexical = scores.max(axis=1) if scores.shape[1] else np.zeros(len(queries))
+            weak = np.flatnonzero([self.semantic.needs_bonus(score) for score in best_lexical])
+            if len(weak):
+                scores[weak] += self.semantic.bonus_batch([queries[row] for row in weak], self.faq_ids)
+        return scores
+    
+    def search_batch(self, queries: Sequence[str], top_k: int = 5,
+                     chunk_size: int = 1024) -> List[List[Tuple[str, float]]]:
+        """Top-k (faq_id, score) pairs for every query, best first"""
+        results: List[List[Tuple[str, float]]] = []
+        doc_count = len(self.faq_ids)
+        k = min(top_k, doc_count)
+        
+        if k == 0:
+            return [[] for _ in queries]
+        
+        # Chunking keeps the dense score matrix bounded on very large batches and corpora
+        chunk_size = max(1, min(chunk_size, self.MAX_SCORE_CELLS // doc_count))
+        for start in range(0, len(queries), chunk_size):
+            scores = self.score_batch(queries[start:start + chunk_size])
+            
+            if k < doc_count:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(doc_count), (len(scores), 1))
+            
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            
+            for row_ids, row_scores in zip(top, top_scores):
+                results.append([(self.faq_ids[doc], float(score))
+                                for doc, score in zip(row_ids, row_scores) if score > 0])
+        
+        return results
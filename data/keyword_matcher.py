@@ -0,0 +1,86 @@
+# data/keyword_matcher.py
+from collections import deque
+from typing import Dict, Iterable, List
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds every keyword in a text in a single pass
+    
+    Matching cost depends only on the length of the text, not on how many
+    keywords are compiled in. Hits must sit on word boundaries, so "return"
+    matches "return policy" but not "returned".
+    """
+    
+    def __init__(self, keywords: Iterable[str]):
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.failure: List[int] = [0]
+        self.outputs: List[List[str]] = [[]]
+        
+        for keyword in keywords:
+            self._add_keyword(keyword.lower())
+        self._build_failure_links()
+    
+    def _add_keyword(self, keyword: str) -> None:
+        """Add a keyword to the trie"""
+        if not keyword:
+            return
+        
+        state = 0
+        for char in keyword:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.failure.append(0)
+                self.outputs.append([])
+                self.transitions[state][char] = next_state
+            state = next_state
+        
+        if keyword not in self.outputs[state]:
+            self.outputs[state].append(keyword)
+    
+    def _build_failure_links(self) -> None:
+        """Breadth-first pass linking each state to its longest proper suffix state"""
+        queue = deque(self.transitions[0].values())
+        
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                
+                fallback = self.failure[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.failure[fallback]
+                self.failure[next_state] = self.transitions[fallback].get(char, 0)
+                
+                # A state also emits every keyword its suffix state emits
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.failure[next_state]]
+    
+    def find_all(self, text: str) -> List[str]:
+        """Every keyword found in the text on word boundaries, in order of first appearance"""
+        text = text.lower()
+        found = []
+        seen = set()
+        state = 0
+        
+        for position, char in enumerate(text):
+            while state and char not in self.transitions[state]:
+                state = self.failure[state]
+            state = self.transitions[state].get(char, 0)
+            
+            if not self.outputs[state]:
+                continue
+            
+            # Word boundary after the match
+            if position + 1 < len(text) and text[position + 1].isalnum():
+                continue
+            
+            for keyword in self.outputs[state]:
+                start = position - len(keyword) + 1
+                # Word boundary before the match
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if keyword not in seen:
+                    seen.add(keyword)
+                    found.append(keyword)
+        
+        return found
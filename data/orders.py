@@ -1,13 +1,22 @@
 # data/orders.py
 from datetime import datetime, timedelta
+import asyncio
 import random
-from typing import Dict, List, Optional
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Order change event types
+ORDER_CREATED = "order_created"
+ORDER_STATUS_CHANGED = "status_changed"
+ORDER_ADDRESS_CHANGED = "address_changed"
 
 class OrderDatabase:
     """Mock order database for demonstrating Redis caching"""
     
     def __init__(self):
         self.orders = self._generate_sample_orders()
+        self.email_index = self._build_email_index()
+        self._change_publisher: Optional[Callable[[Dict], None]] = None
         
     def _generate_sample_orders(self) -> Dict[str, Dict]:
         """Generate realistic sample orders"""
@@ -62,6 +71,18 @@ class OrderDatabase:
             
         return orders
     
+    def _build_email_index(self) -> Dict[str, List[str]]:
+        """Build a map of customer emails to order IDs, newest order first"""
+        email_index = {}
+        
+        for order in self.orders.values():
+            email_index.setdefault(order["customer_email"].lower(), []).append(order["order_id"])
+        
+        for order_ids in email_index.values():
+            order_ids.sort(key=lambda order_id: self.orders[order_id]["order_date"], reverse=True)
+            
+        return email_index
+    
     def get_order(self, order_id: str) -> Optional[Dict]:
         """Get order by ID (simulates database query delay)"""
         import time
@@ -75,12 +96,33 @@ class OrderDatabase:
         import time
         time.sleep(0.3)  # Simulate search delay
         
-        matching_orders = []
-        for order in self.orders.values():
-            if order["customer_email"].lower() == email.lower():
-                matching_orders.append(order)
-                
-        return sorted(matching_orders, key=lambda x: x["order_date"], reverse=True)
+        return list(self.iter_orders_by_email(email))
+    
+    def iter_orders_by_email(self, email: str) -> Iterator[Dict]:
+        """Iterate over a customer's orders, newest first"""
+        for order_id in self.email_index.get(email.lower(), []):
+            yield self.orders[order_id]
+    
+    def search_orders_by_email_page(self, email: str, cursor: int = 0, limit: int = 5) -> Dict[str, Any]:
+        """Search orders by customer email, returning one page of results"""
+        import time
+        time.sleep(0.3)  # Simulate search delay
+        
+        return self._page_orders_by_email(email, cursor, limit)
+    
+    def _page_orders_by_email(self, email: str, cursor: int, limit: int) -> Dict[str, Any]:
+        """Slice one page out of a customer's order list"""
+        cursor = max(cursor, 0)
+        orders = list(islice(self.iter_orders_by_email(email), cursor, cursor + limit))
+        total = len(self.email_index.get(email.lower(), []))
+        next_cursor = cursor + len(orders)
+        
+        return {
+            "orders": orders,
+            "cursor": cursor,
+            "next_cursor": next_cursor if next_cursor < total else None,
+            "total": total
+        }
     
     def get_order_status_summary(self, order_id: str) -> Optional[str]:
         """Get a human-readable status summary"""
@@ -88,25 +130,134 @@ class OrderDatabase:
         if not order:
             return None
             
-        status = order["status"]
-        product = order["product"]
-        
-        if status == "processing":
-            return f"Your order for {product} is being processed and will ship soon."
-        elif status == "shipped":
-            return f"Your {product} has shipped via {order['carrier']} (tracking: {order['tracking_number']}) and is expected to arrive on {order['estimated_delivery']}."
-        elif status == "delivered":
-            return f"Your {product} was delivered on {order['estimated_delivery']}."
-        elif status == "cancelled":
-            return f"Your order for {product} has been cancelled."
-        elif status == "returned":
-            return f"Your {product} order has been returned and is being processed for refund."
-        else:
-            return f"Order status: {status}"
+        return build_order_status_summary(order)
     
     def get_all_order_ids(self) -> List[str]:
         """Get all order IDs for testing"""
         return list(self.orders.keys())
+    
+    # ========== Async Interface ==========
+    
+    async def aget_order(self, order_id: str) -> Optional[Dict]:
+        """Get order by ID without blocking the event loop"""
+        await asyncio.sleep(0.5)  # Simulate database query delay
+        
+        return self.orders.get(order_id.upper())
+    
+    async def asearch_orders_by_email(self, email: str) -> List[Dict]:
+        """Search orders by customer email without blocking the event loop"""
+        await asyncio.sleep(0.3)  # Simulate search delay
+        
+        return list(self.iter_orders_by_email(email))
+    
+    async def asearch_orders_by_email_page(self, email: str, cursor: int = 0, limit: int = 5) -> Dict[str, Any]:
+        """Search one page of orders by customer email without blocking the event loop"""
+        await asyncio.sleep(0.3)  # Simulate search delay
+        
+        return self._page_orders_by_email(email, cursor, limit)
+    
+    async def aget_order_status_summary(self, order_id: str) -> Optional[str]:
+        """Get a human-readable status summary without blocking the event loop"""
+        order = await self.aget_order(order_id)
+        if not order:
+            return None
+        
+        return build_order_status_summary(order)
+    
+    # ========== Order Change Events ==========
+    
+    def set_change_publisher(self, publisher: Optional[Callable[[Dict], None]]) -> None:
+        """Register the callable that receives every order change event (e.g. a Redis Stream publisher)"""
+        self._change_publisher = publisher
+    
+    def _publish_change(self, event_type: str, order: Dict, changes: Dict) -> Dict:
+        """Build an order change event and hand it to the publisher"""
+        event = {
+            "event_type": event_type,
+            "order_id": order["order_id"],
+            "customer_email": order["customer_email"],
+            "changes": changes,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        if self._change_publisher:
+            self._change_publisher(event)
+        
+        return event
+    
+    def add_order(self, order: Dict) -> Dict:
+        """Add a new order to the store"""
+        order_id = order["order_id"].upper()
+        new_order = {**order, "order_id": order_id}
+        self.orders[order_id] = new_order
+        
+        # Keep the customer's order list sorted newest first
+        order_ids = self.email_index.setdefault(new_order["customer_email"].lower(), [])
+        if order_id not in order_ids:
+            order_ids.append(order_id)
+            order_ids.sort(key=lambda oid: self.orders[oid]["order_date"], reverse=True)
+        
+        self._publish_change(ORDER_CREATED, new_order, {"status": {"old": None, "new": new_order.get("status")}})
+        return new_order
+    
+    def update_order_status(self, order_id: str, status: str, tracking_number: Optional[str] = None,
+                            carrier: Optional[str] = None, estimated_delivery: Optional[str] = None) -> Optional[Dict]:
+        """Transition an order to a new status"""
+        order = self.orders.get(order_id.upper())
+        if not order:
+            return None
+        
+        updates = {"status": status}
+        if tracking_number is not None:
+            updates["tracking_number"] = tracking_number
+        if carrier is not None:
+            updates["carrier"] = carrier
+        if estimated_delivery is not None:
+            updates["estimated_delivery"] = estimated_delivery
+        
+        changes = {
+            field: {"old": order.get(field), "new": value}
+            for field, value in updates.items()
+            if order.get(field) != value
+        }
+        if not changes:
+            return order
+        
+        order.update(updates)
+        self._publish_change(ORDER_STATUS_CHANGED, order, changes)
+        return order
+    
+    def update_shipping_address(self, order_id: str, address: Dict) -> Optional[Dict]:
+        """Change the shipping address of an order"""
+        order = self.orders.get(order_id.upper())
+        if not order:
+            return None
+        
+        old_address = order["shipping_address"]
+        order["shipping_address"] = {**old_address, **address}
+        
+        self._publish_change(ORDER_ADDRESS_CHANGED, order, {
+            "shipping_address": {"old": old_address, "new": order["shipping_address"]}
+        })
+        return order
+
+def build_order_status_summary(order: Dict) -> str:
+    """Build a human-readable status summary from order data"""
+    status = order["status"]
+    product = order["product"]
+    
+    if status == "processing":
+        return f"Your order for {product} is being processed and will ship soon."
+    elif status == "shipped":
+        return f"Your {product} has shipped via {order['carrier']} (tracking: {order['tracking_number']}) and is expected to arrive on {order['estimated_delivery']}."
+    elif status == "delivered":
+        return f"Your {product} was delivered on {order['estimated_delivery']}."
+    elif status == "cancelled":
+        return f"Your order for {product} has been cancelled."
+    elif status == "returned":
+        return f"Your {product} order has been returned and is being processed for refund."
+    else:
+        return f"Order status: {status}"
 
 # Create global instance
 order_db = OrderDatabase()
@@ -120,10 +271,34 @@ def search_orders_by_email(email: str) -> List[Dict]:
     """Search orders by email"""
     return order_db.search_orders_by_email(email)
 
+def search_orders_by_email_page(email: str, cursor: int = 0, limit: int = 5) -> Dict[str, Any]:
+    """Search orders by email, one page at a time"""
+    return order_db.search_orders_by_email_page(email, cursor, limit)
+
 def get_order_status_summary(order_id: str) -> Optional[str]:
     """Get order status summary"""
     return order_db.get_order_status_summary(order_id)
 
+async def aget_order(order_id: str) -> Optional[Dict]:
+    """Get order by ID (async)"""
+    return await order_db.aget_order(order_id)
+
+async def asearch_orders_by_email(email: str) -> List[Dict]:
+    """Search orders by email (async)"""
+    return await order_db.asearch_orders_by_email(email)
+
+async def asearch_orders_by_email_page(email: str, cursor: int = 0, limit: int = 5) -> Dict[str, Any]:
+    """Search orders by email, one page at a time (async)"""
+    return await order_db.asearch_orders_by_email_page(email, cursor, limit)
+
+async def aget_order_status_summary(order_id: str) -> Optional[str]:
+    """Get order status summary (async)"""
+    return await order_db.aget_order_status_summary(order_id)
+
+def update_order_status(order_id: str, status: str, **details) -> Optional[Dict]:
+    """Update order status"""
+    return order_db.update_order_status(order_id, status, **details)
+
 def get_sample_order_ids(count: int = 5) -> List[str]:
     """Get sample order IDs for testing"""
     return order_db.get_all_order_ids()[:count]
@@ -0,0 +1,58 @@
+# data/text_utils.py
+import re
+from typing import List
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Common words that carry no meaning for FAQ matching
+STOPWORDS = frozenset({
+    "a", "about", "am", "an", "and", "any", "are", "as", "at", "be", "been", "but", "by",
+    "can", "could", "did", "do", "does", "for", "from", "had", "has", "have", "how", "i",
+    "if", "im", "in", "is", "it", "its", "me", "my", "of", "on", "or", "our", "please",
+    "so", "that", "the", "their", "them", "there", "this", "to", "u", "ur", "us", "was",
+    "we", "were", "what", "whats", "when", "where", "which", "who", "why", "will", "with",
+    "would", "you", "your", "youre"
+})
+
+# Shortest stem a suffix may be stripped down to
+MIN_STEM_LENGTH = 3
+
+def stem(token: str) -> str:
+    """Light suffix stripping so inflections share a form ("returns", "returned", "returning" -> "return")"""
+    if token.endswith("ies") and len(token) - 3 >= MIN_STEM_LENGTH - 1:
+        return token[:-3] + "y"
+    
+    if token.endswith("es") and token[:-2].endswith(("s", "x", "z", "ch", "sh")) and len(token) - 2 >= MIN_STEM_LENGTH:
+        return token[:-2]
+    
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")) and len(token) - 1 >= MIN_STEM_LENGTH:
+        token = token[:-1]
+    
+    for suffix in ("ing", "ed"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            token = token[:-len(suffix)]
+            # "shipping" -> "shipp" -> "ship"
+            if token[-1] == token[-2] and token[-1] not in "lsz":
+                token = token[:-1]
+            break
+    
+    # "change", "changed" and "changing" all end up as "chang"
+    if token.endswith("e") and len(token) - 1 >= MIN_STEM_LENGTH + 1:
+        token = token[:-1]
+    
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into stemmed word tokens, dropping stopwords and single characters"""
+    return [
+        stem(token) for token in TOKEN_PATTERN.findall(text.lower().replace("'", ""))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+def canonicalize_query(query: str) -> str:
+    """Order-independent form of a query: stemmed content words, sorted
+    
+    "What's your return policy?", "return policy" and "whats ur return policy"
+    all become "policy return". Empty if the query has no content words.
+    """
+    return " ".join(sorted(tokenize(query)))
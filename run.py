@@ -251,7 +251,7 @@ def show_system_info(args):
     
     from app import CustomerSupportApp
     
-    app = CustomerSupportApp()
+    app = CustomerSupportApp(warmup="lazy")
     dashboard = app.get_system_dashboard()
     
     if args.output == 'json':
@@ -299,7 +299,7 @@ def run_health_check(args):
     
     from app import CustomerSupportApp
     
-    app = CustomerSupportApp()
+    app = CustomerSupportApp(warmup="lazy")
     dashboard = app.get_system_dashboard()
     health = dashboard.get("system_health", {})
     
@@ -362,7 +362,7 @@ def show_analytics(args):
     
     from app import CustomerSupportApp
     
-    app = CustomerSupportApp()
+    app = CustomerSupportApp(warmup="lazy")
     dashboard = app.get_system_dashboard()
     analytics = dashboard.get("analytics_summary", {})
     
@@ -478,7 +478,7 @@ def run_system_setup(args):
     print("\n3. Initializing system components...")
     try:
         from app import CustomerSupportApp
-        app = CustomerSupportApp()
+        app = CustomerSupportApp(warmup="eager")
         print("   ✅ System components initialized")
     except Exception as e:
         print(f"   ❌ Initialization failed: {e}")
@@ -0,0 +1,90 @@
+# src/agent_registry.py - Agents declared by factory and built on first use
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+class AgentRegistry:
+    """Named agent factories, each instantiated at most once
+    
+    Agents are built on first get() or by warm_up(), which can run in a
+    background thread so a process is ready to serve (and answer commands that
+    never need an agent) before any LLM client, tool set or executor exists.
+    """
+    
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+    
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """Declare an agent; the factory is not called until the agent is needed"""
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+    
+    def get(self, name: str) -> Optional[Any]:
+        """The named agent, built now if this is its first use (None if no such agent is registered)"""
+        instance = self._instances.get(name)
+        if instance is not None or name not in self._factories:
+            return instance
+        
+        # One lock per agent: a slow build does not hold up other agents, and racing callers share one instance
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                print(f"🏗️  Building {name} agent...")
+                instance = self._factories[name]()
+                self._instances[name] = instance
+        return instance
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+    
+    def names(self) -> List[str]:
+        """Registered agent names"""
+        return list(self._factories)
+    
+    def is_loaded(self, name: str) -> bool:
+        """Whether the named agent has been built"""
+        return name in self._instances
+    
+    def warm_up(self, names: Optional[Iterable[str]] = None, background: bool = True,
+                after: Optional[Callable[[], None]] = None) -> Optional[threading.Thread]:
+        """Build agents ahead of their first use, then run after (e.g. cache preloading)
+        
+        In the foreground errors propagate. In the background the thread is
+        returned, and failures are logged and left to surface again on first use.
+        """
+        names = list(names) if names is not None else self.names()
+        
+        if not background:
+            for name in names:
+                self.get(name)
+            if after:
+                after()
+            return None
+        
+        def build_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️  Warmup of {name} agent failed: {e}")
+            try:
+                if after:
+                    after()
+            except Exception as e:
+                print(f"⚠️  Warmup failed: {e}")
+        
+        self._warmup_thread = threading.Thread(target=build_all, name="agent-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a background warmup to finish; True once every agent is built"""
+        if self._warmup_thread:
+            self._warmup_thread.join(timeout)
+        return all(self.is_loaded(name) for name in self._factories)
+    
+    def get_status(self) -> Dict[str, bool]:
+        """Whether each registered agent has been built"""
+        return {name: self.is_loaded(name) for name in self._factories}
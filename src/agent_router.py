@@ -1,60 +1,225 @@
 # src/agent_router.py - STEP 6: New file for routing between agents
+import os
 import re
-from typing import Tuple, Optional
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple, Optional
+
+import numpy as np
+
 from redis_manager import RedisManager
+from intent_classifier import IntentClassifier
+from config import Config
 
-class AgentRouter:
-    """Routes messages to appropriate agents based on content and context"""
+# Routing features as (name, agent, kind, spec, weight):
+#   word     - regex matching a whole word
+#   phrase   - word regexes separated by whitespace; the last only has to match the start of its word
+#   keyword  - substring anywhere in the message
+#   question - whitespace-delimited question word
+#   email    - an email address (might be searching orders by email)
+# Scores add up in this order, so keep each agent's features in a fixed sequence.
+ROUTING_FEATURES = [
+    # Order patterns (higher weights for exact matches)
+    ("order_id", "order", "word", r"ord\d+", 0.4),
+    ("order_number", "order", "phrase", (r"order", r"(?:id|number|#)"), 0.4),
+    ("track_order", "order", "phrase", (r"track\w*", r"order\b"), 0.4),
+    ("where_is_my_order", "order", "phrase", (r"where", r"is", r"my", r"order\b"), 0.4),
+    ("order_status", "order", "phrase", (r"order", r"status\b"), 0.4),
+    ("tracking_number", "order", "phrase", (r"tracking", r"number\b"), 0.4),
+    ("delivery_date", "order", "phrase", (r"delivery", r"date\b"), 0.4),
+    ("shipping_status", "order", "phrase", (r"shipping", r"status\b"), 0.4),
     
-    def __init__(self, redis_manager: RedisManager):
-        self.redis = redis_manager
+    # Order keywords
+    ("kw_order", "order", "keyword", "order", 0.3),
+    ("kw_tracking", "order", "keyword", "tracking", 0.4),
+    ("kw_delivery", "order", "keyword", "delivery", 0.3),
+    ("kw_shipped", "order", "keyword", "shipped", 0.4),
+    ("kw_delivered", "order", "keyword", "delivered", 0.4),
+    ("kw_status", "order", "keyword", "status", 0.2),
+    ("email", "order", "email", r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b", 0.5),
+    
+    # FAQ patterns
+    ("return_policy", "faq", "phrase", (r"return", r"policy\b"), 0.3),
+    ("shipping_policy", "faq", "phrase", (r"shipping", r"policy\b"), 0.3),
+    ("payment_method", "faq", "phrase", (r"payment", r"method\b"), 0.3),
+    ("how_to_return", "faq", "phrase", (r"how", r"to", r"return\b"), 0.3),
+    ("warranty", "faq", "word", r"warranty", 0.3),
+    ("cancel_order", "faq", "phrase", (r"cancel", r"order\b"), 0.3),
+    ("contact_support", "faq", "phrase", (r"contact", r"support\b"), 0.3),
+    ("business_hours", "faq", "phrase", (r"business", r"hours\b"), 0.3),
+    ("customer_service", "faq", "phrase", (r"customer", r"service\b"), 0.3),
+    ("refund", "faq", "word", r"refund", 0.3),
+    ("exchange", "faq", "word", r"exchange", 0.3),
+    
+    # Question words
+    *[(f"q_{word}", "faq", "question", word, 0.1)
+      for word in ["how", "what", "when", "where", "why", "can", "do", "does", "is", "are"]],
+    
+    # Policy keywords
+    ("kw_policy", "faq", "keyword", "policy", 0.3),
+    ("kw_return", "faq", "keyword", "return", 0.2),
+    ("kw_refund", "faq", "keyword", "refund", 0.2),
+    ("kw_shipping", "faq", "keyword", "shipping", 0.1),
+    ("kw_payment", "faq", "keyword", "payment", 0.2),
+    ("kw_warranty", "faq", "keyword", "warranty", 0.3),
+    ("kw_support", "faq", "keyword", "support", 0.2),
+    ("kw_help", "faq", "keyword", "help", 0.1),
+    ("kw_contact", "faq", "keyword", "contact", 0.2),
+]
+
+@dataclass
+class ScoreBreakdown:
+    """Routing decision for one message together with everything that produced it"""
+    agent: str
+    confidence: float
+    order_score: float
+    faq_score: float
+    features: List[str] = field(default_factory=list)
+    context_bias: Dict[str, float] = field(default_factory=dict)
+
+class RoutingScanner:
+    """Finds every routing feature in a message in one pass over its words
+    
+    The message is split on whitespace once; each distinct word is analysed a
+    single time (keywords, whole-word patterns, email, phrase starts) and the
+    result memoized, so scanning a typical message is a few dict lookups.
+    Phrases are only checked where one of their first words occurs.
+    """
+    
+    WORD_PATTERN = re.compile(r"\w+")
+    MAX_CACHED_WORDS = 4096
+    
+    def __init__(self, features: List[Tuple] = None):
+        self.features = features or ROUTING_FEATURES
+        self.feature_positions = {name: position for position, (name, *_) in enumerate(self.features)}
         
-        # Define routing patterns
-        self.order_patterns = [
-            r'\bORD\d+\b',  # Order ID pattern
-            r'\border\s+(id|number|#)',
-            r'\btrack\w*\s+order\b',
-            r'\bwhere\s+is\s+my\s+order\b',
-            r'\border\s+status\b',
-            r'\btracking\s+number\b',
-            r'\bdelivery\s+date\b',
-            r'\bshipping\s+status\b'
-        ]
-        
-        self.faq_patterns = [
-            r'\breturn\s+policy\b',
-            r'\bshipping\s+policy\b',
-            r'\bpayment\s+method\b',
-            r'\bhow\s+to\s+return\b',
-            r'\bwarranty\b',
-            r'\bcancel\s+order\b',
-            r'\bcontact\s+support\b',
-            r'\bbusiness\s+hours\b',
-            r'\bcustomer\s+service\b',
-            r'\brefund\b',
-            r'\bexchange\b'
-        ]
-    
-    def route_message(self, message: str, session_id: str) -> Tuple[str, float]:
-        """
-        Route message to appropriate agent
-        Returns: (agent_name, confidence_score)
-        """
+        self.keywords = [(name, spec) for name, _, kind, spec, _ in self.features if kind == "keyword"]
+        self.question_words = {spec: name for name, _, kind, spec, _ in self.features if kind == "question"}
+        self.email_features = [(name, re.compile(spec)) for name, _, kind, spec, _ in self.features if kind == "email"]
         
-        message_lower = message.lower()
+        # Whole-word patterns share one alternation; the named group that matched is the feature
+        word_features = [(name, spec) for name, _, kind, spec, _ in self.features if kind == "word"]
+        self.word_pattern = re.compile("|".join(f"(?P<{name}>{spec})" for name, spec in word_features), re.IGNORECASE)
         
-        # Calculate scores for each agent type
-        order_score = self._calculate_order_score(message_lower)
-        faq_score = self._calculate_faq_score(message_lower)
+        self.phrases = [(name, re.compile(spec[0], re.IGNORECASE), [re.compile(step, re.IGNORECASE) for step in spec[1:]])
+                        for name, _, kind, spec, _ in self.features if kind == "phrase"]
         
-        # Consider conversation context
-        context_bias = self._get_context_bias(session_id)
+        self._word_cache: Dict[str, Tuple[Tuple[str, ...], Tuple[int, ...]]] = {}
         
-        # Apply context bias
-        order_score += context_bias.get("order", 0)
-        faq_score += context_bias.get("faq", 0)
+        # One weight column per agent for scoring feature matrices
+        self.agents = list(dict.fromkeys(agent for _, agent, _, _, _ in self.features))
+        self.weight_matrix = np.zeros((len(self.features), len(self.agents)))
+        for position, (_, agent, _, _, weight) in enumerate(self.features):
+            self.weight_matrix[position, self.agents.index(agent)] = weight
+    
+    def _analyse_word(self, word: str) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+        """Features found within one whitespace-delimited word, and the phrases it can start"""
+        analysis = self._word_cache.get(word)
+        if analysis is not None:
+            return analysis
         
-        # Determine best agent
+        hits = [name for name, keyword in self.keywords if keyword in word]
+        if word in self.question_words:
+            hits.append(self.question_words[word])
+        if "@" in word:
+            hits.extend(name for name, pattern in self.email_features if pattern.search(word))
+        
+        parts = self.WORD_PATTERN.findall(word)
+        for part in parts:
+            match = self.word_pattern.fullmatch(part)
+            if match:
+                hits.append(match.lastgroup)
+        
+        # A phrase continues into the next word only from a word part right at the end
+        tail = parts[-1] if parts and word.endswith(parts[-1]) else None
+        starts = tuple(position for position, (_, first, _) in enumerate(self.phrases) if tail and first.fullmatch(tail))
+        
+        if len(self._word_cache) >= self.MAX_CACHED_WORDS:
+            self._word_cache.clear()
+        analysis = self._word_cache[word] = (tuple(hits), starts)
+        return analysis
+    
+    def scan(self, message: str) -> set:
+        """Names of all features present in a lowercased message"""
+        words = message.split()
+        hits = set()
+        word_cache = self._word_cache
+        
+        for position, word in enumerate(words):
+            analysis = word_cache.get(word)
+            if analysis is None:
+                analysis = self._analyse_word(word)
+            word_hits, phrase_starts = analysis
+            if word_hits:
+                hits.update(word_hits)
+            
+            for phrase in phrase_starts:
+                name, _, steps = self.phrases[phrase]
+                following = words[position + 1:position + 1 + len(steps)]
+                if (len(following) == len(steps)
+                        and all(step.fullmatch(next_word) for step, next_word in zip(steps[:-1], following))
+                        and steps[-1].match(following[-1])):
+                    hits.add(name)
+        
+        return hits
+    
+    def scores(self, hits: set) -> Dict[str, float]:
+        """Score per agent from feature hits, capped at 1.0"""
+        scores = {"order": 0.0, "faq": 0.0}
+        for position in sorted(self.feature_positions[name] for name in hits):
+            _, agent, _, _, weight = self.features[position]
+            scores[agent] += weight
+        return {agent: min(score, 1.0) for agent, score in scores.items()}
+    
+    def feature_matrix(self, messages: Sequence[str]) -> np.ndarray:
+        """Boolean matrix with one row per lowercased message and one column per feature"""
+        rows, columns = [], []
+        for row, message in enumerate(messages):
+            for name in self.scan(message):
+                rows.append(row)
+                columns.append(self.feature_positions[name])
+        
+        matrix = np.zeros((len(messages), len(self.features)), dtype=bool)
+        matrix[rows, columns] = True
+        return matrix
+    
+    def score_matrix(self, features: np.ndarray) -> np.ndarray:
+        """Capped scores with one row per message and one column per agent (see self.agents)
+        
+        Feature columns are added one at a time in declaration order, so every
+        row sums exactly as scores() would and thresholds see identical values.
+        """
+        scores = np.zeros((len(features), len(self.agents)))
+        for position in np.flatnonzero(features.any(axis=0)):
+            scores += features[:, position, None] * self.weight_matrix[position]
+        return np.minimum(scores, 1.0)
+
+class AgentRouter:
+    """Routes messages to appropriate agents based on content and context"""
+    
+    def __init__(self, redis_manager: RedisManager, classifier: Optional[IntentClassifier] = None):
+        self.redis = redis_manager
+        
+        # Patterns, keywords and question words, all found in one scan per message
+        self.scanner = RoutingScanner()
+        
+        # A trained intent classifier replaces the hand-tuned weights when one is configured
+        self.classifier = classifier
+        if self.classifier is None and Config.ROUTER_MODEL_PATH and os.path.exists(Config.ROUTER_MODEL_PATH):
+            self.classifier = IntentClassifier.load(Config.ROUTER_MODEL_PATH)
+            print(f"🧠 Routing with intent classifier from {Config.ROUTER_MODEL_PATH}")
+        
+        # LRU of content-only scores per normalized message; context bias is applied per session afterwards
+        self.cache_size = Config.ROUTER_CACHE_SIZE
+        self._score_cache: "OrderedDict[str, Tuple[Dict[str, float], frozenset]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    @staticmethod
+    def decide(order_score: float, faq_score: float) -> Tuple[str, float]:
+        """Pick an agent from (context-biased) scores"""
         if order_score > faq_score and order_score > 0.3:
             return "order_lookup", order_score
         elif faq_score > 0.2:
@@ -63,105 +228,172 @@ class AgentRouter:
             # Default to FAQ agent for general questions
             return "faq", 0.5
     
-    def _calculate_order_score(self, message: str) -> float:
-        """Calculate confidence score for order-related queries"""
-        score = 0.0
-        
-        # Check for order patterns (higher weights for exact matches)
-        for pattern in self.order_patterns:
-            if re.search(pattern, message, re.IGNORECASE):
-                score += 0.4  # STEP 6: FIX - Increased from 0.3 for better confidence
-        
-        # Boost score for specific order-related keywords
-        order_keywords = {
-            "order": 0.3,  # Increased
-            "tracking": 0.4,  # Increased
-            "delivery": 0.3,  # Increased
-            "shipped": 0.4,
-            "delivered": 0.4,
-            "status": 0.2  # Increased
-        }
+    def _content_scores(self, message: str, features: set) -> Dict[str, float]:
+        """Per-agent scores from the message text alone"""
+        if self.classifier is None:
+            return self.scanner.scores(features)
+        
+        probabilities = self.classifier.predict_proba(message)
+        return {"order": probabilities.get("order_lookup", 0.0), "faq": probabilities.get("faq", 0.0)}
+    
+    @staticmethod
+    def normalize_message(message: str) -> str:
+        """Cache key for a message: lowercased with whitespace collapsed (neither changes its scores)"""
+        return " ".join(message.lower().split())
+    
+    def _cached_content_scores(self, message: str) -> Tuple[Dict[str, float], frozenset]:
+        """Content-only scores and features for a message, from the LRU when it was seen before"""
+        key = self.normalize_message(message)
         
-        for keyword, weight in order_keywords.items():
-            if keyword in message:
-                score += weight
-        
-        # Check for email pattern (might be searching orders by email)
-        if re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', message):
-            score += 0.5  # Increased from 0.4
-        
-        return min(score, 1.0)  # Cap at 1.0
-    
-    def _calculate_faq_score(self, message: str) -> float:
-        """Calculate confidence score for FAQ-related queries"""
-        score = 0.0
-        
-        # Check for FAQ patterns
-        for pattern in self.faq_patterns:
-            if re.search(pattern, message, re.IGNORECASE):
-                score += 0.3
-        
-        # Boost score for question words
-        question_words = ["how", "what", "when", "where", "why", "can", "do", "does", "is", "are"]
-        for word in question_words:
-            if f" {word} " in f" {message} ":
-                score += 0.1
-        
-        # Boost for policy-related keywords
-        policy_keywords = {
-            "policy": 0.3,
-            "return": 0.2,
-            "refund": 0.2,
-            "shipping": 0.1,
-            "payment": 0.2,
-            "warranty": 0.3,
-            "support": 0.2,
-            "help": 0.1,
-            "contact": 0.2
+        with self._cache_lock:
+            cached = self._score_cache.get(key)
+            if cached is not None:
+                self._score_cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+        
+        features = frozenset(self.scanner.scan(key))
+        cached = (self._content_scores(key, features), features)
+        
+        if self.cache_size > 0:
+            with self._cache_lock:
+                self._score_cache[key] = cached
+                if len(self._score_cache) > self.cache_size:
+                    self._score_cache.popitem(last=False)
+        return cached
+    
+    def get_cache_stats(self) -> Dict[str, float]:
+        """Routing score cache size and hit rate"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._score_cache),
+            "max_entries": self.cache_size,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0
         }
+    
+    def _content_score_matrix(self, messages: Sequence[str], features: np.ndarray) -> np.ndarray:
+        """Per-agent scores for a batch, one column per agent in self.scanner.agents"""
+        if self.classifier is None:
+            return self.scanner.score_matrix(features)
         
-        for keyword, weight in policy_keywords.items():
-            if keyword in message:
-                score += weight
+        probabilities = self.classifier.predict_proba_batch(messages)
+        scores = np.zeros((len(messages), len(self.scanner.agents)))
+        for agent, label in [("order", "order_lookup"), ("faq", "faq")]:
+            if label in self.classifier.labels:
+                scores[:, self.scanner.agents.index(agent)] = probabilities[:, self.classifier.labels.index(label)]
+        return scores
+    
+    def route_message(self, message: str, session_id: str, session_context: Optional[Dict] = None) -> Tuple[str, float]:
+        """
+        Route message to appropriate agent
+        Returns: (agent_name, confidence_score)
         
-        return min(score, 1.0)  # Cap at 1.0
+        Pass the session context returned by the last RedisManager.add_message
+        (or {} for a new session) to skip reading it from Redis.
+        """
+        breakdown = self.score_message(message, session_id, session_context)
+        return breakdown.agent, breakdown.confidence
     
-    def _get_context_bias(self, session_id: str) -> dict:
-        """Get routing bias based on conversation context"""
-        bias = {"order": 0.0, "faq": 0.0}
+    def score_message(self, message: str, session_id: str, session_context: Optional[Dict] = None) -> ScoreBreakdown:
+        """Score a message for every agent and pick one, keeping the features behind the decision"""
+        
+        # Calculate scores for each agent type (content only, so they can be shared across sessions)
+        scores, features = self._cached_content_scores(message)
+        
+        # Consider conversation context
+        if session_context is None:
+            session_context = self.redis.get_session_context(session_id)
+        context_bias = self._context_bias_from_session(session_context)
         
-        # Get recent conversation history
-        history = self.redis.get_conversation_history(session_id, limit=3)
+        # Apply context bias
+        order_score = scores["order"] + context_bias.get("order", 0)
+        faq_score = scores["faq"] + context_bias.get("faq", 0)
+        
+        # Determine best agent
+        agent, confidence = self.decide(order_score, faq_score)
+        
+        return ScoreBreakdown(agent, confidence, scores["order"], scores["faq"],
+                              sorted(features, key=self.scanner.feature_positions.get), context_bias)
+    
+    def route_messages(self, batch: Sequence[Tuple[str, str]]) -> List[Tuple[str, float]]:
+        """
+        Route many (message, session_id) pairs at once
+        Returns: (agent_name, confidence_score) per pair, in order
+        
+        Context for every session is read in one pipelined round trip, before any
+        of the batch is handled, and all messages are scored as one feature matrix.
+        """
+        agents, confidences, _, _ = self._route_batch(batch)
+        return [(agent, float(confidence)) for agent, confidence in zip(agents, confidences)]
+    
+    def score_messages(self, batch: Sequence[Tuple[str, str]]) -> List[ScoreBreakdown]:
+        """Score many (message, session_id) pairs at once, keeping the features behind each decision"""
+        agents, confidences, features, biases = self._route_batch(batch)
+        scores = self._content_score_matrix([message.lower() for message, _ in batch], features)
+        order_column, faq_column = self.scanner.agents.index("order"), self.scanner.agents.index("faq")
+        
+        return [ScoreBreakdown(agent, float(confidence), float(row_scores[order_column]), float(row_scores[faq_column]),
+                               [self.scanner.features[position][0] for position in np.flatnonzero(row_features)], bias)
+                for agent, confidence, row_scores, row_features, bias
+                in zip(agents, confidences, scores, features, biases)]
+    
+    def _route_batch(self, batch: Sequence[Tuple[str, str]]) -> Tuple[List[str], np.ndarray, np.ndarray, List[Dict[str, float]]]:
+        """Agents, confidences, feature matrix and context biases for a batch"""
+        messages = [message.lower() for message, _ in batch]
+        session_ids = [session_id for _, session_id in batch]
+        
+        contexts = self.redis.get_session_contexts(session_ids)
+        session_bias = {session_id: self._context_bias_from_session(context) for session_id, context in contexts.items()}
+        biases = [session_bias[session_id] for session_id in session_ids]
         
-        if not history:
-            return bias
+        features = self.scanner.feature_matrix(messages)
+        scores = self._content_score_matrix(messages, features)
         
-        # Look at recent messages for context clues
-        recent_text = " ".join([msg["content"].lower() for msg in history[-2:]])
+        # Apply context bias
+        order_scores = scores[:, self.scanner.agents.index("order")] + np.array([bias["order"] for bias in biases])
+        faq_scores = scores[:, self.scanner.agents.index("faq")] + np.array([bias["faq"] for bias in biases])
         
-        # If recent conversation mentioned orders, bias toward order agent
-        if any(word in recent_text for word in ["order", "tracking", "delivery", "shipped"]):
-            bias["order"] += 0.2
+        # Same decision rule as decide(), for every row at once
+        to_order = (order_scores > faq_scores) & (order_scores > 0.3)
+        to_faq = ~to_order & (faq_scores > 0.2)
+        confidences = np.where(to_order, order_scores, np.where(to_faq, faq_scores, 0.5))
+        agents = ["order_lookup" if routed else "faq" for routed in to_order]
+        
+        return agents, confidences, features, biases
+    
+    def _get_context_bias(self, session_id: str) -> dict:
+        """Get routing bias based on conversation context"""
+        return self._context_bias_from_session(self.redis.get_session_context(session_id))
+    
+    def _context_bias_from_session(self, session_context: Optional[Dict]) -> dict:
+        """Routing bias from the topics of the session's last two messages"""
+        bias = {"order": 0.0, "faq": 0.0}
+        topics = RedisManager.recent_topics(session_context)
         
-        # If recent conversation was about policies, bias toward FAQ
-        if any(word in recent_text for word in ["policy", "return", "refund", "warranty"]):
-            bias["faq"] += 0.2
+        # If recent conversation mentioned orders (or policies), bias toward that agent
+        for topic, bit, _ in RedisManager.SESSION_TOPICS:
+            if topics & bit:
+                bias[topic] += 0.2
         
         return bias
     
     def get_routing_explanation(self, message: str, session_id: str) -> str:
         """Get explanation of why message was routed to specific agent"""
-        agent, score = self.route_message(message, session_id)
-        
-        order_score = self._calculate_order_score(message.lower())
-        faq_score = self._calculate_faq_score(message.lower())
+        breakdown = self.score_message(message, session_id)
+        agent = breakdown.agent
         
         explanation = f"🤖 **Routing Decision:**\n"
         explanation += f"Selected Agent: **{agent.replace('_', ' ').title()}**\n"
-        explanation += f"Confidence: {score:.2f}\n\n"
+        explanation += f"Confidence: {breakdown.confidence:.2f}\n\n"
         explanation += f"**Scores:**\n"
-        explanation += f"- Order Agent: {order_score:.2f}\n"
-        explanation += f"- FAQ Agent: {faq_score:.2f}\n\n"
+        explanation += f"- Order Agent: {breakdown.order_score:.2f}\n"
+        explanation += f"- FAQ Agent: {breakdown.faq_score:.2f}\n"
+        if breakdown.features:
+            explanation += f"- Matched: {', '.join(breakdown.features)}\n"
+        explanation += "\n"
         
         # Add reasoning
         if agent == "order_lookup":
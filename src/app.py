@@ -4,6 +4,8 @@ import os
 import asyncio
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import uuid
@@ -47,12 +49,12 @@ class UserProfile:
 class CustomerSupportApp:
     """Enhanced production-ready customer support application"""
     
-    def __init__(self):
+    def __init__(self, warmup: Optional[str] = None):
         self.config = Config()
         self.logger = logging.getLogger(__name__)
         
-        # Initialize core components
-        self.router = CustomerSupportRouter()
+        # Initialize core components (warmup="lazy" for tools that never chat, so no agent is built)
+        self.router = CustomerSupportRouter(warmup)
         self.redis = self.router.redis
         
         # Application state
@@ -60,12 +62,20 @@ class CustomerSupportApp:
         self.analytics = AnalyticsManager(self.redis)
         self.monitor = SystemMonitor(self.redis)
         
+        # Background order prefetch (bounded so session creation never waits on it)
+        self._prefetch_executor = ThreadPoolExecutor(
+            max_workers=self.config.PREFETCH_MAX_WORKERS,
+            thread_name_prefix="order-prefetch"
+        )
+        self._prefetch_slots = threading.BoundedSemaphore(self.config.PREFETCH_MAX_PENDING)
+        
         # Create logs directory if it doesn't exist
         os.makedirs('logs', exist_ok=True)
         
         self.logger.info("Customer Support App initialized")
         
-    def create_enhanced_session(self, user_profile: UserProfile, metadata: Dict = None) -> Dict[str, Any]:
+    def create_enhanced_session(self, user_profile: UserProfile, metadata: Dict = None,
+                                prefetch_orders: Optional[bool] = None) -> Dict[str, Any]:
         """Create an enhanced session with full user profile and metadata"""
         
         session_id = self._generate_session_id()
@@ -105,12 +115,18 @@ class CustomerSupportApp:
                 # Track analytics
                 self.analytics.track_session_created(session_id, user_data)
                 
+                # Warm the customer's orders so the first order question is a cache hit
+                if prefetch_orders is None:
+                    prefetch_orders = self.config.PREFETCH_ORDERS_ON_SESSION_START
+                prefetch_scheduled = bool(prefetch_orders and user_profile.email) and self._schedule_order_prefetch(user_profile.email)
+                
                 return {
                     "success": True,
                     "session_id": session_id,
                     "welcome_message": result["welcome_message"],
                     "user_profile": user_profile,
-                    "session_info": self._get_session_info(session_id)
+                    "session_info": self._get_session_info(session_id),
+                    "order_prefetch_scheduled": prefetch_scheduled
                 }
             else:
                 self.logger.error(f"❌ Failed to create session: {result.get('error')}")
@@ -126,6 +142,29 @@ class CustomerSupportApp:
                 "error": str(e)
             }
     
+    def _schedule_order_prefetch(self, email: str) -> bool:
+        """Prefetch a customer's recent orders in the background without blocking"""
+        # Skip rather than queue when too many prefetches are already in flight
+        if not self._prefetch_slots.acquire(blocking=False):
+            self.logger.info(f"Order prefetch skipped for {email}: prefetch queue is full")
+            return False
+        
+        def prefetch():
+            try:
+                self.router.order_cache.prefetch_customer_orders(email, limit=self.config.ORDER_PAGE_SIZE)
+            except Exception as e:
+                self.logger.error(f"Order prefetch failed for {email}: {e}")
+            finally:
+                self._prefetch_slots.release()
+        
+        try:
+            self._prefetch_executor.submit(prefetch)
+        except RuntimeError:
+            self._prefetch_slots.release()
+            return False
+        
+        return True
+    
     def _generate_session_id(self) -> str:
         """Generate a unique session ID"""
         timestamp = int(datetime.now().timestamp())
@@ -395,6 +434,7 @@ Thank you for choosing our support! 🙏"""
             "analytics_summary": self.analytics.get_summary(),
             "active_sessions": len([s for s in self.sessions.values() if s["status"] == SessionStatus.ACTIVE]),
             "redis_stats": self.redis.get_stats(),
+            "agents_loaded": self.router.agents.get_status(),
             "recent_activity": self._get_recent_activity()
         }
     
@@ -8,6 +8,20 @@ class Config:
     # OpenAI
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     
+    # Optional OpenAI-compatible endpoint (e.g. a local stand-in server for testing)
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
+    
+    # Connection pool shared by every LLM client
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', 10))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', 30.0))
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60.0))
+    
+    # Exact-match LLM response cache in Redis
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 3600))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 10000))
+    
     # Redis
     REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
     REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
@@ -17,6 +31,57 @@ class Config:
     DEFAULT_SESSION_TTL = int(os.getenv('DEFAULT_SESSION_TTL', 3600))
     MAX_CONVERSATION_LENGTH = int(os.getenv('MAX_CONVERSATION_LENGTH', 50))
     
+    # Order cache encoding: "json" (one string per order) or "hash" (one Redis hash field per order field)
+    ORDER_CACHE_ENCODING = os.getenv('ORDER_CACHE_ENCODING', 'json')
+    
+    # Order change feed: a stable consumer name (e.g. the pod name) keeps pending events across restarts;
+    # events left unacknowledged longer than the idle time by any consumer are claimed and applied
+    ORDER_CHANGE_CONSUMER = os.getenv('ORDER_CHANGE_CONSUMER', '')
+    ORDER_CHANGE_CLAIM_IDLE_MS = int(os.getenv('ORDER_CHANGE_CLAIM_IDLE_MS', 60000))
+    
+    # Orders per page of an email search; the session-start prefetch warms the same first page the order agent reads
+    ORDER_PAGE_SIZE = int(os.getenv('ORDER_PAGE_SIZE', 5))
+    
+    # Order prefetch on session start
+    PREFETCH_ORDERS_ON_SESSION_START = os.getenv('PREFETCH_ORDERS_ON_SESSION_START', 'true').lower() == 'true'
+    PREFETCH_MAX_WORKERS = int(os.getenv('PREFETCH_MAX_WORKERS', 2))
+    PREFETCH_MAX_PENDING = int(os.getenv('PREFETCH_MAX_PENDING', 8))
+    
+    # FAQ corpus source: a JSON file or a Redis hash (the built-in corpus is used if neither is set)
+    FAQ_CORPUS_PATH = os.getenv('FAQ_CORPUS_PATH', '')
+    FAQ_CORPUS_REDIS_KEY = os.getenv('FAQ_CORPUS_REDIS_KEY', '')
+    FAQ_CORPUS_WATCH_INTERVAL = float(os.getenv('FAQ_CORPUS_WATCH_INTERVAL', 5))
+    
+    # Semantic FAQ cache: reuse a cached search for a query within this cosine distance
+    FAQ_SEMANTIC_CACHE_ENABLED = os.getenv('FAQ_SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+    FAQ_SEMANTIC_CACHE_MAX_DISTANCE = float(os.getenv('FAQ_SEMANTIC_CACHE_MAX_DISTANCE', 0.25))
+    FAQ_SEMANTIC_CACHE_SIZE = int(os.getenv('FAQ_SEMANTIC_CACHE_SIZE', 1000))
+    
+    # FAQ popularity: a search counts half as much after each half-life; warmup preloads the top N queries
+    FAQ_POPULARITY_HALF_LIFE = int(os.getenv('FAQ_POPULARITY_HALF_LIFE', 86400))
+    FAQ_PRELOAD_TOP_N = int(os.getenv('FAQ_PRELOAD_TOP_N', 20))
+    
+    # Routing intent classifier (.npz from `python src/intent_classifier.py train`); rules are used without one
+    ROUTER_MODEL_PATH = os.getenv('ROUTER_MODEL_PATH', '')
+    
+    # Agent startup: "background" (build agents and preload caches in a thread), "eager" or "lazy" (on first use)
+    AGENT_WARMUP = os.getenv('AGENT_WARMUP', 'background')
+    
+    # Fast path: answer unambiguous order lookups and strong FAQ matches with one tool call, skipping the LLM
+    FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true'
+    FAST_PATH_FAQ_MIN_SCORE = float(os.getenv('FAST_PATH_FAQ_MIN_SCORE', 6.0))
+    FAST_PATH_FAQ_MIN_MARGIN = float(os.getenv('FAST_PATH_FAQ_MIN_MARGIN', 2.0))
+    
+    # Semantic cache of complete FAQ agent answers (a share of hits is re-checked against a fresh FAQ search)
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_MIN_SIMILARITY = float(os.getenv('RESPONSE_CACHE_MIN_SIMILARITY', 0.85))
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1000))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 3600))
+    RESPONSE_CACHE_VALIDATION_RATE = float(os.getenv('RESPONSE_CACHE_VALIDATION_RATE', 0.1))
+    
+    # Routing score cache: normalized messages whose content scores are kept (0 disables it)
+    ROUTER_CACHE_SIZE = int(os.getenv('ROUTER_CACHE_SIZE', 2048))
+    
     @classmethod
     def validate(cls):
         """Validate required configuration"""
@@ -1,27 +1,139 @@
 # src/faq_cache_manager.py - STEP 5: New file for FAQ caching
 import sys
 import os
-from typing import Optional, Dict, List, Tuple
+import asyncio
+import functools
+from typing import Optional, Dict, List, Tuple, Any, Callable
 import time
 
 # Add data directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
 
 from redis_manager import RedisManager
-from faq import search_faqs as db_search_faqs, get_best_faq_answer as db_get_best_faq_answer
+from semantic_cache import SemanticQueryCache
+from config import Config
+from faq import get_best_faq_answer as db_get_best_faq_answer
+from faq import faq_db
+from async_adapter import ThreadPoolBackendAdapter
 
 class FAQCacheManager:
     """Manages FAQ data with Redis caching layer"""
     
-    def __init__(self, redis_manager: RedisManager):
+    SEARCH_TTL = 3600  # 1 hour
+    
+    # Preloaded until real traffic has made enough queries popular
+    DEFAULT_PRELOAD_QUERIES = [
+        "return policy", "shipping policy", "track order",
+        "payment methods", "contact support", "warranty",
+        "cancel order", "account issues", "business hours"
+    ]
+    RENDERED_ANSWER_LIMIT = 1024
+    
+    def __init__(self, redis_manager: RedisManager, backend=None, semantic_cache: Optional[SemanticQueryCache] = None):
         self.redis = redis_manager
+        self.backend = backend or faq_db
+        
+        # Async access to the FAQ backend (blocking backends run in a thread pool)
+        self.async_backend = ThreadPoolBackendAdapter(self.backend)
+        
+        # Near-duplicate queries reuse a cached search instead of missing
+        self.semantic_cache = semantic_cache
+        if self.semantic_cache is None and Config.FAQ_SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = SemanticQueryCache(redis_manager, Config.FAQ_SEMANTIC_CACHE_MAX_DISTANCE,
+                                                     Config.FAQ_SEMANTIC_CACHE_SIZE)
+            self.semantic_cache.load_from_redis()
+        
+        # Rendered tool outputs per query cache key, valid for one corpus version
+        self._rendered_answers: Dict[str, str] = {}
+        self._rendered_version = None
+    
+    def get_search_key(self, query: str) -> str:
+        """Redis cache key (without the cache: prefix) of a query's FAQ search
+        
+        Keys come from the backend's cache_key(), so equivalent phrasings share a
+        cached search under whichever backend this manager serves.
+        """
+        return self.redis.get_faq_search_key(self.backend.cache_key(query))
+    
+    async def _run_blocking(self, function: Callable, *args, **kwargs) -> Any:
+        """Run a blocking Redis call in the backend thread pool so the event loop stays free"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.async_backend.executor, functools.partial(function, *args, **kwargs))
+    
+    def _get_semantic_match(self, query: str) -> Optional[List[Tuple[str, Dict, float]]]:
+        """Cached results of a near-duplicate query, if the semantic cache knows one"""
+        if self.semantic_cache is None:
+            return None
+        
+        match = self.semantic_cache.lookup(query)
+        if match is None:
+            return None
+        
+        cache_key, similarity = match
+        cached_results = self.redis.get_cached_faq_search_by_key(cache_key)
+        if not cached_results:
+            # Invalidated in Redis before its TTL ran out
+            self.semantic_cache.remove(cache_key)
+            return None
+        
+        print(f"🧠 Semantic cache HIT for FAQ search: '{query}' (similarity {similarity:.2f})")
+        
+        # Cache under the query's own key so repeats hit exactly and reloads invalidate it, but
+        # keep it out of the semantic index so matches cannot drift through chains of neighbours
+        self.redis.cache_faq_search(query, self.backend.cache_key(query), cached_results, self.SEARCH_TTL)
+        return cached_results
+    
+    def render_search_answer(self, query: str, results: Optional[List[Tuple[str, Dict, float]]] = None) -> Optional[str]:
+        """Markdown answer for a query (None if nothing matches)
+        
+        Repeats of a query, or of an equivalent phrasing, are a dict lookup that
+        skips both the search and the formatting until the corpus changes.
+        Pass results when the query was just searched.
+        """
+        version = getattr(self.backend, "version", None)
+        if version != self._rendered_version:
+            self._rendered_answers = {}
+            self._rendered_version = version
+        
+        cache_key = self.backend.cache_key(query)
+        rendered = self._rendered_answers.get(cache_key)
+        if rendered is not None:
+            print(f"🚀 Rendered answer HIT for FAQ search: '{query}'")
+            # Still a search as far as popularity is concerned (callers passing results already recorded it)
+            if results is None:
+                self.redis.track_faq_searches([query], [cache_key])
+            return rendered
+        
+        rendered = self.backend.render_search_results(results if results is not None else self.search_faqs(query))
+        if rendered is not None:
+            if len(self._rendered_answers) >= self.RENDERED_ANSWER_LIMIT:
+                # Drop the oldest entry (dicts keep insertion order)
+                self._rendered_answers.pop(next(iter(self._rendered_answers)))
+            self._rendered_answers[cache_key] = rendered
+        return rendered
+    
+    def get_confident_answer(self, query: str, min_score: float, min_margin: float) -> Optional[str]:
+        """Rendered answer only if the top match scores at least min_score and min_margin times the runner-up"""
+        results = self.search_faqs(query)
+        if not results or results[0][2] < min_score:
+            return None
+        if len(results) > 1 and results[0][2] < min_margin * results[1][2]:
+            return None
+        return self.render_search_answer(query, results)
+    
+    def _cache_search(self, query: str, results: List[Tuple[str, Dict, float]]) -> None:
+        """Cache search results and index the query for semantic lookups"""
+        query_key = self.backend.cache_key(query)
+        if self.redis.cache_faq_search(query, query_key, results, self.SEARCH_TTL) and self.semantic_cache is not None:
+            self.semantic_cache.add(query, self.redis.get_faq_search_key(query_key), self.SEARCH_TTL)
         
     def search_faqs(self, query: str, use_cache: bool = True) -> List[Tuple[str, Dict, float]]:
         """Search FAQs with Redis caching - STEP 5 FIX: Better type handling"""
         
         # Try cache first
         if use_cache:
-            cached_results = self.redis.get_cached_faq_search(query)
+            # One round trip reads the cache and records the search
+            cached_results = self.redis.get_cached_faq_searches([query], [self.backend.cache_key(query)], track=True)[0]
             if cached_results:
                 print(f"🚀 Cache HIT for FAQ search: '{query}'")
                 # Ensure we return the correct type
@@ -29,12 +141,16 @@ class FAQCacheManager:
                     return cached_results
                 else:
                     print("⚠️  Cached results format issue, fetching fresh data")
+            
+            semantic_results = self._get_semantic_match(query)
+            if semantic_results:
+                return semantic_results
         
         print(f"💾 Cache MISS for FAQ search: '{query}'")
         
         # Search in database
         start_time = time.time()
-        results = db_search_faqs(query)
+        results = self.backend.search_faqs(query)
         search_time = time.time() - start_time
         
         print(f"📊 FAQ search took {search_time:.2f}s, found {len(results)} results")
@@ -50,13 +166,89 @@ class FAQCacheManager:
                     print(f"⚠️  Skipping invalid result format: {type(result)}")
             
             if verified_results:
-                self.redis.cache_faq_search(query, verified_results)
+                self._cache_search(query, verified_results)
                 print(f"💾 Cached {len(verified_results)} FAQ search results for: '{query}'")
             
             return verified_results
         
         return results
     
+    def search_faqs_batch(self, queries: List[str], use_cache: bool = True) -> List[List[Tuple[str, Dict, float]]]:
+        """Search FAQs for many queries at once
+        
+        Cached queries are read with a single MGET, the rest are scored together in
+        one vectorized pass and written back in one pipeline.
+        """
+        results: List[Optional[List[Tuple[str, Dict, float]]]] = [None] * len(queries)
+        
+        # Score each uncached cache key only once (equivalent phrasings share a key)
+        cache_keys = {query: self.backend.cache_key(query) for query in set(queries)}
+        
+        if use_cache:
+            cached = self.redis.get_cached_faq_searches(queries, [cache_keys[query] for query in queries], track=True)
+            for position, cached_results in enumerate(cached):
+                if cached_results and isinstance(cached_results[0], tuple):
+                    results[position] = cached_results
+        
+        missing_by_key = {}
+        for query, result in zip(queries, results):
+            if result is None:
+                missing_by_key.setdefault(cache_keys[query], query)
+        missing_queries = list(missing_by_key.values())
+        print(f"🚀 Batch FAQ search: {len(queries) - sum(result is None for result in results)} cache hits, "
+              f"{len(missing_queries)} distinct queries to score")
+        
+        if missing_queries:
+            start_time = time.time()
+            fresh_results = dict(zip(missing_queries, self.backend.search_faqs_batch(missing_queries)))
+            search_time = time.time() - start_time
+            
+            print(f"📊 Batch FAQ search took {search_time:.2f}s for {len(missing_queries)} queries")
+            
+            if use_cache:
+                cached_count = self.redis.cache_faq_searches({query: query_results for query, query_results in fresh_results.items() if query_results},
+                                                             cache_keys)
+                print(f"💾 Cached {cached_count} FAQ searches")
+            
+            results_by_key = {cache_keys[query]: query_results for query, query_results in fresh_results.items()}
+            for position, query in enumerate(queries):
+                if results[position] is None:
+                    results[position] = results_by_key[cache_keys[query]]
+        
+        return results
+    
+    async def asearch_faqs(self, query: str, use_cache: bool = True) -> List[Tuple[str, Dict, float]]:
+        """Search FAQs with Redis caching without blocking the event loop on the backend or Redis"""
+        if use_cache:
+            cached_results = (await self._run_blocking(self.redis.get_cached_faq_searches, [query],
+                                                       [self.backend.cache_key(query)], track=True))[0]
+            if cached_results and isinstance(cached_results[0], tuple):
+                print(f"🚀 Cache HIT for FAQ search: '{query}'")
+                return cached_results
+            
+            semantic_results = await self._run_blocking(self._get_semantic_match, query)
+            if semantic_results:
+                return semantic_results
+        
+        print(f"💾 Cache MISS for FAQ search: '{query}'")
+        
+        results = await self.async_backend.asearch_faqs(query)
+        
+        if use_cache and results:
+            verified_results = [result for result in results if isinstance(result, tuple) and len(result) == 3]
+            if verified_results:
+                await self._run_blocking(self._cache_search, query, verified_results)
+            return verified_results
+        
+        return results
+    
+    async def aget_best_faq_answer(self, query: str, use_cache: bool = True) -> Optional[str]:
+        """Get best FAQ answer with caching without blocking the event loop on the backend"""
+        results = await self.asearch_faqs(query, use_cache)
+        if results:
+            return results[0][1]["answer"]
+        return None
+    
     def get_best_faq_answer(self, query: str, use_cache: bool = True) -> Optional[str]:
         """Get best FAQ answer with caching"""
         
@@ -86,37 +278,99 @@ class FAQCacheManager:
         return suggestions
     
     def preload_common_faqs(self, common_queries: List[str]) -> int:
-        """Preload cache with common FAQ searches"""
-        
-        preloaded_count = 0
+        """Preload cache with common FAQ searches
         
+        Already cached queries are found with one MGET; the rest are searched in
+        one batch and written in one pipeline. Preloading is not counted as
+        traffic, so it never inflates the popularity it is based on.
+        """
         print("🔄 Preloading common FAQ searches...")
         
-        for query in common_queries:
-            # Check if already cached
-            if not self.redis.get_cached_faq_search(query):
-                # Force a search to populate cache
-                results = self.search_faqs(query, use_cache=True)
-                if results:
-                    preloaded_count += 1
-                    print(f"   Preloaded: '{query}' ({len(results)} results)")
+        cache_keys = {query: self.backend.cache_key(query) for query in common_queries}
+        cached = self.redis.get_cached_faq_searches(common_queries, [cache_keys[query] for query in common_queries])
+        missing_by_key = {}
+        for query, cached_results in zip(common_queries, cached):
+            if not cached_results:
+                missing_by_key.setdefault(cache_keys[query], query)
+        missing_queries = list(missing_by_key.values())
+        
+        preloaded_count = 0
+        if missing_queries:
+            fresh_results = {query: results for query, results in
+                             zip(missing_queries, self.backend.search_faqs_batch(missing_queries)) if results}
+            preloaded_count = self.redis.cache_faq_searches(fresh_results, cache_keys, self.SEARCH_TTL)
+            
+            if self.semantic_cache is not None:
+                for query in fresh_results:
+                    self.semantic_cache.add(query, self.redis.get_faq_search_key(cache_keys[query]), self.SEARCH_TTL)
+            for query, results in fresh_results.items():
+                print(f"   Preloaded: '{query}' ({len(results)} results)")
         
         print(f"✅ Preloaded {preloaded_count} FAQ searches")
         return preloaded_count
     
+    def get_preload_queries(self, top_n: int = 20) -> List[str]:
+        """The top_n most popular queries, topped up with the defaults while traffic is thin"""
+        queries = self.redis.get_popular_faq_queries(top_n)
+        cache_keys = {self.backend.cache_key(query) for query in queries}
+        
+        for query in self.DEFAULT_PRELOAD_QUERIES:
+            if len(queries) >= top_n:
+                break
+            cache_key = self.backend.cache_key(query)
+            if cache_key not in cache_keys:
+                cache_keys.add(cache_key)
+                queries.append(query)
+        
+        return queries
+    
+    def preload_popular_faqs(self, top_n: int = 20) -> int:
+        """Preload the searches real traffic asks for most"""
+        return self.preload_common_faqs(self.get_preload_queries(top_n))
+    
+    def get_query_collapse_stats(self, top_n: int = 10) -> Dict[str, any]:
+        """How well equivalent phrasings are being collapsed onto shared cache keys"""
+        return self.redis.get_faq_query_collapse_stats(top_n)
+    
+    def reload_corpus(self, faqs: Optional[Dict[str, Dict]] = None) -> Dict[str, any]:
+        """Reload the FAQ corpus and drop only the cached searches it affects"""
+        vocabulary = set(getattr(self.backend, "keywords_map", {}))
+        changes = self.backend.reload(faqs)
+        changed_ids = changes["updated"] + changes["removed"]
+        
+        # Searches that returned a changed or removed FAQ hold stale answers
+        stale_keys = self.redis.get_faq_searches_for(changed_ids)
+        
+        # A new or edited FAQ can also newly show up in cached searches that did not return it
+        matching_ids = changes["added"] + changes["updated"]
+        if matching_ids:
+            stale_keys.update(cache_key for cache_key, query in self.redis.get_cached_faq_search_queries().items()
+                              if self.backend.matches_any(query, matching_ids))
+        
+        invalidated = self.redis.delete_faq_searches(list(stale_keys))
+        self.redis.clear_faq_search_refs(changed_ids)
+        
+        if self.semantic_cache is not None:
+            if vocabulary != set(getattr(self.backend, "keywords_map", {})):
+                # Cache keys include the matched keyword phrases, so queries may now map to new keys
+                # and the index would lead them back to results cached under their old ones
+                self.semantic_cache.clear()
+            else:
+                for cache_key in stale_keys:
+                    self.semantic_cache.remove(cache_key)
+        
+        changes["invalidated_searches"] = invalidated
+        if changed_ids or changes["added"]:
+            print(f"🗑️  Invalidated {invalidated} cached FAQ searches after corpus reload")
+        return changes
+    
     def get_cache_performance_stats(self) -> Dict[str, any]:
         """Get FAQ cache performance statistics"""
         stats = self.redis.get_stats()
         return {
             "total_faq_cache_entries": stats.get("faq_cache", 0),
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else None,
+            "rendered_answers": len(self._rendered_answers),
             "cache_hit_benefit": "~0.2s saved per FAQ search",
-            "recommended_preload_queries": [
-                "return policy",
-                "shipping policy", 
-                "track order",
-                "payment methods",
-                "contact support",
-                "warranty",
-                "cancel order"
-            ]
+            "recommended_preload_queries": self.get_preload_queries(Config.FAQ_PRELOAD_TOP_N)
         }
\ No newline at end of file
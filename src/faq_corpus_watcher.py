@@ -0,0 +1,62 @@
+# src/faq_corpus_watcher.py - Reloads the FAQ corpus when its source changes
+import sys
+import os
+import threading
+from typing import Dict, Optional, Any
+
+# Add data directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+from faq_cache_manager import FAQCacheManager
+
+class FAQCorpusWatcher:
+    """Polls the FAQ corpus source and hot-reloads it when its version changes"""
+    
+    def __init__(self, faq_cache: FAQCacheManager, interval: float = 5.0):
+        self.faq_cache = faq_cache
+        self.interval = interval
+        self._last_version = self._source_version()
+        
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def _source_version(self) -> Optional[str]:
+        """Version of the backend's corpus source (None without a source)"""
+        source = getattr(self.faq_cache.backend, "source", None)
+        return source.version() if source else None
+    
+    def check_once(self) -> Optional[Dict[str, Any]]:
+        """Reload the corpus if the source changed since the last check"""
+        version = self._source_version()
+        if version is None or version == self._last_version:
+            return None
+        
+        changes = self.faq_cache.reload_corpus()
+        self._last_version = version
+        return changes
+    
+    def start(self) -> None:
+        """Watch the corpus source in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        
+        def watch_loop():
+            while not self._stop_event.wait(self.interval):
+                try:
+                    self.check_once()
+                except Exception as e:
+                    # Keep serving the previous corpus until the source is fixed
+                    print(f"⚠️  FAQ corpus reload failed: {e}")
+        
+        self._thread = threading.Thread(target=watch_loop, name="faq-corpus-watcher", daemon=True)
+        self._thread.start()
+        print("👀 FAQ corpus watcher started")
+    
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the background watcher"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,239 @@
+# src/intent_classifier.py - Trainable intent classifier for message routing
+import sys
+import os
+import re
+import json
+import zlib
+import argparse
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}|\w+")
+ORDER_ID_PATTERN = re.compile(r"ord\d+")
+
+def message_tokens(message: str) -> List[str]:
+    """Lowercased word tokens with order IDs, emails and numbers collapsed to placeholders"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(message.lower()):
+        if "@" in token:
+            tokens.append("<email>")
+        elif ORDER_ID_PATTERN.fullmatch(token):
+            tokens.append("<order_id>")
+        elif token.isdigit():
+            tokens.append("<number>")
+        else:
+            tokens.append(token)
+    return tokens
+
+@lru_cache(maxsize=65536)
+def feature_column(feature: str, dim: int) -> int:
+    """Hashed column of a feature (stable across processes)"""
+    return zlib.crc32(feature.encode("utf-8")) % dim
+
+class IntentClassifier:
+    """Linear classifier over hashed word and bigram features
+    
+    Scores are softmax(x @ weights + bias) where x marks which hashed features
+    occur in the message. Both trainers (logistic regression and naive Bayes)
+    produce this form, so inference is the same few array lookups either way.
+    """
+    
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray, dim: int):
+        self.labels = list(labels)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.dim = dim
+    
+    @staticmethod
+    def feature_indices(message: str, dim: int) -> np.ndarray:
+        """Distinct hashed feature columns for a message"""
+        tokens = message_tokens(message)
+        features = [f"w:{token}" for token in tokens]
+        features.extend(f"b:{first} {second}" for first, second in zip(tokens, tokens[1:]))
+        indices = {feature_column(feature, dim) for feature in features}
+        return np.fromiter(indices, dtype=np.int64, count=len(indices))
+    
+    def predict_proba(self, message: str) -> Dict[str, float]:
+        """Probability of each label for one message"""
+        logits = self.weights[self.feature_indices(message, self.dim)].sum(axis=0) + self.bias
+        probabilities = np.exp(logits - logits.max())
+        return dict(zip(self.labels, (probabilities / probabilities.sum()).tolist()))
+    
+    def predict_proba_batch(self, messages: Sequence[str]) -> np.ndarray:
+        """Probability matrix with one row per message and one column per label"""
+        logits = np.tile(self.bias, (len(messages), 1))
+        for row, message in enumerate(messages):
+            logits[row] += self.weights[self.feature_indices(message, self.dim)].sum(axis=0)
+        
+        probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+    
+    def predict(self, message: str) -> Tuple[str, float]:
+        """Most likely label and its probability"""
+        probabilities = self.predict_proba(message)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+    
+    @staticmethod
+    def _design(messages: Sequence[str], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse feature matrix as parallel (row, column) arrays"""
+        rows, columns = [], []
+        for row, message in enumerate(messages):
+            indices = IntentClassifier.feature_indices(message, dim)
+            rows.append(np.full(len(indices), row))
+            columns.append(indices)
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(rows), np.concatenate(columns)
+    
+    @classmethod
+    def train(cls, messages: Sequence[str], labels: Sequence[str], model: str = "logreg", dim: int = 4096,
+              epochs: int = 300, learning_rate: float = 0.5, l2: float = 1e-4) -> "IntentClassifier":
+        """Fit a classifier on labelled messages
+        
+        model="logreg" runs full-batch gradient descent (Adam) on the softmax
+        cross-entropy; model="nb" fits multinomial naive Bayes with add-one
+        smoothing in closed form.
+        """
+        if not messages:
+            raise ValueError("No training messages")
+        
+        label_names = sorted(set(labels))
+        targets = np.array([label_names.index(label) for label in labels])
+        rows, columns = cls._design(messages, dim)
+        
+        if model == "nb":
+            counts = np.ones((dim, len(label_names)))
+            np.add.at(counts, (columns, targets[rows]), 1)
+            weights = np.log(counts / counts.sum(axis=0))
+            bias = np.log(np.bincount(targets, minlength=len(label_names)) / len(targets))
+            return cls(label_names, weights, bias, dim)
+        
+        if model != "logreg":
+            raise ValueError(f"Unknown model type: {model}")
+        
+        one_hot = np.eye(len(label_names))[targets]
+        weights = np.zeros((dim, len(label_names)))
+        bias = np.zeros(len(label_names))
+        moments = [np.zeros_like(weights), np.zeros_like(weights), np.zeros_like(bias), np.zeros_like(bias)]
+        
+        for step in range(1, epochs + 1):
+            logits = np.tile(bias, (len(targets), 1))
+            np.add.at(logits, rows, weights[columns])
+            probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            
+            error = (probabilities - one_hot) / len(targets)
+            weight_gradient = l2 * weights
+            np.add.at(weight_gradient, columns, error[rows])
+            bias_gradient = error.sum(axis=0)
+            
+            # Adam keeps rare features (seen in a handful of messages) learning at a useful rate
+            for parameter, gradient, first, second in [(weights, weight_gradient, moments[0], moments[1]),
+                                                       (bias, bias_gradient, moments[2], moments[3])]:
+                first *= 0.9
+                first += 0.1 * gradient
+                second *= 0.999
+                second += 0.001 * gradient ** 2
+                parameter -= learning_rate * (first / (1 - 0.9 ** step)) / (np.sqrt(second / (1 - 0.999 ** step)) + 1e-8)
+        
+        return cls(label_names, weights, bias, dim)
+    
+    def accuracy(self, messages: Sequence[str], labels: Sequence[str]) -> float:
+        """Share of messages given their expected label"""
+        if not messages:
+            return 0.0
+        predicted = self.predict_proba_batch(messages).argmax(axis=1)
+        return float(np.mean([self.labels[column] == label for column, label in zip(predicted, labels)]))
+    
+    def save(self, path: str) -> None:
+        """Store the model as a compressed .npz file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(path, labels=np.array(self.labels), weights=self.weights.astype(np.float16),
+                            bias=self.bias, dim=np.array(self.dim))
+    
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """Load a model stored by save()"""
+        with np.load(path) as data:
+            return cls([str(label) for label in data["labels"]], data["weights"], data["bias"], int(data["dim"]))
+
+def load_labelled_messages(path: str) -> Tuple[List[str], List[str]]:
+    """Read training data: JSON lines with "message" and "agent" fields"""
+    messages, labels = [], []
+    with open(path, "r", encoding="utf-8") as data_file:
+        for line_number, line in enumerate(data_file, 1):
+            if not line.strip():
+                continue
+            example = json.loads(line)
+            if "message" not in example or "agent" not in example:
+                raise ValueError(f"{path}:{line_number}: expected \"message\" and \"agent\" fields")
+            messages.append(example["message"])
+            labels.append(example["agent"])
+    return messages, labels
+
+def rule_router_accuracy(messages: Sequence[str], labels: Sequence[str]) -> float:
+    """Accuracy of the hand-tuned routing rules on the same messages (without conversation context)"""
+    sys.path.append(os.path.dirname(__file__))
+    from agent_router import RoutingScanner, AgentRouter
+    
+    scanner = RoutingScanner()
+    correct = 0
+    for message, label in zip(messages, labels):
+        scores = scanner.scores(scanner.scan(message.lower()))
+        correct += AgentRouter.decide(scores["order"], scores["faq"])[0] == label
+    return correct / len(messages) if messages else 0.0
+
+def split_holdout(messages: List[str], labels: List[str], holdout: float, seed: int = 7):
+    """Random train/holdout split"""
+    order = np.random.default_rng(seed).permutation(len(messages))
+    cut = int(len(messages) * (1 - holdout))
+    pick = lambda items, positions: [items[position] for position in positions]
+    return (pick(messages, order[:cut]), pick(labels, order[:cut]),
+            pick(messages, order[cut:]), pick(labels, order[cut:]))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Offline training and evaluation CLI"""
+    parser = argparse.ArgumentParser(description="Train or evaluate the routing intent classifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    train_parser = subparsers.add_parser("train", help="Train a model from labelled messages")
+    train_parser.add_argument("data", help="JSON lines file with \"message\" and \"agent\" fields")
+    train_parser.add_argument("--output", default="models/router_intent.npz", help="Where to write the model")
+    train_parser.add_argument("--model", choices=["logreg", "nb"], default="logreg")
+    train_parser.add_argument("--dim", type=int, default=4096, help="Number of hashed feature columns")
+    train_parser.add_argument("--epochs", type=int, default=300)
+    train_parser.add_argument("--holdout", type=float, default=0.2, help="Share of messages kept for evaluation")
+    
+    evaluate_parser = subparsers.add_parser("evaluate", help="Compare a model with the routing rules")
+    evaluate_parser.add_argument("model", help="Model file written by train")
+    evaluate_parser.add_argument("data", help="JSON lines file with \"message\" and \"agent\" fields")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "train":
+        messages, labels = load_labelled_messages(args.data)
+        if args.holdout > 0:
+            train_messages, train_labels, test_messages, test_labels = split_holdout(messages, labels, args.holdout)
+            classifier = IntentClassifier.train(train_messages, train_labels, args.model, args.dim, args.epochs)
+            print(f"📊 Holdout accuracy: model {classifier.accuracy(test_messages, test_labels):.1%}, "
+                  f"rules {rule_router_accuracy(test_messages, test_labels):.1%} ({len(test_messages)} messages)")
+        
+        # The saved model learns from every example
+        classifier = IntentClassifier.train(messages, labels, args.model, args.dim, args.epochs)
+        classifier.save(args.output)
+        print(f"💾 Saved {args.model} model ({len(messages)} messages, labels {classifier.labels}) to {args.output}")
+    else:
+        classifier = IntentClassifier.load(args.model)
+        messages, labels = load_labelled_messages(args.data)
+        print(f"📊 Accuracy: model {classifier.accuracy(messages, labels):.1%}, "
+              f"rules {rule_router_accuracy(messages, labels):.1%} ({len(messages)} messages)")
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# src/llm_cache.py - Exact-match LLM response cache in Redis
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.load import dumps, loads
+
+from redis_manager import RedisManager
+from config import Config
+
+class RedisLLMCache(BaseCache):
+    """LangChain cache storing model responses in Redis under a hash of the full request
+    
+    LangChain passes the serialized messages as the prompt and the model's
+    settings (model name, temperature, bound tool schemas, stop words) as the
+    llm string, so the SHA-256 of both changes whenever anything sent to the
+    model does. Entries expire after ttl seconds; an index sorted set by write
+    time evicts the oldest entries beyond max_entries. Hit, miss and eviction
+    counts live in a Redis hash so every process reports the same totals.
+    """
+    
+    KEY_PREFIX = "llm_cache"
+    
+    def __init__(self, redis_manager: RedisManager, ttl: int = 86400, max_entries: int = 10000):
+        self.redis = redis_manager
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_key = f"{self.KEY_PREFIX}:index"
+        self.stats_key = f"{self.KEY_PREFIX}:stats"
+        self._bypass = threading.local()
+    
+    def get_entry_key(self, prompt: str, llm_string: str) -> str:
+        """Redis key of a request's cached response"""
+        digest = hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{digest}"
+    
+    @contextmanager
+    def bypass(self):
+        """Send every model call in this block (on this thread) to the model, without reading or writing the cache"""
+        previous = getattr(self._bypass, "active", False)
+        self._bypass.active = True
+        try:
+            yield
+        finally:
+            self._bypass.active = previous
+    
+    def is_bypassed(self) -> bool:
+        return getattr(self._bypass, "active", False)
+    
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Cached generations for a request, if any"""
+        if self.is_bypassed():
+            return None
+        
+        cached = self.redis.redis_client.get(self.get_entry_key(prompt, llm_string))
+        if cached is not None:
+            try:
+                generations = loads(cached)
+            except Exception:
+                generations = None
+            if isinstance(generations, list):
+                self.redis.redis_client.hincrby(self.stats_key, "hits", 1)
+                print("🚀 LLM cache HIT")
+                return generations
+        
+        self.redis.redis_client.hincrby(self.stats_key, "misses", 1)
+        return None
+    
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store a request's generations, then drop expired and excess index entries"""
+        if self.is_bypassed():
+            return
+        
+        key = self.get_entry_key(prompt, llm_string)
+        now = time.time()
+        
+        pipe = self.redis.redis_client.pipeline(transaction=False)
+        pipe.setex(key, self.ttl, dumps(return_val))
+        pipe.zadd(self.index_key, {key: now})
+        pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl)
+        pipe.zcard(self.index_key)
+        entries = pipe.execute()[-1]
+        
+        if entries > self.max_entries:
+            evicted = [member for member, _ in self.redis.redis_client.zpopmin(self.index_key, entries - self.max_entries)]
+            if evicted:
+                pipe = self.redis.redis_client.pipeline(transaction=False)
+                pipe.delete(*evicted)
+                pipe.hincrby(self.stats_key, "evictions", len(evicted))
+                pipe.execute()
+    
+    def clear(self, **kwargs: Any) -> None:
+        """Drop every cached response and reset the counters"""
+        keys = self.redis.redis_client.zrange(self.index_key, 0, -1)
+        self.redis.redis_client.delete(self.index_key, self.stats_key, *keys)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hits, misses, evictions and the current number of entries"""
+        pipe = self.redis.redis_client.pipeline(transaction=False)
+        pipe.hgetall(self.stats_key)
+        pipe.zcount(self.index_key, time.time() - self.ttl, "+inf")
+        counters, entries = pipe.execute()
+        
+        hits, misses = int(counters.get("hits", 0)), int(counters.get("misses", 0))
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "evictions": int(counters.get("evictions", 0)),
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0
+        }
+
+def install_llm_cache(redis_manager: RedisManager) -> Optional[RedisLLMCache]:
+    """Make the Redis response cache LangChain's process-wide LLM cache (once; None when disabled)"""
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    
+    cache = get_llm_cache()
+    if not isinstance(cache, RedisLLMCache):
+        cache = RedisLLMCache(redis_manager, Config.LLM_CACHE_TTL, Config.LLM_CACHE_MAX_ENTRIES)
+        set_llm_cache(cache)
+    return cache
@@ -0,0 +1,161 @@
+# src/llm_clients.py - Process-wide LLM clients over one pooled HTTP connection pool
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import numpy as np
+import openai
+from langchain_openai import ChatOpenAI
+
+from config import Config
+
+class LLMClientFactory:
+    """Chat models shared per (model, params), all on one keep-alive connection pool
+    
+    Every model gets openai clients built on the factory's httpx clients (one
+    sync, one async), so TLS handshakes and idle connections are shared across
+    agents instead of each ChatOpenAI opening its own pool. httpx trace hooks
+    count which requests had to open a new connection, and the time to response
+    headers of every request is kept for latency percentiles.
+    """
+    
+    # Latency samples kept for percentiles
+    LATENCY_SAMPLES = 1000
+    
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None, timeout: Optional[float] = None):
+        self.base_url = base_url or Config.OPENAI_BASE_URL or None
+        self.api_key = api_key or Config.OPENAI_API_KEY
+        self.limits = httpx.Limits(
+            max_connections=max_connections or Config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=keepalive_expiry or Config.LLM_KEEPALIVE_EXPIRY
+        )
+        self.timeout = timeout or Config.LLM_TIMEOUT
+        
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._models: Dict[Tuple, ChatOpenAI] = {}
+        self._lock = threading.Lock()
+        
+        self.requests = 0
+        self.new_connections = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=self.LATENCY_SAMPLES)
+    
+    # ========== HTTP Clients ==========
+    
+    def _on_request(self, request: httpx.Request) -> None:
+        """Start timing a request and watch whether it opens a connection"""
+        request.extensions["trace"] = lambda name, info: self._on_trace(request, name)
+        request.extensions["llm_started_at"] = time.perf_counter()
+    
+    async def _on_request_async(self, request: httpx.Request) -> None:
+        async def trace(name: str, info: Dict) -> None:
+            self._on_trace(request, name)
+        
+        request.extensions["trace"] = trace
+        request.extensions["llm_started_at"] = time.perf_counter()
+    
+    def _on_trace(self, request: httpx.Request, name: str) -> None:
+        if name == "connection.connect_tcp.complete":
+            request.extensions["llm_new_connection"] = True
+    
+    def _on_response(self, response: httpx.Response) -> None:
+        """Record a finished request"""
+        extensions = response.request.extensions
+        latency = time.perf_counter() - extensions.get("llm_started_at", time.perf_counter())
+        with self._lock:
+            self.requests += 1
+            self.new_connections += bool(extensions.get("llm_new_connection"))
+            self.errors += response.status_code >= 400
+            self.latencies.append(latency)
+    
+    async def _on_response_async(self, response: httpx.Response) -> None:
+        self._on_response(response)
+    
+    @property
+    def http_client(self) -> httpx.Client:
+        """Shared sync HTTP client (created on first use)"""
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    event_hooks={"request": [self._on_request], "response": [self._on_response]}
+                )
+            return self._http_client
+    
+    @property
+    def async_http_client(self) -> httpx.AsyncClient:
+        """Shared async HTTP client (created on first use)"""
+        with self._lock:
+            if self._async_http_client is None:
+                self._async_http_client = httpx.AsyncClient(
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    event_hooks={"request": [self._on_request_async], "response": [self._on_response_async]}
+                )
+            return self._async_http_client
+    
+    # ========== Chat Models ==========
+    
+    def get_chat_model(self, model: str = "gpt-3.5-turbo", temperature: float = 0.1, **params: Any) -> ChatOpenAI:
+        """Chat model for the given settings, shared by every caller asking for the same ones"""
+        key = (model, temperature, tuple(sorted(params.items())))
+        chat_model = self._models.get(key)
+        if chat_model is not None:
+            return chat_model
+        
+        client_params = {"api_key": self.api_key, "base_url": self.base_url, "timeout": self.timeout}
+        sync_client = openai.OpenAI(http_client=self.http_client, **client_params)
+        async_client = openai.AsyncOpenAI(http_client=self.async_http_client, **client_params)
+        
+        with self._lock:
+            chat_model = self._models.get(key)
+            if chat_model is None:
+                chat_model = ChatOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    model=model,
+                    temperature=temperature,
+                    client=sync_client.chat.completions,
+                    async_client=async_client.chat.completions,
+                    **params
+                )
+                self._models[key] = chat_model
+        return chat_model
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Request count, connection reuse and latency percentiles"""
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            requests, new_connections = self.requests, self.new_connections
+        
+        stats = {
+            "models": len(self._models),
+            "requests": requests,
+            "errors": self.errors,
+            "new_connections": new_connections,
+            "reused_connections": requests - new_connections,
+            "reuse_rate": round((requests - new_connections) / requests, 3) if requests else 0.0,
+            "latency_ms": {}
+        }
+        if len(latencies):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            stats["latency_ms"] = {"p50": round(float(p50), 2), "p90": round(float(p90), 2), "p99": round(float(p99), 2)}
+        return stats
+    
+    def close(self) -> None:
+        """Close the shared connection pool (the async client is left to its event loop)"""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+            self._models.clear()
+
+# Process-wide factory used by the agents
+llm_clients = LLMClientFactory()
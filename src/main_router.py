@@ -5,55 +5,124 @@ from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
 import json
 import re
+import threading
 
 # Add data directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
 
+from langchain_core.globals import get_llm_cache
+
 from redis_manager import RedisManager
 from agents import OrderLookupAgent, FAQAgent
 from agent_router import AgentRouter
+from agent_registry import AgentRegistry
+from llm_clients import llm_clients
+from llm_cache import RedisLLMCache
+from faq_cache_manager import FAQCacheManager
+from order_cache_manager import OrderCacheManager
+from order_change_feed import OrderChangeFeed
+from faq_corpus_watcher import FAQCorpusWatcher
+from orders import order_db
+from faq import faq_db
+from faq_source import FAQFileSource, FAQRedisSource
 from config import Config
 
 class CustomerSupportRouter:
     """Main router that orchestrates the entire customer support conversation"""
     
-    def __init__(self):
+    def __init__(self, warmup: Optional[str] = None):
+        """
+        warmup: "background" builds agents and preloads caches in a thread,
+        "eager" does so before returning and "lazy" builds each agent on first
+        use (defaults to Config.AGENT_WARMUP)
+        """
         self.config = Config()
         self.redis = RedisManager()
-        
-        # Initialize agents
-        self.order_agent = OrderLookupAgent(self.redis)
-        self.faq_agent = FAQAgent(self.redis)
         self.agent_router = AgentRouter(self.redis)
         
-        # Agent mapping
-        self.agents = {
-            "order_lookup": self.order_agent,
-            "faq": self.faq_agent
-        }
+        # Shared by the FAQ agent, the corpus watcher and warmup preloading
+        self.faq_cache = FAQCacheManager(self.redis)
+        
+        # Agents are built on first use (or by warmup), not here
+        self.agents = AgentRegistry()
+        self.agents.register("order_lookup", lambda: OrderLookupAgent(self.redis))
+        self.agents.register("faq", lambda: FAQAgent(self.redis, faq_cache=self.faq_cache))
+        
+        # Keep order caches in sync with order store changes
+        self.order_cache = OrderCacheManager(self.redis)
+        self.order_feed = OrderChangeFeed(self.redis, self.order_cache)
+        self.order_feed.attach(order_db)
+        
+        # Load the FAQ corpus from its configured source and hot-reload it on change
+        self.faq_watcher = None
+        self._configure_faq_corpus()
+        
+        # The change consumer and corpus watcher start with the first session or message, so
+        # tools that never chat (health checks, analytics) do not run background threads
+        self._workers_started = False
+        self._workers_lock = threading.Lock()
         
         # Conversation state tracking
         self.conversation_states = {}
         
         print("🤖 Customer Support Router initialized")
-        self._warmup_system()
+        self._warmup_system(warmup or self.config.AGENT_WARMUP)
+    
+    @property
+    def order_agent(self) -> OrderLookupAgent:
+        return self.agents.get("order_lookup")
+    
+    @property
+    def faq_agent(self) -> FAQAgent:
+        return self.agents.get("faq")
+    
+    def _configure_faq_corpus(self):
+        """Switch the FAQ corpus to a file or Redis hash source if one is configured"""
+        if self.config.FAQ_CORPUS_PATH:
+            source = FAQFileSource(self.config.FAQ_CORPUS_PATH)
+        elif self.config.FAQ_CORPUS_REDIS_KEY:
+            source = FAQRedisSource(self.redis.redis_client, self.config.FAQ_CORPUS_REDIS_KEY)
+        else:
+            return
+        
+        # Seed an empty source with the current corpus so there is something to edit
+        if source.version() is None:
+            source.save(faq_db.get_all_faqs())
+            print("📝 Seeded FAQ corpus source with the built-in FAQs")
+        
+        faq_db.set_source(source)
+        self.faq_cache.reload_corpus()
+        
+        self.faq_watcher = FAQCorpusWatcher(self.faq_cache, self.config.FAQ_CORPUS_WATCH_INTERVAL)
+    
+    def _start_background_workers(self):
+        """Start the order change consumer and the FAQ corpus watcher, once"""
+        with self._workers_lock:
+            if self._workers_started:
+                return
+            self._workers_started = True
+        
+        self.order_feed.start()
+        if self.faq_watcher:
+            self.faq_watcher.start()
     
-    def _warmup_system(self):
-        """Warm up the system by preloading caches"""
+    def _warmup_system(self, mode: str):
+        """Warm up the system by building agents and preloading caches"""
+        if mode == "lazy":
+            return
+        
         print("🔥 Warming up system caches...")
         
-        # Preload FAQ cache with common queries
-        common_faq_queries = [
-            "return policy", "shipping policy", "track order",
-            "payment methods", "contact support", "warranty",
-            "cancel order", "account issues", "business hours"
-        ]
+        def preload():
+            # Preload FAQ cache with the queries customers actually ask most
+            self.faq_cache.preload_popular_faqs(self.config.FAQ_PRELOAD_TOP_N)
+            print("✅ System warmed up and ready")
         
-        self.faq_agent.faq_cache.preload_common_faqs(common_faq_queries)
-        print("✅ System warmed up and ready")
+        self.agents.warm_up(background=mode != "eager", after=preload)
     
     def start_session(self, session_id: str, user_data: Optional[Dict] = None) -> Dict[str, Any]:
         """Start a new customer support session"""
+        self._start_background_workers()
         
         # STEP 7 FIX: Ensure user_data is never None
         if user_data is None:
@@ -75,7 +144,8 @@ class CustomerSupportRouter:
             welcome_message = self._generate_welcome_message(user_data)
             
             # Add welcome message to conversation history
-            self.redis.add_message(session_id, "assistant", welcome_message)
+            routing_context = self.redis.add_message(session_id, "assistant", welcome_message)
+            self.conversation_states[session_id]["routing_context"] = routing_context
             
             return {
                 "success": True,
@@ -121,11 +191,13 @@ How can I assist you today?"""
             "/status - Show session status", 
             "/history - Show recent conversation",
             "/clear - Clear conversation history",
-            "/stats - Show performance statistics"
+            "/stats - Show performance statistics",
+            "/reload_faqs - Reload the FAQ corpus"
         ]
     
     def process_message(self, session_id: str, message: str) -> Dict[str, Any]:
         """Process a customer message through the router system"""
+        self._start_background_workers()
         
         try:
             # STEP 7 FIX: Input validation
@@ -156,8 +228,9 @@ How can I assist you today?"""
             
             conv_state["message_count"] = conv_state.get("message_count", 0) + 1
             
-            # Route the message to appropriate agent
-            selected_agent, confidence = self.agent_router.route_message(message, session_id)
+            # Route the message to appropriate agent (with the topic context kept from the last turn, if any)
+            selected_agent, confidence = self.agent_router.route_message(message, session_id,
+                                                                         conv_state.get("routing_context"))
             
             # Track agent switches
             if conv_state.get("active_agent") != selected_agent:
@@ -181,11 +254,15 @@ How can I assist you today?"""
                     "agent_used": "error_handler"
                 }
             
-            response = agent.process_message(message, session_id)
+            # Unambiguous order lookups and strong FAQ matches skip the LLM; everything else goes to the agent
+            response = agent.fast_answer(message, session_id) if self.config.FAST_PATH_ENABLED else None
+            fast_path = response is not None
+            if not fast_path:
+                response = agent.process_message(message, session_id)
             processing_time = (datetime.now() - start_time).total_seconds()
             
             # Add agent response to conversation history
-            self.redis.add_message(session_id, "assistant", response)
+            conv_state["routing_context"] = self.redis.add_message(session_id, "assistant", response, agent=selected_agent)
             
             # Update conversation state
             self.conversation_states[session_id] = conv_state
@@ -204,6 +281,7 @@ How can I assist you today?"""
                 "response": response,
                 "agent_used": selected_agent,
                 "confidence": confidence,
+                "fast_path": fast_path,
                 "processing_time": processing_time,
                 "session_stats": self._get_session_stats(session_id),
                 "suggestions": self._generate_suggestions(message, selected_agent)
@@ -247,6 +325,7 @@ How can I assist you today?"""
 
 **Actions:**
 - `/clear` - Clear your conversation history
+- `/reload_faqs` - Reload the FAQ corpus from its source
 - `/help` - Show this help message
 
 **Quick Examples:**
@@ -335,6 +414,24 @@ Just type your question naturally - I'll route it to the right specialist!"""
                     "agent_used": "command_handler"
                 }
         
+        elif command == "/reload_faqs":
+            try:
+                changes = self.faq_cache.reload_corpus()
+                response = (f"✅ FAQ corpus v{changes['version']}: {len(changes['added'])} added, "
+                            f"{len(changes['updated'])} updated, {len(changes['removed'])} removed "
+                            f"({changes['invalidated_searches']} cached searches invalidated)")
+                return {
+                    "success": True,
+                    "response": response,
+                    "agent_used": "command_handler"
+                }
+            except Exception as e:
+                return {
+                    "success": False,
+                    "response": f"❌ Error reloading FAQ corpus: {str(e)}",
+                    "agent_used": "command_handler"
+                }
+        
         else:
             return {
                 "success": False,
@@ -450,6 +547,13 @@ Just type your question naturally - I'll route it to the right specialist!"""
         """Get comprehensive system statistics"""
         try:
             redis_stats = self.redis.get_stats()
+            routing_stats = self.agent_router.get_cache_stats()
+            llm_stats = llm_clients.get_stats()
+            llm_cache = get_llm_cache()
+            llm_cache_line = "disabled"
+            if isinstance(llm_cache, RedisLLMCache):
+                llm_cache_stats = llm_cache.get_stats()
+                llm_cache_line = f"{llm_cache_stats['hit_rate']:.0%} hit rate ({llm_cache_stats['entries']} responses cached)"
             
             stats = f"""📈 **System Performance Statistics**
 
@@ -462,7 +566,11 @@ Just type your question naturally - I'll route it to the right specialist!"""
 **Cache Performance:**
 - Order cache entries: {redis_stats.get('order_cache', 0)}
 - FAQ cache entries: {redis_stats.get('faq_cache', 0)}
+- FAQ query cache keys: {redis_stats.get('faq_query_cache_keys', 0)}
 - Agent states tracked: {redis_stats.get('agent_states', 0)}
+- Routing cache hit rate: {routing_stats['hit_rate']:.0%} ({routing_stats['entries']} messages cached)
+- LLM requests: {llm_stats['requests']} ({llm_stats['reuse_rate']:.0%} on reused connections, p50 {llm_stats['latency_ms'].get('p50', 0):.0f}ms)
+- LLM response cache: {llm_cache_line}
 
 **Performance Benefits:**
 - Order lookups: ~99% faster with caching
@@ -1,27 +1,57 @@
 # src/order_cache_manager.py - STEP 5: New file for order caching
 import sys
 import os
-from typing import Optional, Dict, List
+import asyncio
+import functools
+from typing import Optional, Dict, List, Any, Callable
 import time
 
 # Add data directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
 
 from redis_manager import RedisManager
-from orders import get_order as db_get_order, get_order_status_summary as db_get_order_summary, search_orders_by_email as db_search_orders_by_email
+from config import Config
+from orders import build_order_status_summary
+from orders import order_db
+from async_adapter import ThreadPoolBackendAdapter
 
 class OrderCacheManager:
     """Manages order data with Redis caching layer"""
     
-    def __init__(self, redis_manager: RedisManager):
+    def __init__(self, redis_manager: RedisManager, backend=None, encoding: Optional[str] = None):
         self.redis = redis_manager
         
+        # "json" stores each order as one string, "hash" as one Redis hash field per order field
+        self.encoding = encoding or Config.ORDER_CACHE_ENCODING
+        
+        self.backend = backend or order_db
+        
+        # Async access to the order backend (blocking backends run in a thread pool)
+        self.async_backend = ThreadPoolBackendAdapter(self.backend)
+    
+    async def _run_blocking(self, function: Callable, *args, **kwargs) -> Any:
+        """Run a blocking Redis call in the backend thread pool so the event loop stays free"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.async_backend.executor, functools.partial(function, *args, **kwargs))
+    
+    def _get_cached_order(self, order_id: str) -> Optional[Dict]:
+        """Read a cached order in the configured encoding"""
+        if self.encoding == "hash":
+            return self.redis.get_cached_order_fields(order_id)
+        return self.redis.get_cached_order(order_id)
+    
+    def _cache_order(self, order_id: str, order_data: Dict) -> bool:
+        """Cache an order in the configured encoding"""
+        if self.encoding == "hash":
+            return self.redis.cache_order_fields(order_id, order_data)
+        return self.redis.cache_order(order_id, order_data)
+    
     def get_order(self, order_id: str, use_cache: bool = True) -> Optional[Dict]:
         """Get order with Redis caching"""
         
         # Try cache first if enabled
         if use_cache:
-            cached_order = self.redis.get_cached_order(order_id)
+            cached_order = self._get_cached_order(order_id)
             if cached_order:
                 print(f"🚀 Cache HIT for order {order_id}")
                 return cached_order
@@ -30,14 +60,14 @@ class OrderCacheManager:
         
         # Fetch from "database" (our mock data)
         start_time = time.time()
-        order_data = db_get_order(order_id)
+        order_data = self.backend.get_order(order_id)
         fetch_time = time.time() - start_time
         
         print(f"📊 Database fetch took {fetch_time:.2f}s")
         
         # Cache the result if found
         if order_data and use_cache:
-            self.redis.cache_order(order_id, order_data)
+            self._cache_order(order_id, order_data)
             print(f"💾 Cached order {order_id}")
         
         return order_data
@@ -61,7 +91,7 @@ class OrderCacheManager:
         
         # Get summary from database function (includes its own delay)
         start_time = time.time()
-        summary = db_get_order_summary(order_id)
+        summary = self.backend.get_order_status_summary(order_id)
         fetch_time = time.time() - start_time
         
         print(f"📊 Summary generation took {fetch_time:.2f}s")
@@ -89,7 +119,7 @@ class OrderCacheManager:
         
         # Search in database
         start_time = time.time()
-        results = db_search_orders_by_email(email)
+        results = self.backend.search_orders_by_email(email)
         search_time = time.time() - start_time
         
         print(f"📊 Email search took {search_time:.2f}s, found {len(results)} orders")
@@ -101,13 +131,178 @@ class OrderCacheManager:
         
         return results
     
-    def invalidate_order(self, order_id: str) -> int:
+    def search_orders_by_email_page(self, email: str, cursor: int = 0, limit: int = 5, use_cache: bool = True) -> Dict[str, Any]:
+        """Search orders by email one page at a time, caching only the requested page"""
+        
+        # Each page is cached on its own key so only what is displayed gets stored
+        cache_key = f"email_search:{email.lower()}:{cursor}:{limit}"
+        
+        if use_cache:
+            cached_page = self.redis.cache_get(cache_key)
+            if cached_page:
+                print(f"🚀 Cache HIT for email search page: {email} (cursor {cursor})")
+                return cached_page
+        
+        print(f"💾 Cache MISS for email search page: {email} (cursor {cursor})")
+        
+        start_time = time.time()
+        page = self.backend.search_orders_by_email_page(email, cursor, limit)
+        search_time = time.time() - start_time
+        
+        print(f"📊 Email search page took {search_time:.2f}s, returned {len(page['orders'])} of {page['total']} orders")
+        
+        if use_cache:
+            self.redis.cache_email_search_page(email, cursor, limit, page, ttl=600)  # 10 minutes
+            print(f"💾 Cached email search page for {email}")
+        
+        return page
+    
+    def get_order_status_fields(self, order_id: str, fields: Optional[List[str]] = None, use_cache: bool = True) -> Optional[Dict]:
+        """Get just the status-related fields of an order
+        
+        With hash encoding only the requested fields are read from Redis (HMGET);
+        with JSON encoding the whole cached order is loaded and trimmed.
+        """
+        fields = fields or self.redis.ORDER_STATUS_FIELDS
+        
+        if use_cache and self.encoding == "hash":
+            cached_fields = self.redis.get_cached_order_fields(order_id, fields)
+            if cached_fields:
+                print(f"🚀 Cache HIT for order fields {order_id}")
+                return cached_fields
+        
+        order_data = self.get_order(order_id, use_cache)
+        if not order_data:
+            return None
+        
+        return {field: order_data.get(field) for field in fields}
+    
+    def patch_order_fields(self, order_id: str, updates: Dict) -> bool:
+        """Patch individual fields of a hash-encoded cached order in place"""
+        if self.encoding != "hash":
+            return False
+        
+        patched = self.redis.patch_cached_order_fields(order_id, updates)
+        if patched:
+            print(f"✏️  Patched cached fields {', '.join(updates)} for order {order_id}")
+        return patched
+    
+    # ========== Async Interface ==========
+    
+    async def aget_order(self, order_id: str, use_cache: bool = True) -> Optional[Dict]:
+        """Get order with Redis caching without blocking the event loop on the backend or Redis"""
+        if use_cache:
+            cached_order = await self._run_blocking(self._get_cached_order, order_id)
+            if cached_order:
+                print(f"🚀 Cache HIT for order {order_id}")
+                return cached_order
+        
+        print(f"💾 Cache MISS for order {order_id} - fetching from database...")
+        
+        order_data = await self.async_backend.aget_order(order_id)
+        
+        if order_data and use_cache:
+            await self._run_blocking(self._cache_order, order_id, order_data)
+            print(f"💾 Cached order {order_id}")
+        
+        return order_data
+    
+    async def aget_order_status_summary(self, order_id: str, use_cache: bool = True) -> Optional[str]:
+        """Get order status summary with caching without blocking the event loop on the backend or Redis"""
+        if use_cache:
+            cached_summary = await self._run_blocking(self.redis.get_cached_order_summary, order_id)
+            if cached_summary:
+                print(f"🚀 Cache HIT for order summary {order_id}")
+                return cached_summary
+        
+        print(f"💾 Cache MISS for order summary {order_id}")
+        
+        order_data = await self.aget_order(order_id, use_cache)
+        if not order_data:
+            return None
+        
+        summary = await self.async_backend.aget_order_status_summary(order_id)
+        
+        if summary and use_cache:
+            await self._run_blocking(self.redis.cache_order_summary, order_id, summary)
+            print(f"💾 Cached order summary {order_id}")
+        
+        return summary
+    
+    async def asearch_orders_by_email(self, email: str, use_cache: bool = True) -> List[Dict]:
+        """Search orders by email with caching without blocking the event loop on the backend or Redis"""
+        cache_key = f"email_search:{email.lower()}"
+        
+        if use_cache:
+            cached_results = await self._run_blocking(self.redis.cache_get, cache_key)
+            if cached_results:
+                print(f"🚀 Cache HIT for email search: {email}")
+                return cached_results
+        
+        print(f"💾 Cache MISS for email search: {email}")
+        
+        results = await self.async_backend.asearch_orders_by_email(email)
+        
+        if use_cache:
+            await self._run_blocking(self.redis.cache_set, cache_key, results, ttl=600)  # 10 minutes
+            print(f"💾 Cached email search results for {email}")
+        
+        return results
+    
+    async def asearch_orders_by_email_page(self, email: str, cursor: int = 0, limit: int = 5, use_cache: bool = True) -> Dict[str, Any]:
+        """Search one page of orders by email with caching without blocking the event loop on the backend or Redis"""
+        cache_key = f"email_search:{email.lower()}:{cursor}:{limit}"
+        
+        if use_cache:
+            cached_page = await self._run_blocking(self.redis.cache_get, cache_key)
+            if cached_page:
+                print(f"🚀 Cache HIT for email search page: {email} (cursor {cursor})")
+                return cached_page
+        
+        print(f"💾 Cache MISS for email search page: {email} (cursor {cursor})")
+        
+        page = await self.async_backend.asearch_orders_by_email_page(email, cursor, limit)
+        
+        if use_cache:
+            await self._run_blocking(self.redis.cache_email_search_page, email, cursor, limit, page, ttl=600)  # 10 minutes
+            print(f"💾 Cached email search page for {email}")
+        
+        return page
+    
+    def prefetch_customer_orders(self, email: str, limit: Optional[int] = None) -> int:
+        """Warm the cache with a customer's most recent orders and their summaries"""
+        
+        # Same page the order agent asks for first, so that search is a hit too
+        page = self.search_orders_by_email_page(email, cursor=0, limit=limit or Config.ORDER_PAGE_SIZE)
+        
+        prefetched_count = 0
+        for order in page["orders"]:
+            order_id = order["order_id"]
+            
+            # The page already carries full order data, so no per-order database fetch is needed
+            if not self._get_cached_order(order_id):
+                self._cache_order(order_id, order)
+            if not self.redis.get_cached_order_summary(order_id):
+                self.redis.cache_order_summary(order_id, build_order_status_summary(order))
+            prefetched_count += 1
+        
+        print(f"✅ Prefetched {prefetched_count} orders for {email}")
+        return prefetched_count
+    
+    def invalidate_order(self, order_id: str, include_fields: bool = True) -> int:
         """Invalidate all cached data for an order"""
-        deleted_count = self.redis.invalidate_order_cache(order_id)
+        deleted_count = self.redis.invalidate_order_cache(order_id, include_fields)
         if deleted_count > 0:
             print(f"🗑️  Invalidated {deleted_count} cache entries for order {order_id}")
         return deleted_count
     
+    def invalidate_email_search(self, email: str) -> int:
+        """Invalidate cached order searches for a customer email"""
+        deleted_count = self.redis.invalidate_email_search_cache(email)
+        if deleted_count > 0:
+            print(f"🗑️  Invalidated email search cache for {email}")
+        return deleted_count
+    
     def get_cache_performance_stats(self) -> Dict[str, any]:
         """Get performance statistics"""
         stats = self.redis.get_stats()
@@ -0,0 +1,148 @@
+# src/order_change_feed.py - Order change stream driving cache invalidation
+import sys
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Any
+
+# Add data directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+from redis_manager import RedisManager
+from config import Config
+from order_cache_manager import OrderCacheManager
+from orders import ORDER_CREATED, ORDER_STATUS_CHANGED, ORDER_ADDRESS_CHANGED
+
+class OrderChangeFeed:
+    """Publishes order store changes to a Redis Stream and keeps order caches in sync
+    
+    Events a consumer read but never acknowledged (it crashed or was restarted
+    under another name) are claimed by a live consumer once they have been
+    idle for claim_idle_ms, so no change is left unapplied.
+    """
+    
+    def __init__(self, redis_manager: RedisManager, order_cache: Optional[OrderCacheManager] = None,
+                 group: str = "order_cache_sync", refresh: bool = False, consumer: Optional[str] = None,
+                 claim_idle_ms: Optional[int] = None):
+        self.redis = redis_manager
+        self.order_cache = order_cache or OrderCacheManager(redis_manager)
+        self.group = group
+        self.consumer = consumer or Config.ORDER_CHANGE_CONSUMER or f"consumer_{socket.gethostname()}_{os.getpid()}"
+        self.claim_idle_ms = Config.ORDER_CHANGE_CLAIM_IDLE_MS if claim_idle_ms is None else claim_idle_ms
+        self.refresh = refresh
+        self._recovered = False
+        self._last_claim = None
+        # Where the scan of the group's pending list continues ("0-0": start a new scan)
+        self._claim_cursor = "0-0"
+        
+        self._stop_event = threading.Event()
+        self._thread = None
+        
+        self.redis.ensure_order_change_group(self.group)
+    
+    def attach(self, order_db) -> None:
+        """Publish every change made through an order store to the stream"""
+        order_db.set_change_publisher(self.publish)
+    
+    def publish(self, event: Dict[str, Any]) -> Optional[str]:
+        """Publish an order change event"""
+        entry_id = self.redis.publish_order_change(event)
+        if entry_id:
+            print(f"📣 Published {event['event_type']} for order {event['order_id']}")
+        return entry_id
+    
+    def apply_event(self, event: Dict[str, Any]) -> int:
+        """Bring cached order data in line with a change event"""
+        event_type = event.get("event_type")
+        order_id = event.get("order_id")
+        email = event.get("customer_email")
+        
+        if not order_id:
+            return 0
+        
+        invalidated = 0
+        
+        # A new order only changes the customer's order list
+        if event_type in (ORDER_STATUS_CHANGED, ORDER_ADDRESS_CHANGED):
+            # Hash-encoded entries take the changed fields in place; everything else is dropped
+            updates = {field: change.get("new") for field, change in event.get("changes", {}).items()}
+            patched = self.order_cache.patch_order_fields(order_id, updates)
+            invalidated += self.order_cache.invalidate_order(order_id, include_fields=not patched)
+        
+        if email:
+            invalidated += self.order_cache.invalidate_email_search(email)
+        
+        # Optionally warm the cache again so the next lookup stays a hit
+        if self.refresh and event_type in (ORDER_CREATED, ORDER_STATUS_CHANGED, ORDER_ADDRESS_CHANGED):
+            self.order_cache.get_order(order_id)
+        
+        return invalidated
+    
+    def process_pending(self, count: int = 100, block_ms: Optional[int] = None) -> int:
+        """Consume, apply and acknowledge a batch of change events"""
+        events = []
+        
+        # On the first pass, retry anything this consumer read but never acknowledged
+        if not self._recovered:
+            events = self.redis.read_order_changes(self.group, self.consumer, count=count, pending=True)
+            self._recovered = True
+        
+        # Now and then, take over events other consumers abandoned
+        if not events and self._claim_due():
+            self._claim_cursor, events = self.redis.claim_order_changes(self.group, self.consumer, self.claim_idle_ms,
+                                                                        count=count, start_id=self._claim_cursor)
+            if events:
+                print(f"♻️  Claimed {len(events)} abandoned order change events")
+        
+        if not events:
+            events = self.redis.read_order_changes(self.group, self.consumer, count=count, block_ms=block_ms)
+        
+        processed_ids: List[str] = []
+        for entry_id, event in events:
+            try:
+                self.apply_event(event)
+            except Exception as e:
+                print(f"⚠️  Failed to apply order change {entry_id}: {e}")
+                continue
+            processed_ids.append(entry_id)
+        
+        self.redis.ack_order_changes(self.group, processed_ids)
+        return len(processed_ids)
+    
+    def _claim_due(self) -> bool:
+        """Whether to look for abandoned events: while a scan is under way, then at most once per claim_idle_ms"""
+        if self._claim_cursor != "0-0":
+            return True
+        
+        now = time.monotonic()
+        if self._last_claim is not None and (now - self._last_claim) * 1000 < self.claim_idle_ms:
+            return False
+        self._last_claim = now
+        return True
+    
+    def start(self, block_ms: int = 1000) -> None:
+        """Consume the change stream in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        
+        def consume_loop():
+            while not self._stop_event.is_set():
+                try:
+                    self.process_pending(block_ms=block_ms)
+                except Exception as e:
+                    print(f"⚠️  Order change consumer error: {e}")
+                    self._stop_event.wait(1)
+        
+        self._thread = threading.Thread(target=consume_loop, name="order-change-feed", daemon=True)
+        self._thread.start()
+        print("📡 Order change feed consumer started")
+    
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the background consumer"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
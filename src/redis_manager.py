@@ -1,18 +1,29 @@
 # src/redis_manager.py
+import sys
+import os
 import redis
 import json
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import time
+from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime, timedelta
 from config import Config
 
+# Add data directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
 class RedisManager:
     """Redis connection and operations manager for LangChain agents"""
     
-    def __init__(self):
+    def __init__(self, redis_client=None):
         self.config = Config()
-        self.redis_client = None
-        self._connect()
+        self.redis_client = redis_client
+        self._faq_popularity_rebased_epoch = None
+        
+        # An injected client (e.g. an in-process stand-in for offline benchmarks) is used as is
+        if self.redis_client is None:
+            self._connect()
         
     def _connect(self):
         """Establish Redis connection with error handling"""
@@ -45,23 +56,36 @@ class RedisManager:
         """Generate Redis key for conversation history"""
         return f"conversation:{session_id}"
     
-    def add_message(self, session_id: str, role: str, content: str) -> None:
-        """Add a message to conversation history"""
+    def add_message(self, session_id: str, role: str, content: str, agent: Optional[str] = None) -> Dict[str, Any]:
+        """Add a message to conversation history and update the session's topic context
+        
+        Returns the updated context (see get_session_context), so callers that keep
+        session state can route the next message without reading it back.
+        """
         key = self.get_conversation_key(session_id)
         message = {
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat()
         }
+        context = self._next_session_context(session_id, content, agent)
+        
+        pipe = self.redis_client.pipeline(transaction=False)
         
         # Add message to list
-        self.redis_client.lpush(key, json.dumps(message))
+        pipe.lpush(key, json.dumps(message))
         
         # Limit conversation length
-        self.redis_client.ltrim(key, 0, self.config.MAX_CONVERSATION_LENGTH - 1)
+        pipe.ltrim(key, 0, self.config.MAX_CONVERSATION_LENGTH - 1)
+        
+        # Set TTL for session (the context lives exactly as long as the history)
+        pipe.expire(key, self.config.DEFAULT_SESSION_TTL)
+        context_key = self.get_session_context_key(session_id)
+        pipe.hset(context_key, mapping={field: value for field, value in context.items() if value is not None})
+        pipe.expire(context_key, self.config.DEFAULT_SESSION_TTL)
+        pipe.execute()
         
-        # Set TTL for session
-        self.redis_client.expire(key, self.config.DEFAULT_SESSION_TTL)
+        return context
     
     def get_conversation_history(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get conversation history for a session"""
@@ -72,6 +96,21 @@ class RedisManager:
         else:
             messages = self.redis_client.lrange(key, 0, -1)
         
+        return self._parse_conversation(messages)
+    
+    def get_conversation_histories(self, session_ids: List[str], limit: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Get conversation history for many sessions in one round trip"""
+        session_ids = list(dict.fromkeys(session_ids))
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.lrange(self.get_conversation_key(session_id), 0, limit - 1 if limit else -1)
+        
+        return {session_id: self._parse_conversation(messages)
+                for session_id, messages in zip(session_ids, pipe.execute())}
+    
+    def _parse_conversation(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """Parse stored messages into chronological order"""
         # Parse and reverse (lpush stores in reverse order)
         parsed_messages = []
         for msg in reversed(messages):
@@ -85,7 +124,77 @@ class RedisManager:
     def clear_conversation(self, session_id: str) -> bool:
         """Clear conversation history for a session"""
         key = self.get_conversation_key(session_id)
-        return bool(self.redis_client.delete(key))
+        return bool(self.redis_client.delete(key, self.get_session_context_key(session_id)))
+    
+    # ========== Session Topic Context ==========
+    
+    # Topics tracked per message: (name, bit, words whose presence marks the topic)
+    SESSION_TOPICS = [
+        ("order", 1, ("order", "tracking", "delivery", "shipped")),
+        ("faq", 2, ("policy", "return", "refund", "warranty")),
+    ]
+    
+    # The topics mask holds the latest message's bits, with the previous message's shifted above them
+    SESSION_TOPIC_BITS = 2
+    
+    def get_session_context_key(self, session_id: str) -> str:
+        """Generate Redis key for a session's topic context"""
+        return f"session_ctx:{session_id}"
+    
+    @classmethod
+    def message_topics(cls, content: str) -> int:
+        """Topic bitmask of one message"""
+        text = content.lower()
+        mask = 0
+        for _, bit, words in cls.SESSION_TOPICS:
+            if any(word in text for word in words):
+                mask |= bit
+        return mask
+    
+    @classmethod
+    def recent_topics(cls, context: Optional[Dict[str, Any]]) -> int:
+        """Topics mentioned in the last two messages of a session context"""
+        if not context:
+            return 0
+        topics = int(context.get("topics", 0))
+        return (topics | topics >> cls.SESSION_TOPIC_BITS) & ((1 << cls.SESSION_TOPIC_BITS) - 1)
+    
+    def _next_session_context(self, session_id: str, content: str, agent: Optional[str]) -> Dict[str, Any]:
+        """Session context after one more message"""
+        latest_mask = (1 << self.SESSION_TOPIC_BITS) - 1
+        previous = self.redis_client.hmget(self.get_session_context_key(session_id), ["topics", "last_agent"])
+        previous_topics = int(previous[0] or 0) & latest_mask
+        
+        return {
+            "last_agent": agent or previous[1],
+            "topics": previous_topics << self.SESSION_TOPIC_BITS | self.message_topics(content),
+            "updated_at": time.time()
+        }
+    
+    def get_session_context(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Compact routing context of a session: last_agent, topics bitmask and updated_at"""
+        return self._parse_session_context(self.redis_client.hgetall(self.get_session_context_key(session_id)))
+    
+    def get_session_contexts(self, session_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Session contexts for many sessions in one round trip"""
+        session_ids = list(dict.fromkeys(session_ids))
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hgetall(self.get_session_context_key(session_id))
+        
+        return {session_id: self._parse_session_context(fields)
+                for session_id, fields in zip(session_ids, pipe.execute())}
+    
+    def _parse_session_context(self, fields: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Typed session context from its hash fields"""
+        if not fields:
+            return None
+        return {
+            "last_agent": fields.get("last_agent"),
+            "topics": int(fields.get("topics", 0)),
+            "updated_at": float(fields.get("updated_at", 0))
+        }
     
     # ========== Caching Methods ==========
     
@@ -139,13 +248,206 @@ class RedisManager:
             return cached_data.get("data")
         return None
     
-    def cache_faq_search(self, query: str, results: List[Tuple], ttl: int = 3600) -> bool:
-        """Cache FAQ search results with 1-hour TTL - STEP 5 FIX: Handle tuple conversion"""
-        # Normalize query for consistent caching
-        normalized_query = query.lower().strip()
-        cache_key = f"faq_search:{hash(normalized_query)}"
+    # FAQ searches are keyed by query_key, the shared cache key the FAQ backend gives a query
+    # (see FAQDatabase.cache_key): equivalent phrasings such as "What's your return policy?"
+    # and "return policy" have the same query_key and share one cached search
+    
+    def _faq_cache_identity(self, query_key: str) -> Tuple[str, str]:
+        """A query's shared cache key and its stable digest"""
+        return query_key, hashlib.sha256(query_key.encode("utf-8")).hexdigest()[:32]
+    
+    def get_faq_search_key(self, query_key: str) -> str:
+        """Cache key (without the cache: prefix) for an FAQ search"""
+        return f"faq_search:{self._faq_cache_identity(query_key)[1]}"
+    
+    FAQ_QUERY_COLLAPSE_KEY = "faq_query_collapse"
+    
+    def get_faq_query_variants_key(self, query_key: str) -> str:
+        """Set of raw phrasings seen for a shared FAQ cache key"""
+        return f"faq_query_variants:{self._faq_cache_identity(query_key)[1]}"
+    
+    FAQ_QUERY_VARIANTS_TTL = 86400
+    
+    def _queue_faq_query_variants(self, pipe, queries: List[str], identities: List[Tuple[str, str]],
+                                  ttl: int = FAQ_QUERY_VARIANTS_TTL) -> None:
+        """Queue adding each raw phrasing to its cache key's variant set (two replies per query, SADD first)"""
+        for query, (_, digest) in zip(queries, identities):
+            variants_key = f"faq_query_variants:{digest}"
+            pipe.sadd(variants_key, query.lower().strip())
+            pipe.expire(variants_key, ttl)
+    
+    def _count_new_faq_query_variants(self, identities: List[Tuple[str, str]], added: List[int],
+                                      ttl: int = FAQ_QUERY_VARIANTS_TTL) -> int:
+        """Bump the collapse count of keys that gained a phrasing (a round trip only when one did)"""
+        new_variants = [cache_key for (cache_key, _), was_added in zip(identities, added) if was_added]
+        if new_variants:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for cache_key in new_variants:
+                pipe.zincrby(self.FAQ_QUERY_COLLAPSE_KEY, 1, cache_key)
+            pipe.expire(self.FAQ_QUERY_COLLAPSE_KEY, ttl)
+            pipe.execute()
+        return len(new_variants)
+    
+    def record_faq_query_variants(self, queries: List[str], query_keys: List[str],
+                                  ttl: int = FAQ_QUERY_VARIANTS_TTL) -> int:
+        """Count the distinct raw phrasings that collapse onto each FAQ cache key"""
+        identities = [self._faq_cache_identity(query_key) for query_key in query_keys]
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_faq_query_variants(pipe, queries, identities, ttl)
+            # Only phrasings not seen before add to a key's count
+            return self._count_new_faq_query_variants(identities, pipe.execute()[::2], ttl)
+        except Exception as e:
+            logging.error(f"FAQ query variant tracking error: {e}")
+            return 0
+    
+    def get_faq_query_collapse_stats(self, top_n: int = 10) -> Dict[str, Any]:
+        """How many raw phrasings share each FAQ cache key"""
+        counts = self.redis_client.zrevrange(self.FAQ_QUERY_COLLAPSE_KEY, 0, -1, withscores=True)
+        total_variants = int(sum(score for _, score in counts))
+        
+        return {
+            "cache_keys": len(counts),
+            "raw_variants": total_variants,
+            "variants_per_key": round(total_variants / len(counts), 2) if counts else 0,
+            "top_keys": [{"cache_key": cache_key, "variants": int(score)} for cache_key, score in counts[:top_n]]
+        }
+    
+    # ========== FAQ Query Popularity ==========
+    
+    FAQ_POPULARITY_KEY = "faq_popularity"
+    FAQ_POPULARITY_QUERIES_KEY = "faq_popularity_queries"
+    
+    # Scores are rebased into a new sorted set every this many half-lives so they stay bounded
+    FAQ_POPULARITY_EPOCH_HALF_LIVES = 16
+    FAQ_POPULARITY_MAX_KEYS = 10000
+    
+    # Keys allowed past the cap before a write trims back to it, so trimming is not a round trip per search
+    FAQ_POPULARITY_TRIM_SLACK = 1000
+    
+    def _faq_popularity_epoch(self, now: float) -> Tuple[int, float]:
+        """Current popularity epoch and the time it started"""
+        epoch_length = self.config.FAQ_POPULARITY_HALF_LIFE * self.FAQ_POPULARITY_EPOCH_HALF_LIVES
+        epoch = int(now // epoch_length)
+        return epoch, epoch * epoch_length
+    
+    def _faq_popularity_ttl(self) -> int:
+        """Lifetime of popularity data: two epochs, so the previous one is still there to rebase from"""
+        return 2 * self.config.FAQ_POPULARITY_HALF_LIFE * self.FAQ_POPULARITY_EPOCH_HALF_LIVES
+    
+    def get_faq_popularity_key(self, epoch: int) -> str:
+        """Sorted set of decayed search counts per FAQ cache key for one epoch"""
+        return f"{self.FAQ_POPULARITY_KEY}:{epoch}"
+    
+    def _rebase_faq_popularity(self, epoch: int) -> None:
+        """Carry the previous epoch's scores into this one, once across all processes"""
+        if epoch == self._faq_popularity_rebased_epoch:
+            return
+        self._faq_popularity_rebased_epoch = epoch
+        
+        if not self.redis_client.set(f"{self.get_faq_popularity_key(epoch)}:rebased", 1, nx=True,
+                                     ex=self._faq_popularity_ttl()):
+            return
+        
+        popularity_key = self.get_faq_popularity_key(epoch)
+        previous_key = self.get_faq_popularity_key(epoch - 1)
+        # The previous epoch's increments were scaled from its own start, so shrink them to this one's
+        self.redis_client.zunionstore(popularity_key, {popularity_key: 1,
+                                                       previous_key: 2.0 ** -self.FAQ_POPULARITY_EPOCH_HALF_LIVES})
+        self.redis_client.zremrangebyrank(popularity_key, 0, -self.FAQ_POPULARITY_MAX_KEYS - 1)
+        self.redis_client.delete(previous_key)
+        
+        # Forget representative queries of keys that fell out of the set
+        kept = set(self.redis_client.zrange(popularity_key, 0, -1))
+        dropped = [cache_key for cache_key in self.redis_client.hkeys(self.FAQ_POPULARITY_QUERIES_KEY) if cache_key not in kept]
+        if dropped:
+            self.redis_client.hdel(self.FAQ_POPULARITY_QUERIES_KEY, *dropped)
+    
+    def record_faq_popularity(self, queries: List[str], query_keys: List[str], now: Optional[float] = None) -> None:
+        """Count FAQ searches per cache key with exponentially decayed weights
+        
+        Uses forward decay: a search at time t adds 2^((t - epoch start) / half-life),
+        so newer searches weigh more and ranking by score ranks by decayed count
+        without ever rewriting existing scores.
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            popularity_key = self._queue_faq_popularity(pipe, queries,
+                                                        [self._faq_cache_identity(query_key) for query_key in query_keys], now)
+            self._trim_faq_popularity(popularity_key, pipe.execute()[-1])
+        except Exception as e:
+            logging.error(f"FAQ popularity tracking error: {e}")
+    
+    def _queue_faq_popularity(self, pipe, queries: List[str], identities: List[Tuple[str, str]],
+                              now: Optional[float] = None) -> str:
+        """Queue the decayed popularity increments of searched queries
+        
+        The last queued command is a ZCARD of the returned popularity key; pass
+        its reply to _trim_faq_popularity.
+        """
+        now = time.time() if now is None else now
+        epoch, epoch_start = self._faq_popularity_epoch(now)
+        weight = 2.0 ** ((now - epoch_start) / self.config.FAQ_POPULARITY_HALF_LIFE)
+        popularity_key = self.get_faq_popularity_key(epoch)
+        
+        # Only talks to Redis on the first search of an epoch
+        self._rebase_faq_popularity(epoch)
+        
+        for query, (cache_key, _) in zip(queries, identities):
+            pipe.zincrby(popularity_key, weight, cache_key)
+            # The latest phrasing stands in for its cache key when preloading
+            pipe.hset(self.FAQ_POPULARITY_QUERIES_KEY, cache_key, query.strip())
+        pipe.expire(popularity_key, self._faq_popularity_ttl())
+        pipe.expire(self.FAQ_POPULARITY_QUERIES_KEY, self._faq_popularity_ttl())
+        pipe.zcard(popularity_key)
+        return popularity_key
+    
+    def _trim_faq_popularity(self, popularity_key: str, size: int) -> None:
+        """Keep only the most popular keys and their queries (a round trip only when over the cap)"""
+        if size <= self.FAQ_POPULARITY_MAX_KEYS + self.FAQ_POPULARITY_TRIM_SLACK:
+            return
+        
+        dropped = self.redis_client.zrange(popularity_key, 0, size - self.FAQ_POPULARITY_MAX_KEYS - 1)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zremrangebyrank(popularity_key, 0, -self.FAQ_POPULARITY_MAX_KEYS - 1)
+        if dropped:
+            pipe.hdel(self.FAQ_POPULARITY_QUERIES_KEY, *dropped)
+        pipe.execute()
+    
+    def track_faq_searches(self, queries: List[str], query_keys: List[str]) -> None:
+        """Record searched queries for collapse stats and popularity in one round trip"""
+        identities = [self._faq_cache_identity(query_key) for query_key in query_keys]
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_faq_query_variants(pipe, queries, identities)
+            popularity_key = self._queue_faq_popularity(pipe, queries, identities)
+            replies = pipe.execute()
+            self._count_new_faq_query_variants(identities, replies[:2 * len(queries):2])
+            self._trim_faq_popularity(popularity_key, replies[-1])
+        except Exception as e:
+            logging.error(f"FAQ search tracking error: {e}")
+    
+    def get_popular_faq_queries(self, top_n: int = 20, now: Optional[float] = None) -> List[str]:
+        """Representative queries of the top_n most searched FAQ cache keys, most popular first"""
+        now = time.time() if now is None else now
+        epoch, _ = self._faq_popularity_epoch(now)
+        popularity_key = self.get_faq_popularity_key(epoch)
         
-        # Convert tuples to lists for JSON serialization
+        try:
+            self._rebase_faq_popularity(epoch)
+            
+            cache_keys = self.redis_client.zrevrange(popularity_key, 0, top_n - 1)
+            if not cache_keys:
+                return []
+            queries = self.redis_client.hmget(self.FAQ_POPULARITY_QUERIES_KEY, cache_keys)
+            return [query for query in queries if query]
+        except Exception as e:
+            logging.error(f"FAQ popularity read error: {e}")
+            return []
+    
+    def _build_faq_search_entry(self, query: str, results: List[Tuple]) -> Dict[str, Any]:
+        """Cache entry for FAQ search results, with tuples converted to lists for JSON"""
         serializable_results = []
         for result in results:
             if isinstance(result, tuple):
@@ -153,36 +455,182 @@ class RedisManager:
             else:
                 serializable_results.append(result)
         
-        cached_data = {
+        return {
             "query": query,
             "results": serializable_results,
             "cached_at": datetime.now().isoformat(),
             "cache_type": "faq_search"
         }
+    
+    def _parse_faq_search_entry(self, cached_data: Any) -> Optional[List[Tuple]]:
+        """FAQ search results from a cache entry, with lists converted back to tuples"""
+        if cached_data and isinstance(cached_data, dict):
+            results = cached_data.get("results")
+            if results:
+                return [tuple(result) if isinstance(result, list) else result for result in results]
+        return None
+    
+    def cache_faq_search(self, query: str, query_key: str, results: List[Tuple], ttl: int = 3600) -> bool:
+        """Cache FAQ search results with 1-hour TTL - STEP 5 FIX: Handle tuple conversion"""
+        cache_key = self.get_faq_search_key(query_key)
+        cached_data = self._build_faq_search_entry(query, results)
         
         success = self.cache_set(cache_key, cached_data, ttl)
         if success:
+            self._track_faq_search_refs(cache_key, results, ttl)
             print(f"💾 Cached {len(results)} FAQ search results for: '{query}'")  # STEP 6: FIX - Consistent message format
         return success
     
-    def get_cached_faq_search(self, query: str) -> Optional[List[Tuple]]:
+    # Set listing every cached FAQ search key (without the cache: prefix), so reloads need no SCAN
+    FAQ_SEARCH_KEYS_KEY = "cache:faq_search_keys"
+    
+    def get_faq_search_refs_key(self, faq_id: str) -> str:
+        """Set of cached FAQ search keys whose results include an FAQ"""
+        return f"faq_search_refs:{faq_id}"
+    
+    def _track_faq_search_refs(self, cache_key: str, results: List[Tuple], ttl: int, pipe=None) -> None:
+        """Record a cached search and which FAQs it returned, so an FAQ change only drops the searches showing it"""
+        own_pipe = pipe is None
+        if own_pipe:
+            pipe = self.redis_client.pipeline(transaction=False)
+        
+        pipe.sadd(self.FAQ_SEARCH_KEYS_KEY, cache_key)
+        # The set outlives every search it lists
+        pipe.expire(self.FAQ_SEARCH_KEYS_KEY, ttl)
+        for result in results:
+            refs_key = self.get_faq_search_refs_key(result[0])
+            pipe.sadd(refs_key, cache_key)
+            pipe.expire(refs_key, ttl)
+        
+        if own_pipe:
+            try:
+                pipe.execute()
+            except Exception as e:
+                logging.error(f"FAQ search refs error: {e}")
+    
+    def get_faq_searches_for(self, faq_ids: List[str]) -> Set[str]:
+        """Cache keys (without the cache: prefix) of the cached FAQ searches whose results include any of the given FAQs"""
+        if not faq_ids:
+            return set()
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for faq_id in faq_ids:
+            pipe.smembers(self.get_faq_search_refs_key(faq_id))
+        return set().union(*pipe.execute())
+    
+    def clear_faq_search_refs(self, faq_ids: List[str]) -> None:
+        """Forget which cached searches returned the given FAQs"""
+        if faq_ids:
+            self.redis_client.delete(*[self.get_faq_search_refs_key(faq_id) for faq_id in faq_ids])
+    
+    def invalidate_faq_searches_for(self, faq_ids: List[str]) -> int:
+        """Delete the cached FAQ searches whose results include any of the given FAQs"""
+        deleted_count = self.delete_faq_searches(list(self.get_faq_searches_for(faq_ids)))
+        self.clear_faq_search_refs(faq_ids)
+        return deleted_count
+    
+    def get_cached_faq_search_queries(self) -> Dict[str, str]:
+        """Original query of every cached FAQ search, keyed by cache key (without the cache: prefix)"""
+        cache_keys = list(self.redis_client.smembers(self.FAQ_SEARCH_KEYS_KEY))
+        if not cache_keys:
+            return {}
+        
+        queries = {}
+        expired = []
+        for cache_key, value in zip(cache_keys, self.redis_client.mget([f"cache:{cache_key}" for cache_key in cache_keys])):
+            if value is None:
+                expired.append(cache_key)
+                continue
+            try:
+                cached_data = json.loads(value)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(cached_data, dict) and cached_data.get("query"):
+                queries[cache_key] = cached_data["query"]
+        
+        # Searches that expired are still listed until the next read
+        if expired:
+            self.redis_client.srem(self.FAQ_SEARCH_KEYS_KEY, *expired)
+        return queries
+    
+    def delete_faq_searches(self, cache_keys: List[str]) -> int:
+        """Delete cached FAQ searches by cache key (without the cache: prefix)"""
+        if not cache_keys:
+            return 0
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.delete(*[f"cache:{cache_key}" for cache_key in cache_keys])
+        pipe.srem(self.FAQ_SEARCH_KEYS_KEY, *cache_keys)
+        return pipe.execute()[0]
+    
+    def get_cached_faq_search(self, query_key: str) -> Optional[List[Tuple]]:
         """Get cached FAQ search results - STEP 5 FIX: Convert lists back to tuples"""
-        normalized_query = query.lower().strip()
-        cache_key = f"faq_search:{hash(normalized_query)}"
+        return self.get_cached_faq_search_by_key(self.get_faq_search_key(query_key))
+    
+    def get_cached_faq_search_by_key(self, cache_key: str) -> Optional[List[Tuple]]:
+        """Get cached FAQ search results by cache key (without the cache: prefix)"""
         cached_data = self.cache_get(cache_key)
+        return self._parse_faq_search_entry(cached_data)
+    
+    def get_cached_faq_searches(self, queries: List[str], query_keys: List[str],
+                                track: bool = False) -> List[Optional[List[Tuple]]]:
+        """Get cached FAQ search results for many queries in one round trip
         
-        if cached_data and isinstance(cached_data, dict):
-            results = cached_data.get("results")
-            if results:
-                # Convert lists back to tuples
-                tuple_results = []
-                for result in results:
-                    if isinstance(result, list):
-                        tuple_results.append(tuple(result))
-                    else:
-                        tuple_results.append(result)
-                return tuple_results
-        return None
+        With track, the searches are also recorded for query collapse stats and
+        popularity in the same pipeline, reusing each query's cache identity.
+        """
+        if not queries:
+            return []
+        
+        identities = [self._faq_cache_identity(query_key) for query_key in query_keys]
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.mget([f"cache:faq_search:{digest}" for _, digest in identities])
+            if track:
+                self._queue_faq_query_variants(pipe, queries, identities)
+                popularity_key = self._queue_faq_popularity(pipe, queries, identities)
+            replies = pipe.execute()
+        except Exception as e:
+            logging.error(f"Cache mget error: {e}")
+            return [None] * len(queries)
+        
+        if track:
+            try:
+                # SADD replies follow the MGET, one every two commands
+                self._count_new_faq_query_variants(identities, replies[1:1 + 2 * len(queries):2])
+                self._trim_faq_popularity(popularity_key, replies[-1])
+            except Exception as e:
+                logging.error(f"FAQ search tracking error: {e}")
+        values = replies[0]
+        
+        cached_results = []
+        for value in values:
+            try:
+                cached_data = json.loads(value) if value is not None else None
+            except json.JSONDecodeError:
+                cached_data = None
+            cached_results.append(self._parse_faq_search_entry(cached_data))
+        return cached_results
+    
+    def cache_faq_searches(self, searches: Dict[str, List[Tuple]], query_keys: Dict[str, str], ttl: int = 3600) -> int:
+        """Cache FAQ search results for many queries (with their shared cache keys) in one pipelined round trip"""
+        if not searches:
+            return 0
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            set_positions = []
+            for query, results in searches.items():
+                cache_key = self.get_faq_search_key(query_keys[query])
+                cached_data = self._build_faq_search_entry(query, results)
+                set_positions.append(len(pipe))
+                pipe.setex(f"cache:{cache_key}", ttl, json.dumps(cached_data))
+                self._track_faq_search_refs(cache_key, results, ttl, pipe)
+            replies = pipe.execute()
+            return sum(1 for position in set_positions if replies[position])
+        except Exception as e:
+            logging.error(f"Cache pipeline error: {e}")
+            return 0
     
     def cache_order_summary(self, order_id: str, summary: str, ttl: int = 1800) -> bool:
         """Cache order status summary"""
@@ -203,12 +651,14 @@ class RedisManager:
             return cached_data.get("summary")
         return None
     
-    def invalidate_order_cache(self, order_id: str) -> int:
+    def invalidate_order_cache(self, order_id: str, include_fields: bool = True) -> int:
         """Invalidate all cached data for an order (when order status changes)"""
         patterns = [
             f"cache:order:{order_id}",
             f"cache:order_summary:{order_id}"
         ]
+        if include_fields:
+            patterns.append(self.get_order_fields_key(order_id))
         
         deleted_count = 0
         for pattern in patterns:
@@ -217,6 +667,179 @@ class RedisManager:
                 
         return deleted_count
     
+    def get_email_search_pages_key(self, email: str) -> str:
+        """Redis key of the set listing a customer email's cached search pages"""
+        return f"cache:email_search_pages:{email.lower()}"
+    
+    def cache_email_search_page(self, email: str, cursor: int, limit: int, page: Dict, ttl: int = 600) -> bool:
+        """Cache one page of an email's order search and record its key for invalidation"""
+        key = f"cache:email_search:{email.lower()}:{cursor}:{limit}"
+        pages_key = self.get_email_search_pages_key(email)
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(key, ttl, json.dumps(page))
+            pipe.sadd(pages_key, key)
+            # The set outlives every page it lists
+            pipe.expire(pages_key, ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logging.error(f"Email search page cache error: {e}")
+            return False
+    
+    def invalidate_email_search_cache(self, email: str) -> int:
+        """Invalidate cached order searches (full list and every recorded page) for a customer email"""
+        pages_key = self.get_email_search_pages_key(email)
+        
+        pipe = self.redis_client.pipeline()
+        pipe.smembers(pages_key)
+        pipe.delete(pages_key)
+        page_keys = pipe.execute()[0]
+        
+        return self.redis_client.delete(f"cache:email_search:{email.lower()}", *page_keys)
+    
+    # ========== Field-Level Order Cache ==========
+    
+    ORDER_STATUS_FIELDS = ["status", "tracking_number", "estimated_delivery", "carrier"]
+    
+    def get_order_fields_key(self, order_id: str) -> str:
+        """Generate Redis key for a hash-encoded cached order"""
+        return f"cache:order_fields:{order_id}"
+    
+    def cache_order_fields(self, order_id: str, order_data: Dict, ttl: int = 1800) -> bool:
+        """Cache order data as a Redis hash with one JSON-encoded value per field"""
+        key = self.get_order_fields_key(order_id)
+        mapping = {field: json.dumps(value) for field, value in order_data.items()}
+        mapping["_cached_at"] = json.dumps(datetime.now().isoformat())
+        
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.delete(key)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logging.error(f"Order field cache set error: {e}")
+            return False
+    
+    def get_cached_order_fields(self, order_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """Get selected fields (or the whole order) from the hash-encoded order cache"""
+        key = self.get_order_fields_key(order_id)
+        
+        try:
+            if fields:
+                values = self.redis_client.hmget(key, fields)
+                # Every field is stored, so all-missing means the order isn't cached
+                if all(value is None for value in values):
+                    return None
+                return {field: json.loads(value) if value is not None else None for field, value in zip(fields, values)}
+            
+            values = self.redis_client.hgetall(key)
+            if not values:
+                return None
+            return {field: json.loads(value) for field, value in values.items() if not field.startswith("_")}
+        except Exception as e:
+            logging.error(f"Order field cache get error: {e}")
+            return None
+    
+    def patch_cached_order_fields(self, order_id: str, updates: Dict) -> bool:
+        """Update individual fields of a cached order in place, keeping its TTL
+        
+        Only patches an order that is already cached, so a partially populated
+        hash is never created.
+        """
+        key = self.get_order_fields_key(order_id)
+        mapping = {field: json.dumps(value) for field, value in updates.items()}
+        if not mapping:
+            return False
+        
+        try:
+            with self.redis_client.pipeline() as pipe:
+                pipe.watch(key)
+                if not pipe.exists(key):
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.hset(key, mapping=mapping)
+                pipe.execute()
+            return True
+        except redis.exceptions.WatchError:
+            # The entry changed or expired underneath us; drop it rather than risk a stale mix
+            self.redis_client.delete(key)
+            return False
+        except Exception as e:
+            logging.error(f"Order field cache patch error: {e}")
+            return False
+    
+    # ========== Order Change Stream ==========
+    
+    ORDER_CHANGES_STREAM = "order_changes"
+    
+    def publish_order_change(self, event: Dict[str, Any], maxlen: int = 10000) -> Optional[str]:
+        """Append an order change event to the order change stream"""
+        try:
+            fields = {
+                "event_type": event["event_type"],
+                "order_id": event["order_id"],
+                "payload": json.dumps(event)
+            }
+            return self.redis_client.xadd(self.ORDER_CHANGES_STREAM, fields, maxlen=maxlen, approximate=True)
+        except Exception as e:
+            logging.error(f"Order change publish error: {e}")
+            return None
+    
+    def ensure_order_change_group(self, group: str) -> None:
+        """Create the consumer group for the order change stream if it doesn't exist"""
+        try:
+            self.redis_client.xgroup_create(self.ORDER_CHANGES_STREAM, group, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    def read_order_changes(self, group: str, consumer: str, count: int = 100,
+                           block_ms: Optional[int] = None, pending: bool = False) -> List[Tuple[str, Dict]]:
+        """Read order change events for a consumer group member as (entry_id, event) pairs"""
+        response = self.redis_client.xreadgroup(
+            group, consumer,
+            {self.ORDER_CHANGES_STREAM: "0" if pending else ">"},
+            count=count,
+            block=block_ms
+        )
+        
+        events = []
+        for _, entries in response or []:
+            events.extend(self._parse_order_changes(entries))
+        return events
+    
+    def claim_order_changes(self, group: str, consumer: str, min_idle_ms: int, count: int = 100,
+                            start_id: str = "0-0") -> Tuple[str, List[Tuple[str, Dict]]]:
+        """Take over events any group member read but left unacknowledged for at least min_idle_ms
+        
+        Scans the pending list from start_id and returns the cursor to continue
+        from ("0-0" once the whole list has been scanned) with the claimed events.
+        """
+        response = self.redis_client.xautoclaim(self.ORDER_CHANGES_STREAM, group, consumer,
+                                                min_idle_time=min_idle_ms, start_id=start_id, count=count)
+        return response[0], self._parse_order_changes(response[1])
+    
+    def _parse_order_changes(self, entries) -> List[Tuple[str, Dict]]:
+        """(entry_id, event) pairs from raw stream entries"""
+        events = []
+        for entry_id, fields in entries:
+            try:
+                events.append((entry_id, json.loads((fields or {}).get("payload", "{}"))))
+            except json.JSONDecodeError:
+                events.append((entry_id, {}))
+        return events
+    
+    def ack_order_changes(self, group: str, entry_ids: List[str]) -> int:
+        """Acknowledge processed order change events"""
+        if not entry_ids:
+            return 0
+        return self.redis_client.xack(self.ORDER_CHANGES_STREAM, group, *entry_ids)
+    
     # ========== Session Management ==========
     
     def create_session(self, session_id: str, user_data: Dict[str, Any] = None) -> bool:
@@ -317,6 +940,7 @@ class RedisManager:
         
         # STEP 5: Count domain-specific cache types
         order_cache_count = len(self.redis_client.keys("cache:order:*"))
+        order_field_cache_count = len(self.redis_client.keys("cache:order_fields:*"))
         faq_cache_count = len(self.redis_client.keys("cache:faq_search:*"))
         agent_state_count = len(self.redis_client.keys("cache:agent_state:*"))
         
@@ -329,7 +953,9 @@ class RedisManager:
             "sessions": session_count,
             "cached_items": cache_count,
             "order_cache": order_cache_count,
+            "order_field_cache": order_field_cache_count,
             "faq_cache": faq_cache_count,
+            "faq_query_cache_keys": self.redis_client.zcard(self.FAQ_QUERY_COLLAPSE_KEY),
             "agent_states": agent_state_count
         }
     
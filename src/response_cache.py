@@ -0,0 +1,188 @@
+# src/response_cache.py - Semantic cache of complete FAQ agent answers
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Dict, List, Optional, Sequence
+
+from redis_manager import RedisManager
+from faq_cache_manager import FAQCacheManager
+from semantic_cache import SemanticQueryCache
+
+class SemanticResponseCache:
+    """Final agent answers reused for questions that mean the same thing
+    
+    Entries (question, answer, FAQ IDs the answer was built from) live in Redis
+    under a digest of the FAQ corpus contents, so every process serving the same
+    corpus shares them and no process can read answers built from another one.
+    Questions are indexed by the local hashed n-gram encoder, so a lookup needs
+    no network call. Questions or answers matching an exclude pattern (order
+    IDs, emails) are never stored or served. A corpus change moves the cache to
+    a new namespace, and a sample of hits is checked against a fresh FAQ
+    search: if the question's best FAQ is not one the cached answer used, the
+    entry is dropped and the agent answers instead.
+    """
+    
+    KEY_PREFIX = "response_cache"
+    
+    def __init__(self, redis_manager: RedisManager, faq_cache: FAQCacheManager, min_similarity: float = 0.85,
+                 max_entries: int = 1000, ttl: int = 3600, validation_rate: float = 0.1,
+                 exclude_patterns: Sequence[re.Pattern] = ()):
+        self.redis = redis_manager
+        self.faq_cache = faq_cache
+        self.ttl = ttl
+        self.validation_rate = validation_rate
+        self.exclude_patterns = list(exclude_patterns)
+        self.index = SemanticQueryCache(redis_manager, 1.0 - min_similarity, max_entries)
+        self._rng = random.Random()
+        
+        self.stores = 0
+        self.rejected = 0
+        self.validations = 0
+        self.validation_failures = 0
+        self.invalidated = 0
+        
+        # The backend's own version is only a cheap local change signal; keys use the content digest
+        self.backend_version = self._backend_version()
+        self.corpus_digest = self._corpus_digest()
+        self.load_from_redis()
+    
+    def _backend_version(self):
+        return getattr(self.faq_cache.backend, "version", None)
+    
+    def _corpus_digest(self) -> str:
+        """Digest of the FAQ corpus contents (the same in every process serving that corpus)"""
+        faqs = self.faq_cache.backend.get_all_faqs()
+        return hashlib.sha256(json.dumps(faqs, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    
+    def _key_prefix(self) -> str:
+        return f"{self.KEY_PREFIX}:{self.corpus_digest}"
+    
+    def get_entry_key(self, question: str) -> str:
+        """Redis key of a question's entry for the current corpus"""
+        normalized = " ".join(question.lower().split())
+        return f"{self._key_prefix()}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+    
+    def _sync_corpus(self) -> None:
+        """Switch to the namespace of the current corpus after a reload changed it
+        
+        Entries under the old digest are left to expire: they are still right for
+        processes that have not reloaded yet.
+        """
+        backend_version = self._backend_version()
+        if backend_version == self.backend_version:
+            return
+        
+        self.backend_version = backend_version
+        corpus_digest = self._corpus_digest()
+        if corpus_digest == self.corpus_digest:
+            return
+        
+        dropped = len(self.index.key_slots)
+        for cache_key in list(self.index.key_slots):
+            self.index.remove(cache_key)
+        
+        self.invalidated += dropped
+        self.corpus_digest = corpus_digest
+        loaded = self.load_from_redis()
+        print(f"🗑️  FAQ corpus {corpus_digest}: dropped {dropped} cached agent answers, loaded {loaded}")
+    
+    def is_cacheable(self, text: str) -> bool:
+        """Whether text is free of session-specific data (order IDs, emails)"""
+        return not any(pattern.search(text) for pattern in self.exclude_patterns)
+    
+    def lookup(self, question: str) -> Optional[str]:
+        """Cached answer to an equivalent question, if one is stored and passes validation"""
+        if not self.is_cacheable(question):
+            return None
+        
+        self._sync_corpus()
+        match = self.index.lookup(question)
+        if match is None:
+            return None
+        
+        cache_key, similarity = match
+        cached = self.redis.redis_client.get(cache_key)
+        if cached is None:
+            # Expired or invalidated in Redis
+            self.index.remove(cache_key)
+            return None
+        
+        entry = json.loads(cached)
+        if self._rng.random() < self.validation_rate and not self._validate(question, entry):
+            self.redis.redis_client.delete(cache_key)
+            self.index.remove(cache_key)
+            return None
+        
+        print(f"🧠 Response cache HIT: '{question}' (similarity {similarity:.2f})")
+        return entry["answer"]
+    
+    def _validate(self, question: str, entry: Dict) -> bool:
+        """Whether a fresh FAQ search for question still points at an FAQ the cached answer used"""
+        self.validations += 1
+        if not entry["faq_ids"]:
+            return True
+        
+        results = self.faq_cache.search_faqs(question)
+        if results and results[0][0] in entry["faq_ids"]:
+            return True
+        
+        self.validation_failures += 1
+        print(f"⚠️  Response cache entry failed validation for '{question}', dropping it")
+        return False
+    
+    def store(self, question: str, answer: str, faq_ids: List[str]) -> bool:
+        """Cache an answer; refused when the question or answer carries session-specific data"""
+        if not self.is_cacheable(question) or not self.is_cacheable(answer):
+            self.rejected += 1
+            return False
+        
+        self._sync_corpus()
+        cache_key = self.get_entry_key(question)
+        entry = {"question": question, "answer": answer, "faq_ids": sorted(set(faq_ids)), "cached_at": time.time()}
+        self.redis.redis_client.setex(cache_key, self.ttl, json.dumps(entry))
+        self.index.add(question, cache_key, self.ttl)
+        self.stores += 1
+        return True
+    
+    def clear(self) -> int:
+        """Drop every cached answer, for every corpus"""
+        keys = list(self.redis.redis_client.scan_iter(match=f"{self.KEY_PREFIX}:*"))
+        if keys:
+            self.redis.redis_client.delete(*keys)
+        for cache_key in list(self.index.key_slots):
+            self.index.remove(cache_key)
+        return len(keys)
+    
+    def load_from_redis(self) -> int:
+        """Index the entries other processes cached for the current corpus"""
+        keys = list(self.redis.redis_client.scan_iter(match=f"{self._key_prefix()}:*"))
+        if not keys:
+            return 0
+        
+        pipe = self.redis.redis_client.pipeline(transaction=False)
+        pipe.mget(keys)
+        for key in keys:
+            pipe.ttl(key)
+        values, *ttls = pipe.execute()
+        
+        loaded_count = 0
+        for key, value, ttl in zip(keys, values, ttls):
+            if value is not None and ttl and ttl > 0:
+                self.index.add(json.loads(value)["question"], key, ttl)
+                loaded_count += 1
+        return loaded_count
+    
+    def get_stats(self) -> Dict[str, any]:
+        """Hit rate plus guardrail and validation counts"""
+        stats = self.index.get_stats()
+        stats.update({
+            "stores": self.stores,
+            "rejected": self.rejected,
+            "validations": self.validations,
+            "validation_failures": self.validation_failures,
+            "invalidated": self.invalidated,
+            "corpus_digest": self.corpus_digest
+        })
+        return stats
@@ -0,0 +1,241 @@
+# src/routing_benchmark.py - Offline accuracy and latency benchmark for AgentRouter
+import sys
+import os
+import json
+import time
+import random
+import argparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+
+from redis_manager import RedisManager
+from agent_router import AgentRouter
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+CORPUS_PATH = os.path.join(DATA_DIR, 'routing_benchmark.jsonl')
+BASELINE_PATH = os.path.join(DATA_DIR, 'routing_benchmark_baseline.json')
+
+# Message templates per expected agent; slots are filled from SLOT_VALUES (order_id and email are generated)
+TEMPLATES = {
+    "order_lookup": [
+        "What's the status of order {order_id}?",
+        "Where is my order {order_id}?",
+        "Has {order_id} shipped yet?",
+        "Track order {order_id} please",
+        "Can you check {order_id} for me?",
+        "When will {order_id} be delivered?",
+        "What's the tracking number for {order_id}?",
+        "Is order {order_id} still processing?",
+        "status of {order_id}",
+        "My delivery is late, can you check {order_id}?",
+        "Show me orders for {email}",
+        "Find my orders, my email is {email}",
+        "Look up my recent purchases for {email}",
+        "What did I order? My email is {email}",
+        "Where is my {item}?",
+        "I ordered a {item} {when}, where is it?",
+        "When will my {item} arrive?",
+        "Has my {item} shipped yet?",
+        "Can you track my {parcel}?",
+        "Is my {parcel} out for delivery?",
+        "My {parcel} was supposed to arrive {when}",
+        "I haven't received my {parcel} yet",
+        "Check the shipping status of my order",
+        "What's happening with my delivery?",
+    ],
+    "faq": [
+        "What is your {policy} policy?",
+        "Can you explain the {policy} policy?",
+        "How do I return my {item}?",
+        "Can I get a refund for my {item}?",
+        "How long do refunds take?",
+        "What payment methods do you accept?",
+        "Do you accept {payment}?",
+        "Can I pay with {payment}?",
+        "How long is the warranty on the {item}?",
+        "My {item} stopped working, is it covered?",
+        "How do I contact support?",
+        "Can I speak to a human?",
+        "What are your business hours on {day}?",
+        "Do you ship to {country}?",
+        "How much does shipping to {country} cost?",
+        "How do I reset my password?",
+        "Do you offer bulk discounts?",
+        "Is the {item} in stock?",
+        "How do I cancel an order?",
+        "Hello",
+        "Hi, I have a question",
+        "Thanks for your help",
+    ],
+}
+
+SLOT_VALUES = {
+    "item": ["speaker", "laptop", "jacket", "phone case", "monitor", "blender", "coffee maker"],
+    "parcel": ["package", "parcel", "shipment", "box"],
+    "day": ["Monday", "Saturday", "Sunday", "public holidays"],
+    "when": ["on Monday", "yesterday", "last week", "two days ago"],
+    "policy": ["return", "refund", "privacy", "shipping", "exchange"],
+    "payment": ["PayPal", "Apple Pay", "credit cards", "gift cards", "bank transfer"],
+    "country": ["Canada", "Germany", "Japan", "Australia", "Mexico"],
+}
+
+def _fill(template: str, rng: random.Random) -> str:
+    """Fill a template's slots with random values"""
+    values = {slot: rng.choice(options) for slot, options in SLOT_VALUES.items()}
+    order_id = f"ORD{rng.randint(1001, 1050)}"
+    values["order_id"] = order_id.lower() if rng.random() < 0.1 else order_id
+    values["email"] = f"customer{rng.randint(1, 50)}@example.com"
+    return template.format(**values)
+
+def generate_corpus(per_template: int = 8, seed: int = 7) -> List[Dict[str, str]]:
+    """Labelled messages from TEMPLATES (deterministic for a given seed, duplicates dropped)"""
+    rng = random.Random(seed)
+    examples = {}
+    for agent, templates in TEMPLATES.items():
+        for template in templates:
+            for _ in range(per_template):
+                examples.setdefault(_fill(template, rng), agent)
+    return [{"message": message, "agent": agent} for message, agent in examples.items()]
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Tuple[str, str]]:
+    """(message, expected agent) pairs from a JSON lines corpus"""
+    with open(path, "r", encoding="utf-8") as corpus_file:
+        examples = [json.loads(line) for line in corpus_file if line.strip()]
+    return [(example["message"], example["agent"]) for example in examples]
+
+def save_corpus(examples: List[Dict[str, str]], path: str = CORPUS_PATH) -> None:
+    """Write a corpus as JSON lines"""
+    with open(path, "w", encoding="utf-8") as corpus_file:
+        for example in examples:
+            corpus_file.write(json.dumps(example) + "\n")
+
+def make_offline_router() -> AgentRouter:
+    """AgentRouter over an in-process Redis stand-in (no server or network needed)"""
+    # Test/benchmark-only dependency, so not imported with the module
+    import fakeredis
+    
+    redis_manager = RedisManager(redis_client=fakeredis.FakeRedis(decode_responses=True))
+    return AgentRouter(redis_manager)
+
+def run_benchmark(corpus: Sequence[Tuple[str, str]], router: Optional[AgentRouter] = None,
+                  rounds: int = 3) -> Dict[str, any]:
+    """Accuracy, confusion matrix and per-message route_message latency over a corpus
+    
+    Every message is routed for a fresh session, with the routing cache off, so
+    latency covers the full scoring work plus the session context read. Latency
+    percentiles are taken over all rounds.
+    """
+    router = router or make_offline_router()
+    router.cache_size = 0
+    
+    agents = sorted({agent for _, agent in corpus} | {"order_lookup", "faq"})
+    confusion = {expected: {predicted: 0 for predicted in agents} for expected in agents}
+    latencies = []
+    mistakes = []
+    
+    for round_number in range(rounds):
+        for position, (message, expected) in enumerate(corpus):
+            session_id = f"benchmark_{round_number}_{position}"
+            start_time = time.perf_counter()
+            predicted, _ = router.route_message(message, session_id)
+            latencies.append(time.perf_counter() - start_time)
+            
+            if round_number == 0:
+                confusion[expected][predicted] += 1
+                if predicted != expected:
+                    mistakes.append({"message": message, "expected": expected, "predicted": predicted})
+    
+    correct = sum(confusion[agent][agent] for agent in agents)
+    latency_ms = np.percentile(np.array(latencies) * 1000, [50, 90, 99])
+    return {
+        "messages": len(corpus),
+        "accuracy": round(correct / len(corpus), 4) if corpus else 0.0,
+        "confusion": confusion,
+        "latency_ms": {name: round(float(value), 4) for name, value in zip(["p50", "p90", "p99"], latency_ms)},
+        "mistakes": mistakes
+    }
+
+def check_regressions(report: Dict[str, any], baseline: Dict[str, any], accuracy_tolerance: float = 0.01,
+                      latency_tolerance: float = 3.0) -> List[str]:
+    """Ways a report is worse than the baseline (empty if none)
+    
+    Accuracy may drop by at most accuracy_tolerance; p50 and p90 latency may grow
+    to at most latency_tolerance times the baseline, leaving room for slower
+    machines. p99 is reported but not checked, being mostly scheduler noise.
+    """
+    failures = []
+    if report["accuracy"] < baseline["accuracy"] - accuracy_tolerance:
+        failures.append(f"accuracy {report['accuracy']:.2%} is below the baseline {baseline['accuracy']:.2%}")
+    
+    for percentile in ["p50", "p90"]:
+        limit = baseline["latency_ms"][percentile] * latency_tolerance
+        if report["latency_ms"][percentile] > limit:
+            failures.append(f"{percentile} latency {report['latency_ms'][percentile]:.3f}ms exceeds {limit:.3f}ms "
+                            f"({latency_tolerance:g}x the baseline)")
+    return failures
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, any]:
+    """Stored benchmark baseline"""
+    with open(path, "r", encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+def save_baseline(report: Dict[str, any], path: str = BASELINE_PATH) -> None:
+    """Store a report's headline numbers as the new baseline"""
+    baseline = {key: report[key] for key in ["messages", "accuracy", "latency_ms"]}
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2)
+        baseline_file.write("\n")
+
+def format_report(report: Dict[str, any]) -> str:
+    """Human-readable summary with the confusion matrix"""
+    agents = list(report["confusion"])
+    width = max(len(agent) for agent in agents) + 2
+    
+    lines = [f"📊 Routing accuracy: {report['accuracy']:.2%} over {report['messages']} messages",
+             "⏱️  route_message latency: " + ", ".join(f"{name} {value:.3f}ms" for name, value in report["latency_ms"].items()),
+             "",
+             "expected \\ predicted".ljust(width + 10) + "".join(agent.rjust(width) for agent in agents)]
+    for expected in agents:
+        lines.append(expected.ljust(width + 10) + "".join(str(report["confusion"][expected][predicted]).rjust(width)
+                                                       for predicted in agents))
+    
+    for mistake in report["mistakes"][:10]:
+        lines.append(f"❌ {mistake['message']!r}: expected {mistake['expected']}, got {mistake['predicted']}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Benchmark CLI"""
+    parser = argparse.ArgumentParser(description="Measure routing accuracy and latency against a stored baseline")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="JSON lines file with \"message\" and \"agent\" fields")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--rounds", type=int, default=3, help="Times each message is routed for latency")
+    parser.add_argument("--generate", action="store_true", help="Regenerate the corpus from the templates first")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.01)
+    parser.add_argument("--latency-tolerance", type=float, default=3.0)
+    args = parser.parse_args(argv)
+    
+    if args.generate:
+        save_corpus(generate_corpus(), args.corpus)
+        print(f"📝 Wrote generated corpus to {args.corpus}")
+    
+    report = run_benchmark(load_corpus(args.corpus), rounds=args.rounds)
+    print(format_report(report))
+    
+    if args.update_baseline or not os.path.exists(args.baseline):
+        save_baseline(report, args.baseline)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+    
+    failures = check_regressions(report, load_baseline(args.baseline), args.accuracy_tolerance, args.latency_tolerance)
+    for failure in failures:
+        print(f"❌ Regression: {failure}")
+    if not failures:
+        print("✅ No regressions against the baseline")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# src/semantic_cache.py - Similarity-based lookup of cached FAQ searches
+import sys
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add data directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+from redis_manager import RedisManager
+from faq_semantic import HashedNgramEncoder
+
+class SemanticQueryCache:
+    """In-process vector index of cached FAQ queries
+    
+    Maps a new query to the Redis cache key of a previously cached query whose
+    vector lies within max_distance (cosine distance). The index holds at most
+    max_entries queries in a fixed NumPy matrix; slots expire together with
+    their Redis entries, and the least recently used slot is reused when full.
+    """
+    
+    def __init__(self, redis_manager: RedisManager, max_distance: float = 0.25, max_entries: int = 1000,
+                 encoder: Optional[HashedNgramEncoder] = None):
+        self.redis = redis_manager
+        self.encoder = encoder or HashedNgramEncoder()
+        self.min_similarity = 1.0 - max_distance
+        self.max_entries = max_entries
+        
+        self.vectors = np.zeros((max_entries, self.encoder.dim), dtype=np.float32)
+        self.expires_at = np.zeros(max_entries, dtype=np.float64)
+        self.last_used = np.zeros(max_entries, dtype=np.float64)
+        self.slot_keys: List[Optional[str]] = [None] * max_entries
+        self.key_slots: Dict[str, int] = {}
+        
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _free_slot(self, slot: int) -> None:
+        """Empty a slot"""
+        cache_key = self.slot_keys[slot]
+        if cache_key is not None:
+            self.key_slots.pop(cache_key, None)
+        self.slot_keys[slot] = None
+        self.expires_at[slot] = 0
+        self.last_used[slot] = 0
+    
+    def add(self, query: str, cache_key: str, ttl: int) -> None:
+        """Index a query whose results were just cached under cache_key for ttl seconds"""
+        vector = self.encoder.encode(query)
+        if not vector.any():
+            return
+        
+        now = time.time()
+        with self._lock:
+            slot = self.key_slots.get(cache_key)
+            if slot is None:
+                # Expired and empty slots have expires_at <= now; otherwise take the least recently used
+                expired = np.flatnonzero(self.expires_at <= now)
+                slot = int(expired[0]) if len(expired) else int(np.argmin(self.last_used))
+                self._free_slot(slot)
+            
+            self.vectors[slot] = vector
+            self.expires_at[slot] = now + ttl
+            self.last_used[slot] = now
+            self.slot_keys[slot] = cache_key
+            self.key_slots[cache_key] = slot
+    
+    def lookup(self, query: str) -> Optional[Tuple[str, float]]:
+        """Cache key and similarity of the closest live cached query, if within the threshold"""
+        vector = self.encoder.encode(query)
+        if not vector.any():
+            return None
+        
+        now = time.time()
+        with self._lock:
+            similarities = self.vectors @ vector
+            similarities[self.expires_at <= now] = -1.0
+            
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            if similarity < self.min_similarity:
+                self.misses += 1
+                return None
+            
+            self.last_used[slot] = now
+            self.hits += 1
+            return self.slot_keys[slot], similarity
+    
+    def remove(self, cache_key: str) -> None:
+        """Drop a cache key whose Redis entry no longer exists"""
+        with self._lock:
+            slot = self.key_slots.get(cache_key)
+            if slot is not None:
+                self._free_slot(slot)
+    
+    def clear(self) -> None:
+        """Drop every indexed query"""
+        with self._lock:
+            for slot in range(self.max_entries):
+                self._free_slot(slot)
+    
+    def load_from_redis(self) -> int:
+        """Index the FAQ searches already cached in Redis, keeping their remaining TTLs"""
+        cached_queries = self.redis.get_cached_faq_search_queries()
+        if not cached_queries:
+            return 0
+        
+        pipe = self.redis.redis_client.pipeline(transaction=False)
+        for cache_key in cached_queries:
+            pipe.ttl(f"cache:{cache_key}")
+        
+        loaded_count = 0
+        for (cache_key, query), ttl in zip(cached_queries.items(), pipe.execute()):
+            if ttl and ttl > 0:
+                self.add(query, cache_key, ttl)
+                loaded_count += 1
+        return loaded_count
+    
+    def get_stats(self) -> Dict[str, any]:
+        """Semantic cache size and hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": int((self.expires_at > time.time()).sum()),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
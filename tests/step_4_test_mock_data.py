@@ -2,13 +2,18 @@
 
 import sys
 import os
+import numpy as np
 
 # Add src and data to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from orders import get_order, get_sample_order_ids, get_order_status_summary, search_orders_by_email
-from faq import search_faqs, get_best_faq_answer, get_random_faq
+from orders import get_order, get_sample_order_ids, get_order_status_summary, search_orders_by_email, search_orders_by_email_page
+from faq import search_faqs, search_faqs_batch, semantic_search, get_best_faq_answer, get_random_faq, faq_db
+from faq import FAQDatabase
+from faq_semantic import HashedNgramEncoder, RandomProjectionLSH
+from text_utils import stem, canonicalize_query
+from keyword_matcher import KeywordMatcher
 
 def test_order_operations():
     """Test order database operations"""
@@ -36,6 +41,13 @@ def test_order_operations():
     orders = search_orders_by_email(email)
     assert len(orders) >= 1
     print(f"✅ Found {len(orders)} orders for {email}")
+    
+    # Test paginated email search
+    page = search_orders_by_email_page(email, cursor=0, limit=1)
+    assert page["orders"] == orders[:1]
+    assert page["total"] == len(orders)
+    assert page["next_cursor"] == (1 if len(orders) > 1 else None)
+    print(f"✅ Paginated search returned {len(page['orders'])} of {page['total']} orders")
 
 def test_faq_operations():
     """Test FAQ database operations"""
@@ -59,6 +71,221 @@ def test_faq_operations():
         assert best_answer is not None
         print(f"   Best answer: {best_answer[:80]}...")
 
+def test_faq_ranking():
+    """Test that BM25 ranking puts the obvious FAQ first"""
+    print("\n🏆 Testing FAQ Ranking...")
+    
+    expected_top = {
+        "What's your return policy?": "return_policy",
+        "How can I contact customer support?": "customer_support",
+        "forgot my password": "account_issues",
+        "do you do bulk discounts": "bulk_orders"
+    }
+    
+    for query, faq_id in expected_top.items():
+        results = search_faqs(query)
+        assert results[0][0] == faq_id, f"'{query}' ranked {results[0][0]} first"
+        assert all(isinstance(score, float) for _, _, score in results)
+        assert [score for _, _, score in results] == sorted([score for _, _, score in results], reverse=True)
+        print(f"✅ '{query}' → {faq_id} (score {results[0][2]})")
+
+def test_keyword_matcher():
+    """Test multi-keyword matching in a single pass over the query"""
+    print("\n🔤 Testing Keyword Matcher...")
+    
+    matcher = KeywordMatcher(["order", "cancel order", "free shipping", "shipping", "return"])
+    
+    # Overlapping keywords are all found, in order of appearance
+    found = matcher.find_all("Please cancel order 123, is there free shipping?")
+    assert found == ["cancel order", "order", "free shipping", "shipping"]
+    print(f"✅ Found overlapping keywords: {found}")
+    
+    # Keywords only match on word boundaries
+    assert matcher.find_all("It was returned and reordered") == []
+    print("✅ Partial words are not matched")
+
+def test_faq_batch_search():
+    """Test that batched FAQ search agrees with single searches"""
+    print("\n📦 Testing Batch FAQ Search...")
+    
+    queries = ["What's your return policy?", "contact support", "is there free shipping", "zzz nothing"]
+    batch_results = search_faqs_batch(queries)
+    assert len(batch_results) == len(queries)
+    
+    for query, results in zip(queries, batch_results):
+        single_results = search_faqs(query)
+        assert [score for _, _, score in results] == [score for _, _, score in single_results]
+        if single_results:
+            assert results[0][0] == single_results[0][0]
+        print(f"✅ '{query}' → {[faq_id for faq_id, _, _ in results]}")
+
+def test_semantic_search():
+    """Test paraphrase matching with hashed n-gram vectors"""
+    print("\n🧭 Testing Semantic FAQ Search...")
+    
+    paraphrases = {
+        "how do I send something back": "return_policy",
+        "can I talk to a real person": "customer_support",
+        "my laptop stopped working": "warranty"
+    }
+    
+    for query, faq_id in paraphrases.items():
+        assert semantic_search(query)[0][0] == faq_id
+        assert search_faqs(query)[0][0] == faq_id
+        print(f"✅ '{query}' → {faq_id}")
+    
+    # Vectors are stable and normalized
+    encoder = HashedNgramEncoder()
+    vector = encoder.encode("return policy")
+    assert (vector == encoder.encode("return policy")).all()
+    assert abs(float(vector @ vector) - 1.0) < 1e-5
+    
+    # LSH candidates find the nearest neighbour without scanning everything
+    texts = [faq["question"] for faq in faq_db.faqs.values()]
+    lsh = RandomProjectionLSH(encoder.dim, exact_below=0)
+    lsh.add(encoder.encode_batch(texts))
+    query_vector = encoder.encode(texts[3])
+    assert 3 in lsh.candidates(query_vector)
+    assert lsh.search(query_vector, top_k=1)[0][0] == 3
+    print("✅ LSH index returns the exact match")
+    
+    # Signatures grow with the index, so candidates stay a small share of it
+    assert RandomProjectionLSH.planes_for(100) == RandomProjectionLSH.MIN_PLANES
+    assert RandomProjectionLSH.planes_for(20000) > RandomProjectionLSH.planes_for(2000)
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((4000, encoder.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    large_lsh = RandomProjectionLSH(encoder.dim, expected_size=len(vectors))
+    large_lsh.add(vectors)
+    assert len(large_lsh.candidates(vectors[0])) < len(vectors) // 4
+    assert large_lsh.search(vectors[0], top_k=1)[0][0] == 0
+    print("✅ LSH candidates stay a small share of a large index")
+    
+    # Confident lexical matches skip the semantic search
+    assert not faq_db.semantic_index.needs_bonus(faq_db.semantic_index.LEXICAL_CONFIDENT_SCORE)
+    assert faq_db.semantic_index.needs_bonus(0.0)
+
+def test_semantic_search_held_out():
+    """Test paraphrases that are not in the corpus, and the encoder's known recall limits"""
+    print("\n🧪 Testing Held-Out Paraphrases...")
+    
+    corpus_texts = {text.lower() for faq in faq_db.faqs.values()
+                    for text in [faq["question"], *faq["keywords"], *faq.get("examples", [])]}
+    
+    # Reworded queries that share at least one word (or word stem) with their FAQ
+    held_out = {
+        "I forgot my password": "account_issues",
+        "need to reach customer service": "customer_support",
+        "cancel what I just ordered": "order_cancellation",
+        "is the blue one out of stock": "product_availability",
+        "can I pay with paypal": "payment_methods",
+        "discount for large orders": "bulk_orders"
+    }
+    
+    for query, faq_id in held_out.items():
+        assert query.lower() not in corpus_texts
+        assert semantic_search(query)[0][0] == faq_id
+        assert search_faqs(query)[0][0] == faq_id
+        print(f"✅ '{query}' → {faq_id}")
+    
+    # Synonym-only paraphrases share no words with their FAQ, and hashed n-grams cannot bridge
+    # that gap: they stay below MIN_SIMILARITY and are not matched at all, rather than mismatched
+    for query in ["give back something I bought", "my headphones are faulty", "the charger died"]:
+        assert semantic_search(query) == []
+        print(f"✅ '{query}' → no semantic match (known limit)")
+
+def test_faq_reload():
+    """Test incremental FAQ corpus reloads"""
+    print("\n🔄 Testing FAQ Corpus Reload...")
+    
+    database = FAQDatabase()
+    original_index = database.index
+    faqs = {faq_id: dict(faq_data) for faq_id, faq_data in database.get_all_faqs().items()}
+    
+    faqs["return_policy"]["answer"] = "Returns are accepted within 60 days of delivery."
+    faqs["gift_cards"] = {
+        "question": "Do you sell gift cards?",
+        "answer": "Digital gift cards from $10 to $500 are available on our website.",
+        "keywords": ["gift card", "voucher"]
+    }
+    del faqs["bulk_orders"]
+    
+    changes = database.reload(faqs)
+    assert changes["added"] == ["gift_cards"]
+    assert changes["updated"] == ["return_policy"]
+    assert changes["removed"] == ["bulk_orders"]
+    assert changes["version"] == 2
+    
+    # New indexes were swapped in; the old ones were left untouched
+    assert database.index is not original_index
+    assert "bulk_orders" in original_index.doc_terms
+    assert "bulk_orders" not in database.index.doc_terms
+    
+    # Postings of terms the changed FAQs don't use are shared, not copied
+    changed = {"return_policy", "gift_cards", "bulk_orders"}
+    untouched = next(term for term, posting in original_index.postings.items() if changed.isdisjoint(posting))
+    assert database.index.postings[untouched] is original_index.postings[untouched]
+    
+    # Only the changed FAQs' vectors were re-hashed into the LSH tables
+    assert database.semantic_index.lsh.signatures.shape[1] == len(database.semantic_index.entry_faq_ids)
+    assert database.semantic_search("how do I send something back")[0][0] == "return_policy"
+    
+    assert "60 days" in database.search_faqs("return policy")[0][1]["answer"]
+    assert database.search_faqs("gift card voucher")[0][0] == "gift_cards"
+    assert all(faq_id != "bulk_orders" for faq_id, _, _ in database.search_faqs("bulk discounts"))
+    print(f"✅ Reloaded to v{changes['version']}: {changes['added']} added, {changes['updated']} updated, {changes['removed']} removed")
+    
+    # Reloading an identical corpus changes nothing
+    assert database.reload(faqs)["version"] == 2
+    print("✅ Unchanged corpus keeps its version")
+
+def test_query_canonicalization():
+    """Test that equivalent phrasings share a canonical form and cache key"""
+    print("\n🔑 Testing Query Canonicalization...")
+    
+    assert [stem(word) for word in ["returns", "returned", "returning"]] == ["return"] * 3
+    assert stem("shipping") == stem("shipped") == "ship"
+    assert stem("policies") == "policy"
+    
+    variants = ["What's your return policy?", "return policy", "whats ur return policy", "Policy... return!"]
+    assert {canonicalize_query(query) for query in variants} == {"policy return"}
+    assert len({faq_db.cache_key(query) for query in variants}) == 1
+    print(f"✅ {len(variants)} phrasings → '{canonicalize_query(variants[0])}'")
+    
+    # Same words but different keyword phrases keep separate keys
+    assert faq_db.cache_key("cancel order") != faq_db.cache_key("order cancel")
+    
+    # Queries with no content words fall back to their exact text
+    assert faq_db.cache_key("How are you?") != faq_db.cache_key("Who are you?")
+    print("✅ Phrase-sensitive and empty queries keep their own keys")
+
+def test_faq_answer_rendering():
+    """Test that rendered FAQ answers are precomputed and reused"""
+    print("\n📝 Testing FAQ Answer Rendering...")
+    
+    database = FAQDatabase()
+    snapshot = database._snapshot
+    assert set(snapshot.rendered_answers) == {(faq_id,) for faq_id in database.get_all_faqs()}
+    print(f"✅ {len(snapshot.rendered_answers)} single answers rendered at build time")
+    
+    results = database.search_faqs("return policy refund")
+    rendered = database.render_search_results(results)
+    assert rendered.startswith(f"**{results[0][1]['question']}**")
+    assert database.render_search_results(results) is rendered
+    assert database.render_search_results([]) is None
+    print("✅ Search results rendered once per result IDs")
+    
+    # A reload re-renders changed FAQs and keeps the rest
+    faqs = {faq_id: dict(faq_data) for faq_id, faq_data in database.get_all_faqs().items()}
+    faqs["return_policy"]["answer"] = "Returns are accepted within 60 days of delivery."
+    database.reload(faqs)
+    assert "60 days" in database._snapshot.rendered_answers[("return_policy",)]
+    assert database._snapshot.rendered_answers[("shipping_policy",)] is snapshot.rendered_answers[("shipping_policy",)]
+    print("✅ Reload re-rendered only the changed answer")
+    
+    # Same keywords, so the keyword automaton is reused
+    assert database.keyword_matcher is snapshot.keyword_matcher
+
 def test_performance_simulation():
     """Test that our mock data simulates realistic delays"""
     import time
@@ -88,6 +315,14 @@ def run_mock_data_tests():
     
     test_order_operations()
     test_faq_operations() 
+    test_faq_ranking()
+    test_keyword_matcher()
+    test_faq_batch_search()
+    test_semantic_search()
+    test_semantic_search_held_out()
+    test_faq_reload()
+    test_query_canonicalization()
+    test_faq_answer_rendering()
     test_performance_simulation()
     
     print("\n🎉 All mock data tests passed!")
@@ -2,15 +2,22 @@
 import sys
 import os
 import time
+import asyncio
 
 # Add src and data to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
 
 from redis_manager import RedisManager
+from config import Config
 from order_cache_manager import OrderCacheManager
 from faq_cache_manager import FAQCacheManager
-from orders import get_sample_order_ids
+from semantic_cache import SemanticQueryCache
+from order_change_feed import OrderChangeFeed
+from faq_corpus_watcher import FAQCorpusWatcher
+from faq import FAQDatabase
+from faq_source import FAQFileSource
+from orders import get_sample_order_ids, order_db, ORDER_STATUS_CHANGED
 
 def test_order_caching_performance():
     """Test order caching performance improvements"""
@@ -60,8 +67,7 @@ def test_faq_caching_performance():
     test_query = "return policy"
     
     # Clear any existing cache for this query
-    normalized_query = test_query.lower().strip()
-    cache_key = f"cache:faq_search:{hash(normalized_query)}"
+    cache_key = f"cache:{faq_cache.get_search_key(test_query)}"
     redis_manager.redis_client.delete(cache_key)
     
     # Test 1: First search (cache miss)
@@ -141,6 +147,243 @@ def test_cache_invalidation():
     assert cached_summary_after is None
     print(f"✅ Order {order_id} cache invalidated")
 
+def test_order_change_feed_invalidation():
+    """Test that order change events invalidate order, summary and email search caches"""
+    print("\n📣 Testing Order Change Feed...")
+    
+    redis_manager = RedisManager()
+    order_cache = OrderCacheManager(redis_manager)
+    feed = OrderChangeFeed(redis_manager, order_cache, group="test_order_change_feed")
+    feed.attach(order_db)
+    
+    order_id = get_sample_order_ids(1)[0]
+    order = order_cache.get_order(order_id)
+    email = order["customer_email"]
+    
+    # Warm every cache entry the change should touch
+    order_cache.get_order_status_summary(order_id)
+    order_cache.search_orders_by_email(email)
+    order_cache.search_orders_by_email_page(email, cursor=0, limit=2)
+    feed.process_pending()
+    
+    assert redis_manager.get_cached_order(order_id) is not None
+    assert redis_manager.cache_get(f"email_search:{email}") is not None
+    assert redis_manager.cache_get(f"email_search:{email}:0:2") is not None
+    
+    # Change the order and let the consumer apply the event
+    new_status = "delivered" if order["status"] != "delivered" else "returned"
+    order_db.update_order_status(order_id, new_status)
+    processed = feed.process_pending()
+    
+    assert processed >= 1
+    assert redis_manager.get_cached_order(order_id) is None
+    assert redis_manager.get_cached_order_summary(order_id) is None
+    assert redis_manager.cache_get(f"email_search:{email}") is None
+    assert redis_manager.cache_get(f"email_search:{email}:0:2") is None
+    assert not redis_manager.redis_client.exists(redis_manager.get_email_search_pages_key(email))
+    print(f"✅ Status change for {order_id} invalidated order, summary and email search caches")
+    
+    # The next lookup sees the new status
+    assert order_cache.get_order(order_id)["status"] == new_status
+    order_db.set_change_publisher(None)
+    print("✅ Fresh order data served after change")
+
+def test_order_change_feed_claims_abandoned_events():
+    """Test that events a crashed consumer never acknowledged are claimed and applied"""
+    print("\n♻️  Testing Abandoned Order Change Recovery...")
+    
+    redis_manager = RedisManager()
+    # A stream of its own, so no history from other tests is replayed
+    redis_manager.ORDER_CHANGES_STREAM = "test_order_changes_claim"
+    redis_manager.redis_client.delete(redis_manager.ORDER_CHANGES_STREAM)
+    
+    order_cache = OrderCacheManager(redis_manager)
+    group = "test_order_change_claim"
+    feed = OrderChangeFeed(redis_manager, order_cache, group=group, consumer="live_consumer", claim_idle_ms=0)
+    
+    order_ids = get_sample_order_ids(3)
+    for order_id in order_ids:
+        order_cache.get_order(order_id)
+        redis_manager.publish_order_change({"event_type": ORDER_STATUS_CHANGED, "order_id": order_id, "changes": {}})
+    
+    # A consumer reads the events and dies before acknowledging them
+    abandoned = redis_manager.read_order_changes(group, "crashed_consumer")
+    assert len(abandoned) == len(order_ids)
+    assert all(redis_manager.get_cached_order(order_id) is not None for order_id in order_ids)
+    
+    # Small batches: the claim scan continues from its cursor instead of restarting
+    claimed = 0
+    while True:
+        processed = feed.process_pending(count=2)
+        if not processed:
+            break
+        claimed += processed
+    
+    assert claimed == len(order_ids)
+    assert all(redis_manager.get_cached_order(order_id) is None for order_id in order_ids)
+    assert redis_manager.redis_client.xpending(redis_manager.ORDER_CHANGES_STREAM, group)["pending"] == 0
+    redis_manager.redis_client.delete(redis_manager.ORDER_CHANGES_STREAM)
+    print(f"✅ {claimed} abandoned events claimed and applied by {feed.consumer}")
+
+def test_customer_order_prefetch():
+    """Test that prefetching a customer's orders makes the first lookups cache hits"""
+    print("\n📥 Testing Customer Order Prefetch...")
+    
+    redis_manager = RedisManager()
+    order_cache = OrderCacheManager(redis_manager)
+    
+    order_id = get_sample_order_ids(1)[0]
+    email = order_db.orders[order_id]["customer_email"]
+    
+    # Start cold
+    order_cache.invalidate_order(order_id)
+    order_cache.invalidate_email_search(email)
+    
+    prefetched = order_cache.prefetch_customer_orders(email)
+    assert prefetched >= 1
+    
+    # The first page the order agent reads, the order and its summary are all served from cache now
+    assert redis_manager.cache_get(f"email_search:{email}:0:{Config.ORDER_PAGE_SIZE}") is not None
+    assert redis_manager.get_cached_order(order_id) is not None
+    assert redis_manager.get_cached_order_summary(order_id) is not None
+    
+    start_time = time.time()
+    order_cache.get_order_status_summary(order_id)
+    assert time.time() - start_time < 0.1
+    print(f"✅ Prefetched {prefetched} orders for {email}, first lookup is a cache hit")
+
+def test_async_backend_overlap():
+    """Test that async lookups overlap backend waits instead of serializing them"""
+    print("\n⚡ Testing Async Backend Access...")
+    
+    redis_manager = RedisManager()
+    order_cache = OrderCacheManager(redis_manager)
+    faq_cache = FAQCacheManager(redis_manager)
+    
+    order_ids = get_sample_order_ids(4)
+    for order_id in order_ids:
+        order_cache.invalidate_order(order_id)
+    
+    async def lookup_all():
+        return await asyncio.gather(
+            *(order_cache.aget_order(order_id) for order_id in order_ids),
+            faq_cache.asearch_faqs("warranty", use_cache=False)
+        )
+    
+    start_time = time.time()
+    results = asyncio.run(lookup_all())
+    elapsed = time.time() - start_time
+    
+    assert all(order is not None for order in results[:-1])
+    assert results[-1]
+    
+    # Four 0.5s order fetches plus a 0.2s FAQ search would take 2.2s serialized
+    assert elapsed < 1.0, f"Async lookups took {elapsed:.2f}s"
+    print(f"✅ {len(order_ids)} order fetches and 1 FAQ search overlapped in {elapsed:.2f}s")
+
+def test_async_faq_cache_nonblocking():
+    """Test that async FAQ searches keep their Redis round trips off the event loop"""
+    print("\n⏱️ Testing Non-Blocking Async FAQ Cache...")
+    
+    class SlowRedisManager(RedisManager):
+        """Redis with a slow link: every FAQ cache read and write takes 0.3s"""
+        
+        def get_cached_faq_searches(self, queries, query_keys, track=False):
+            time.sleep(0.3)
+            return super().get_cached_faq_searches(queries, query_keys, track=track)
+        
+        def cache_faq_search(self, query, query_key, results, ttl=3600):
+            time.sleep(0.3)
+            return super().cache_faq_search(query, query_key, results, ttl)
+    
+    redis_manager = SlowRedisManager()
+    faq_cache = FAQCacheManager(redis_manager, semantic_cache=SemanticQueryCache(redis_manager, max_entries=16))
+    queries = ["warranty coverage", "return policy"]
+    redis_manager.delete_faq_searches([faq_cache.get_search_key(query) for query in queries])
+    
+    async def search_while_ticking():
+        gaps = []
+        searches = asyncio.gather(*(faq_cache.asearch_faqs(query) for query in queries))
+        last_tick = time.time()
+        while not searches.done():
+            await asyncio.sleep(0.01)
+            gaps.append(time.time() - last_tick)
+            last_tick = time.time()
+        return await searches, max(gaps)
+    
+    # A miss (slow read, backend search, slow write) and then a hit (slow read) for each query
+    for _ in range(2):
+        results, longest_gap = asyncio.run(search_while_ticking())
+        assert all(results)
+        
+        # A Redis call on the loop would stall the ticker for the whole 0.3s
+        assert longest_gap < 0.2, f"Event loop blocked for {longest_gap:.2f}s"
+    
+    redis_manager.delete_faq_searches([faq_cache.get_search_key(query) for query in queries])
+    print(f"✅ Event loop stayed responsive, longest stall {longest_gap * 1000:.0f}ms")
+
+def test_order_cache_backend():
+    """Test that sync and async lookups both go to the injected order backend"""
+    print("\n🔌 Testing Injected Order Backend...")
+    
+    class StubOrderBackend:
+        def __init__(self):
+            self.calls = []
+        
+        def get_order(self, order_id):
+            self.calls.append(("get_order", order_id))
+            return {"order_id": order_id, "status": "shipped", "customer_email": "stub@example.com"}
+        
+        def search_orders_by_email_page(self, email, cursor=0, limit=5):
+            self.calls.append(("search_orders_by_email_page", email))
+            return {"orders": [], "total": 0, "next_cursor": None}
+    
+    redis_manager = RedisManager()
+    backend = StubOrderBackend()
+    order_cache = OrderCacheManager(redis_manager, backend=backend)
+    
+    assert order_cache.get_order("STUB1", use_cache=False)["status"] == "shipped"
+    assert order_cache.search_orders_by_email_page("stub@example.com", use_cache=False)["total"] == 0
+    
+    redis_manager.invalidate_order_cache("STUB2")
+    assert asyncio.run(order_cache.aget_order("STUB2"))["order_id"] == "STUB2"
+    assert asyncio.run(order_cache.aget_order("STUB2"))["order_id"] == "STUB2"
+    redis_manager.invalidate_order_cache("STUB2")
+    
+    # The second async lookup was a cache hit
+    assert backend.calls == [("get_order", "STUB1"), ("search_orders_by_email_page", "stub@example.com"),
+                             ("get_order", "STUB2")]
+    print(f"✅ {len(backend.calls)} backend calls, all through the injected backend")
+
+def test_order_field_cache():
+    """Test the hash-encoded order cache: partial reads and in-place patches"""
+    print("\n🧩 Testing Field-Level Order Cache...")
+    
+    redis_manager = RedisManager()
+    order_cache = OrderCacheManager(redis_manager, encoding="hash")
+    
+    order_id = get_sample_order_ids(1)[0]
+    order_cache.invalidate_order(order_id)
+    
+    # First read fills the hash, second read is a partial HMGET hit
+    order = order_cache.get_order(order_id)
+    status_fields = order_cache.get_order_status_fields(order_id)
+    assert status_fields == {field: order[field] for field in redis_manager.ORDER_STATUS_FIELDS}
+    assert redis_manager.get_cached_order_fields(order_id) == order
+    print(f"✅ Status fields for {order_id} read from hash: {status_fields}")
+    
+    # Patch one field without rewriting the entry
+    assert order_cache.patch_order_fields(order_id, {"status": "shipped", "tracking_number": "TRK000000001"})
+    patched = redis_manager.get_cached_order_fields(order_id, ["status", "tracking_number", "product"])
+    assert patched == {"status": "shipped", "tracking_number": "TRK000000001", "product": order["product"]}
+    print("✅ Patched status in place, other fields untouched")
+    
+    # Patching an order that isn't cached never creates a partial entry
+    order_cache.invalidate_order(order_id)
+    assert not order_cache.patch_order_fields(order_id, {"status": "delivered"})
+    assert redis_manager.get_cached_order_fields(order_id) is None
+    print("✅ Patch skipped for uncached order")
+
 def test_faq_preloading():
     """Test FAQ preloading functionality"""
     print("\n🔄 Testing FAQ Preloading...")
@@ -168,10 +411,303 @@ def test_faq_preloading():
     
     # Test that preloaded queries are now cached
     for query in common_queries:
-        cached_results = redis_manager.get_cached_faq_search(query)
+        cached_results = redis_manager.get_cached_faq_search(faq_cache.backend.cache_key(query))
         assert cached_results is not None
         print(f"✅ '{query}' is preloaded in cache")
 
+def test_faq_batch_search_caching():
+    """Test batched FAQ search with a shared cache round trip"""
+    print("\n📦 Testing Batch FAQ Search Caching...")
+    
+    redis_manager = RedisManager()
+    faq_cache = FAQCacheManager(redis_manager)
+    
+    queries = ["return policy", "warranty coverage", "return policy", "gift cards"]
+    for query in queries:
+        redis_manager.cache_delete(faq_cache.get_search_key(query))
+    
+    # First batch scores every distinct query and caches them
+    first_results = faq_cache.search_faqs_batch(queries)
+    assert len(first_results) == len(queries)
+    assert first_results[0] == first_results[2]
+    for query in set(queries):
+        assert redis_manager.get_cached_faq_search(faq_cache.backend.cache_key(query)) is not None
+    
+    # Second batch is served entirely from cache with identical results
+    start_time = time.time()
+    second_results = faq_cache.search_faqs_batch(queries)
+    cached_time = time.time() - start_time
+    
+    assert [[faq_id for faq_id, _, _ in results] for results in second_results] == \
+           [[faq_id for faq_id, _, _ in results] for results in first_results]
+    assert cached_time < 0.2
+    print(f"✅ Cached batch of {len(queries)} queries served in {cached_time:.3f}s")
+
+def test_faq_corpus_reload_invalidation():
+    """Test that a corpus reload only invalidates the cached searches it affects"""
+    import tempfile
+    
+    print("\n🔄 Testing FAQ Corpus Reload Invalidation...")
+    
+    redis_manager = RedisManager()
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = FAQFileSource(os.path.join(temp_dir, "faqs.json"))
+        source.save(FAQDatabase().get_all_faqs())
+        
+        database = FAQDatabase(source)
+        faq_cache = FAQCacheManager(redis_manager, backend=database)
+        watcher = FAQCorpusWatcher(faq_cache)
+        
+        queries = ["return policy refund", "payment methods paypal", "gift card voucher"]
+        for query in queries:
+            redis_manager.cache_delete(faq_cache.get_search_key(query))
+            faq_cache.search_faqs(query)
+        
+        # Cached searches are listed in a set, so reloads find them without a SCAN
+        cached_queries = redis_manager.get_cached_faq_search_queries()
+        assert {faq_cache.get_search_key(query): query for query in queries}.items() <= cached_queries.items()
+        redis_manager.cache_delete(faq_cache.get_search_key(queries[0]))
+        assert faq_cache.get_search_key(queries[0]) not in redis_manager.get_cached_faq_search_queries()
+        assert not redis_manager.redis_client.sismember(redis_manager.FAQ_SEARCH_KEYS_KEY, faq_cache.get_search_key(queries[0]))
+        faq_cache.search_faqs(queries[0])
+        
+        # Edit the return policy and add a new FAQ in the source file
+        faqs = source.load()
+        faqs["return_policy"]["answer"] = "Returns are accepted within 60 days of delivery."
+        faqs["gift_cards"] = {
+            "question": "Do you sell gift cards?",
+            "answer": "Digital gift cards from $10 to $500 are available on our website.",
+            "keywords": ["gift card", "voucher"]
+        }
+        time.sleep(0.01)
+        source.save(faqs)
+        
+        changes = watcher.check_once()
+        assert changes["updated"] == ["return_policy"] and changes["added"] == ["gift_cards"]
+        assert watcher.check_once() is None
+        
+        # Searches showing the old answer or missing the new FAQ were dropped; others kept
+        assert redis_manager.get_cached_faq_search(faq_cache.backend.cache_key("return policy refund")) is None
+        assert redis_manager.get_cached_faq_search(faq_cache.backend.cache_key("gift card voucher")) is None
+        assert redis_manager.get_cached_faq_search(faq_cache.backend.cache_key("payment methods paypal")) is not None
+        print(f"✅ Reload invalidated {changes['invalidated_searches']} of {len(queries)} cached searches")
+        
+        assert "60 days" in faq_cache.search_faqs("return policy refund")[0][1]["answer"]
+        print("✅ Fresh search returns the updated answer")
+        
+        # An edit that makes an FAQ newly match a cached search drops that search too
+        # (an existing keyword, so the query's cache key stays the same)
+        query = "voucher"
+        assert all(faq_id != "bulk_orders" for faq_id, _, _ in faq_cache.search_faqs(query))
+        faqs = source.load()
+        faqs["bulk_orders"]["keywords"].append("voucher")
+        time.sleep(0.01)
+        source.save(faqs)
+        
+        changes = watcher.check_once()
+        assert changes["updated"] == ["bulk_orders"]
+        assert redis_manager.get_cached_faq_search(faq_cache.backend.cache_key(query)) is None
+        assert "bulk_orders" in [faq_id for faq_id, _, _ in faq_cache.search_faqs(query)]
+        print("✅ Edited FAQ that newly matches a cached search invalidated it")
+
+def test_faq_query_canonical_caching():
+    """Test that equivalent phrasings hit the same cached FAQ search"""
+    print("\n🔑 Testing Canonical FAQ Cache Keys...")
+    
+    redis_manager = RedisManager()
+    faq_cache = FAQCacheManager(redis_manager)
+    
+    variants = ["What's your return policy?", "return policy", "whats ur return policy"]
+    redis_manager.cache_delete(faq_cache.get_search_key(variants[0]))
+    redis_manager.redis_client.delete(redis_manager.FAQ_QUERY_COLLAPSE_KEY, redis_manager.get_faq_query_variants_key(faq_cache.backend.cache_key(variants[0])))
+    
+    first_results = faq_cache.search_faqs(variants[0])
+    
+    for query in variants[1:]:
+        start_time = time.time()
+        results = faq_cache.search_faqs(query)
+        assert time.time() - start_time < 0.2  # Served from cache
+        assert results == first_results
+    print(f"✅ {len(variants) - 1} rephrasings served from the first query's cache entry")
+    
+    stats = faq_cache.get_query_collapse_stats()
+    assert stats["top_keys"][0]["variants"] == len(variants)
+    print(f"✅ Collapse stats: {stats['raw_variants']} phrasings over {stats['cache_keys']} keys")
+
+def test_faq_semantic_cache():
+    """Test that near-duplicate queries reuse a cached FAQ search"""
+    print("\n🧠 Testing Semantic FAQ Cache...")
+    
+    redis_manager = RedisManager()
+    semantic_cache = SemanticQueryCache(redis_manager, max_distance=0.25, max_entries=2)
+    faq_cache = FAQCacheManager(redis_manager, semantic_cache=semantic_cache)
+    
+    queries = ["how do I return an item", "how do I return an item I bought", "track my order", "cancel my order"]
+    for query in queries:
+        redis_manager.cache_delete(faq_cache.get_search_key(query))
+    
+    first_results = faq_cache.search_faqs(queries[0])
+    
+    # Different cache key, but close enough to reuse the first query's results
+    start_time = time.time()
+    assert faq_cache.search_faqs(queries[1]) == first_results
+    assert time.time() - start_time < 0.2
+    print("✅ Near-duplicate query served from the semantic cache")
+    
+    # A different intent must not borrow another query's results
+    faq_cache.search_faqs(queries[2])
+    assert semantic_cache.lookup(queries[3]) is None
+    print("✅ Different intent misses the semantic cache")
+    
+    # Full index: the least recently used query is evicted
+    faq_cache.search_faqs(queries[3])
+    assert semantic_cache.lookup(queries[0]) is None
+    assert semantic_cache.lookup(queries[3])[0] == faq_cache.get_search_key(queries[3])
+    print("✅ Least recently used query evicted when the index is full")
+    
+    # Entries deleted from Redis are dropped from the index on lookup
+    redis_manager.cache_delete(faq_cache.get_search_key(queries[3]))
+    faq_cache.search_faqs("cancel my order now")
+    assert faq_cache.get_search_key(queries[3]) not in semantic_cache.key_slots
+    print(f"✅ Stale entries dropped: {semantic_cache.get_stats()}")
+
+def test_faq_semantic_cache_after_reload():
+    """Test that a reload changing the keyword vocabulary leaves no stale semantic matches"""
+    print("\n🧠 Testing Semantic FAQ Cache After Reload...")
+    
+    redis_manager = RedisManager()
+    database = FAQDatabase()
+    semantic_cache = SemanticQueryCache(redis_manager, max_distance=0.25, max_entries=16)
+    faq_cache = FAQCacheManager(redis_manager, backend=database, semantic_cache=semantic_cache)
+    
+    query, other_query = "gift cards", "track my order"
+    for cached_query in (query, other_query):
+        redis_manager.cache_delete(faq_cache.get_search_key(cached_query))
+    assert all(faq_id != "bulk_orders" for faq_id, _, _ in faq_cache.search_faqs(query))
+    faq_cache.search_faqs(other_query)
+    assert semantic_cache.lookup(query) is not None
+    
+    # A new keyword phrase changes the query's cache key
+    faqs = {faq_id: dict(faq_data) for faq_id, faq_data in database.get_all_faqs().items()}
+    faqs["bulk_orders"]["keywords"] = faqs["bulk_orders"]["keywords"] + ["gift cards"]
+    faq_cache.reload_corpus(faqs)
+    
+    # Any query's key may have changed, so even unaffected searches are no longer matched semantically
+    assert semantic_cache.lookup(query) is None
+    assert semantic_cache.lookup(other_query) is None
+    assert "bulk_orders" in [faq_id for faq_id, _, _ in faq_cache.search_faqs(query)]
+    print("✅ Reload cleared semantic matches that pointed at old cache keys")
+
+def test_faq_rendered_answer_cache():
+    """Test that repeated FAQ tool calls skip searching and formatting"""
+    print("\n📝 Testing Rendered FAQ Answer Cache...")
+    
+    redis_manager = RedisManager()
+    database = FAQDatabase()
+    faq_cache = FAQCacheManager(redis_manager, backend=database)
+    
+    searches = []
+    search_faqs = faq_cache.search_faqs
+    faq_cache.search_faqs = lambda query: searches.append(query) or search_faqs(query)
+    
+    first = faq_cache.render_search_answer("What's your return policy?")
+    assert faq_cache.render_search_answer("return policy") is first
+    assert searches == ["What's your return policy?"]
+    print("✅ Equivalent query served the rendered answer without searching")
+    
+    # Rendered hits still count towards popularity
+    popularity_key = redis_manager.get_faq_popularity_key(redis_manager._faq_popularity_epoch(time.time())[0])
+    cache_key = faq_cache.backend.cache_key("return policy")
+    score_before = redis_manager.redis_client.zscore(popularity_key, cache_key) or 0
+    for _ in range(5):
+        faq_cache.render_search_answer("return policy")
+    # Each search adds a weight of at least 1
+    assert redis_manager.redis_client.zscore(popularity_key, cache_key) >= score_before + 5
+    print("✅ Rendered hits recorded for popularity")
+    
+    # A corpus change invalidates rendered answers
+    original_faqs = database.get_all_faqs()
+    faqs = {faq_id: dict(faq_data) for faq_id, faq_data in original_faqs.items()}
+    faqs["return_policy"]["answer"] = "Returns are accepted within 60 days of delivery."
+    faq_cache.reload_corpus(faqs)
+    assert "60 days" in faq_cache.render_search_answer("return policy")
+    assert len(searches) == 2
+    print("✅ Corpus reload re-rendered the answer")
+    
+    # Drop the edited answer from the shared Redis cache
+    faq_cache.reload_corpus(original_faqs)
+
+def test_faq_popularity_preload():
+    """Test decayed FAQ popularity tracking and preloading the top queries"""
+    print("\n🔥 Testing FAQ Popularity Preload...")
+    
+    redis_manager = RedisManager()
+    faq_cache = FAQCacheManager(redis_manager)
+    
+    # Far-future timestamps keep these epochs apart from real traffic
+    half_life = redis_manager.config.FAQ_POPULARITY_HALF_LIFE
+    epoch, epoch_start = redis_manager._faq_popularity_epoch(4_000_000_000)
+    for key in [redis_manager.get_faq_popularity_key(epoch), redis_manager.get_faq_popularity_key(epoch + 1)]:
+        redis_manager.redis_client.delete(key, f"{key}:rebased")
+    
+    # Fewer but more recent searches outrank older ones
+    redis_manager.record_faq_popularity(["warranty information"] * 3, [faq_cache.backend.cache_key("warranty information")] * 3,
+                                       now=epoch_start + 1)
+    redis_manager.record_faq_popularity(["How do I track my order?"] * 2, [faq_cache.backend.cache_key("How do I track my order?")] * 2,
+                                       now=epoch_start + 3 * half_life)
+    popular = redis_manager.get_popular_faq_queries(2, now=epoch_start + 3 * half_life)
+    assert popular == ["How do I track my order?", "warranty information"]
+    print(f"✅ Decayed ranking: {popular}")
+    
+    # A new epoch carries the ranking over with rebased scores
+    next_start = epoch_start + half_life * redis_manager.FAQ_POPULARITY_EPOCH_HALF_LIVES
+    assert redis_manager.get_popular_faq_queries(2, now=next_start) == popular
+    assert not redis_manager.redis_client.exists(redis_manager.get_faq_popularity_key(epoch))
+    assert redis_manager.redis_client.zscore(redis_manager.get_faq_popularity_key(epoch + 1),
+                                             faq_cache.backend.cache_key(popular[0])) < 1
+    redis_manager.redis_client.delete(redis_manager.get_faq_popularity_key(epoch + 1))
+    print("✅ Scores rebased into the next epoch")
+    
+    # Writes trim the set and the query hash back to the cap once they outgrow it by the slack
+    redis_manager.FAQ_POPULARITY_MAX_KEYS, redis_manager.FAQ_POPULARITY_TRIM_SLACK = 5, 2
+    capped_key = redis_manager.get_faq_popularity_key(epoch + 2)
+    redis_manager.redis_client.delete(capped_key)
+    redis_manager.redis_client.set(f"{capped_key}:rebased", 1)
+    query_keys = [f"popularity cap test {number}" for number in range(10)]
+    for number, query_key in enumerate(query_keys):
+        redis_manager.record_faq_popularity([query_key] * (number + 1), [query_key] * (number + 1),
+                                            now=next_start + half_life * redis_manager.FAQ_POPULARITY_EPOCH_HALF_LIVES)
+    assert redis_manager.redis_client.zrange(capped_key, 0, -1) == query_keys[3:]
+    assert redis_manager.redis_client.hmget(redis_manager.FAQ_POPULARITY_QUERIES_KEY, query_keys[:3]) == [None] * 3
+    assert redis_manager.redis_client.ttl(redis_manager.FAQ_POPULARITY_QUERIES_KEY) > 0
+    redis_manager.redis_client.hdel(redis_manager.FAQ_POPULARITY_QUERIES_KEY, *query_keys)
+    redis_manager.redis_client.delete(capped_key, f"{capped_key}:rebased")
+    del redis_manager.FAQ_POPULARITY_MAX_KEYS, redis_manager.FAQ_POPULARITY_TRIM_SLACK
+    print("✅ Popularity set and queries capped on write")
+    
+    # Preloading checks with one MGET, writes in one pipeline and is not counted as traffic
+    queries = ["gift wrapping options", "international shipping rates", "warranty information"]
+    for query in queries:
+        redis_manager.cache_delete(faq_cache.get_search_key(query))
+    assert faq_cache.preload_common_faqs(queries) == len(queries)
+    assert all(redis_manager.get_cached_faq_searches(queries, [faq_cache.backend.cache_key(query) for query in queries]))
+    assert faq_cache.preload_common_faqs(queries) == 0
+    print("✅ Preload skipped already cached queries")
+    
+    # Cache hits are counted as traffic, recorded in the same pipeline as the read
+    popularity_key = redis_manager.get_faq_popularity_key(redis_manager._faq_popularity_epoch(time.time())[0])
+    cache_key = faq_cache.backend.cache_key(queries[0])
+    score_before = redis_manager.redis_client.zscore(popularity_key, cache_key) or 0
+    assert faq_cache.search_faqs(queries[0]) == redis_manager.get_cached_faq_search(faq_cache.backend.cache_key(queries[0]))
+    assert redis_manager.redis_client.zscore(popularity_key, cache_key) > score_before
+    print("✅ Cache hits recorded with the cache read")
+    
+    preload_queries = faq_cache.get_preload_queries(5)
+    assert len(preload_queries) == 5
+    assert len({faq_cache.get_search_key(query) for query in preload_queries}) == 5
+    print(f"✅ Preload list: {preload_queries}")
+
 def test_faq_tuple_handling():
     """STEP 5 FIX: Specific test for FAQ tuple/list handling"""
     print("\n🔧 Testing FAQ Tuple/List Handling...")
@@ -182,8 +718,7 @@ def test_faq_tuple_handling():
     test_query = "warranty information"
     
     # Clear cache
-    normalized_query = test_query.lower().strip()
-    cache_key = f"cache:faq_search:{hash(normalized_query)}"
+    cache_key = f"cache:{faq_cache.get_search_key(test_query)}"
     redis_manager.redis_client.delete(cache_key)
     
     # First search - should return tuples
@@ -236,7 +771,21 @@ def run_integration_tests():
         test_faq_tuple_handling()  # STEP 5 FIX: Test tuple handling first
         faq_perf = test_faq_caching_performance()
         test_cache_invalidation()
+        test_order_change_feed_invalidation()
+        test_order_change_feed_claims_abandoned_events()
+        test_customer_order_prefetch()
+        test_async_backend_overlap()
+        test_async_faq_cache_nonblocking()
+        test_order_cache_backend()
+        test_order_field_cache()
         test_faq_preloading()
+        test_faq_batch_search_caching()
+        test_faq_corpus_reload_invalidation()
+        test_faq_query_canonical_caching()
+        test_faq_semantic_cache()
+        test_faq_semantic_cache_after_reload()
+        test_faq_rendered_answer_cache()
+        test_faq_popularity_preload()
         test_redis_stats()
         
         print(f"\n🎉 All integration tests passed!")
@@ -244,6 +793,7 @@ def run_integration_tests():
         print(f"   Order lookups: {order_perf:.1f}% faster with Redis")
         print(f"   FAQ searches: {faq_perf:.1f}% faster with Redis")
         print(f"   Cache invalidation: ✅ Working")
+        print(f"   Order change feed: ✅ Working")
         print(f"   FAQ preloading: ✅ Working")
         print(f"   Tuple/List handling: ✅ Fixed")
         
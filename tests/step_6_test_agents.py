@@ -9,7 +9,14 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
 
 from redis_manager import RedisManager
 from agents import OrderLookupAgent, FAQAgent
-from agent_router import AgentRouter
+from agent_router import AgentRouter, RoutingScanner
+from intent_classifier import IntentClassifier, load_labelled_messages, rule_router_accuracy
+from llm_clients import LLMClientFactory
+from llm_cache import RedisLLMCache, install_llm_cache
+from response_cache import SemanticResponseCache
+from faq_cache_manager import FAQCacheManager
+from faq import FAQDatabase
+from main_router import CustomerSupportRouter
 from orders import get_sample_order_ids
 
 def test_order_agent():
@@ -123,6 +130,416 @@ def test_agent_router():
         print(f"   → Routed to: {agent} (confidence: {confidence:.2f})")
         print()
 
+def test_routing_scanner():
+    """Test that one scan finds every routing feature and scores it"""
+    print("\n🔎 Testing Routing Scanner...\n")
+    
+    scanner = RoutingScanner()
+    
+    features = scanner.scan("where is my order ord1001? the tracking number says shipped")
+    assert {"where_is_my_order", "order_id", "tracking_number", "kw_tracking", "kw_shipped", "q_is"} <= features
+    assert scanner.scores(features)["order"] == 1.0
+    
+    # Keywords match inside words; patterns need whole words
+    assert "kw_order" in scanner.scan("show my orders") and "order_status" not in scanner.scan("order statuses")
+    assert "email" in scanner.scan("orders for test@example.com")
+    assert scanner.scores(scanner.scan("hello there")) == {"order": 0.0, "faq": 0.0}
+    print("✅ Features and scores found in one pass")
+    
+    redis_manager = RedisManager()
+    router = AgentRouter(redis_manager)
+    session_id = "test_routing_scanner"
+    redis_manager.clear_conversation(session_id)
+    
+    breakdown = router.score_message("What is your return policy?", session_id)
+    assert (breakdown.agent, breakdown.confidence) == router.route_message("What is your return policy?", session_id)
+    assert breakdown.features[0] == "return_policy"
+    
+    explanation = router.get_routing_explanation("What is your return policy?", session_id)
+    assert "return_policy" in explanation
+    print(f"✅ Explanation reuses the breakdown: {breakdown.features}")
+
+def test_batch_routing():
+    """Test that batch routing matches routing one message at a time"""
+    print("\n📦 Testing Batch Routing...\n")
+    
+    redis_manager = RedisManager()
+    router = AgentRouter(redis_manager)
+    
+    sessions = ["test_batch_routing_orders", "test_batch_routing_policies", "test_batch_routing_new"]
+    for session_id in sessions:
+        redis_manager.clear_conversation(session_id)
+    redis_manager.add_message(sessions[0], "user", "Where is my order ORD1001?")
+    redis_manager.add_message(sessions[1], "user", "What is your refund policy?")
+    
+    messages = ["What's the status of order ORD1001?", "Can I get a refund?", "Is it shipped yet?",
+                "Show me orders for test@example.com", "hello", "How long is the warranty?"]
+    batch = [(message, session_id) for message in messages for session_id in sessions]
+    
+    start_time = time.time()
+    decisions = router.route_messages(batch)
+    batch_time = time.time() - start_time
+    
+    assert decisions == [router.route_message(message, session_id) for message, session_id in batch]
+    print(f"✅ {len(batch)} messages routed in {batch_time * 1000:.1f}ms, same decisions as one at a time")
+    
+    breakdowns = router.score_messages(batch)
+    assert [breakdown.features for breakdown in breakdowns] == [router.score_message(message, session_id).features
+                                                               for message, session_id in batch]
+    assert breakdowns[0].context_bias["order"] > 0 and router.route_messages([]) == []
+    print("✅ Batch breakdowns match single-message scoring")
+
+def test_routing_cache():
+    """Test that repeated messages reuse cached content scores but keep per-session context"""
+    print("\n🗃️ Testing Routing Cache...\n")
+    
+    redis_manager = RedisManager()
+    router = AgentRouter(redis_manager)
+    uncached = AgentRouter(redis_manager)
+    uncached.cache_size = 0
+    
+    sessions = ["test_routing_cache_orders", "test_routing_cache_new"]
+    for session_id in sessions:
+        redis_manager.clear_conversation(session_id)
+    redis_manager.add_message(sessions[0], "user", "Where is my order ORD1001?")
+    
+    variants = ["Is it shipped yet?", "is it  SHIPPED yet?", "  Is it shipped\tyet?  "]
+    for message in variants:
+        for session_id in sessions:
+            assert router.score_message(message, session_id) == uncached.score_message(message, session_id)
+    
+    stats = router.get_cache_stats()
+    assert stats["misses"] == 1 and stats["hits"] == 5 and stats["entries"] == 1
+    assert uncached.get_cache_stats()["entries"] == 0
+    
+    # Same cached content scores, different decisions once each session's context is applied
+    assert router.route_message(variants[0], sessions[0]) != router.route_message(variants[0], sessions[1])
+    print(f"✅ Case and whitespace variants share one entry: {stats}")
+    
+    router.cache_size = 2
+    for message in ["hello", "What is your return policy?", "hello", "Track ORD1002"]:
+        router.route_message(message, sessions[1])
+    assert list(router._score_cache) == ["hello", "track ord1002"]
+    print("✅ Least recently used messages are evicted")
+
+def test_session_context():
+    """Test that routing context comes from the session topic hash instead of the history"""
+    print("\n🧭 Testing Session Topic Context...\n")
+    
+    redis_manager = RedisManager()
+    router = AgentRouter(redis_manager)
+    session_id = "test_session_context"
+    redis_manager.clear_conversation(session_id)
+    assert redis_manager.get_session_context(session_id) is None
+    
+    redis_manager.add_message(session_id, "user", "Where is my order ORD1001?")
+    context = redis_manager.add_message(session_id, "assistant", "Your refund was issued.", agent="order_lookup")
+    assert context["last_agent"] == "order_lookup"
+    assert RedisManager.recent_topics(context) == 3
+    assert redis_manager.get_session_context(session_id)["topics"] == context["topics"]
+    
+    # Only the last two messages count, as with the old history-based bias
+    context = redis_manager.add_message(session_id, "user", "hello")
+    assert router._context_bias_from_session(context) == {"order": 0.0, "faq": 0.2}
+    assert context["last_agent"] == "order_lookup"
+    
+    # No history read when routing, and none at all when the caller passes the context
+    redis_manager.get_conversation_history = None
+    assert router.route_message("Is it shipped yet?", session_id) == router.route_message("Is it shipped yet?", session_id, context)
+    assert router.score_message("Is it shipped yet?", session_id, {}).context_bias == {"order": 0.0, "faq": 0.0}
+    print(f"✅ Context {redis_manager.get_session_context(session_id)} drives routing bias")
+    
+    assert redis_manager.clear_conversation(session_id)
+    assert redis_manager.get_session_context(session_id) is None
+    print("✅ Clearing the conversation drops its context")
+
+def test_intent_classifier():
+    """Test training, storing and routing with the intent classifier"""
+    import tempfile
+    
+    print("\n🧠 Testing Intent Classifier...\n")
+    
+    messages, labels = load_labelled_messages(os.path.join(os.path.dirname(__file__), '..', 'data', 'routing_examples.jsonl'))
+    
+    for model in ["logreg", "nb"]:
+        classifier = IntentClassifier.train(messages, labels, model=model)
+        assert classifier.accuracy(messages, labels) >= rule_router_accuracy(messages, labels)
+        print(f"✅ {model}: {classifier.accuracy(messages, labels):.0%} vs rules {rule_router_accuracy(messages, labels):.0%}")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "router_intent.npz")
+        classifier.save(path)
+        loaded = IntentClassifier.load(path)
+        print(f"✅ Model stored in {os.path.getsize(path)} bytes")
+    
+    assert loaded.labels == ["faq", "order_lookup"]
+    assert loaded.predict("Where is my parcel?")[0] == "order_lookup"
+    
+    start_time = time.time()
+    for _ in range(1000):
+        loaded.predict_proba("Has my package shipped yet?")
+    print(f"✅ Inference: {(time.time() - start_time) * 1000:.1f}µs per message")
+    
+    # The rules send this to FAQ for lack of order keywords; the classifier learned "package"
+    redis_manager = RedisManager()
+    router = AgentRouter(redis_manager, classifier=loaded)
+    session_id = "test_intent_classifier"
+    redis_manager.clear_conversation(session_id)
+    assert AgentRouter(redis_manager).route_message("Can you track my package?", session_id)[0] == "faq"
+    assert router.route_message("Can you track my package?", session_id)[0] == "order_lookup"
+    
+    batch = [(message, session_id) for message in messages[:10] + messages[-10:]]
+    assert router.route_messages(batch) == [router.route_message(message, session_id) for message, _ in batch]
+    print("✅ Router uses the classifier for single and batch routing")
+
+def start_llm_stand_in():
+    """Local OpenAI-compatible server that answers chat completions with a fixed reply
+    
+    When tools are offered and no tool has answered yet, it calls the first
+    tool with the last user message instead.
+    """
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class ChatCompletionHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so the client can reuse connections
+        
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            message = {"role": "assistant", "content": "Hello from the stand-in"}
+            if request.get("tools") and request["messages"][-1]["role"] != "tool":
+                user_message = [m["content"] for m in request["messages"] if m["role"] == "user"][-1]
+                message = {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": "call_test", "type": "function",
+                    "function": {"name": request["tools"][0]["function"]["name"],
+                                 "arguments": json.dumps({"__arg1": user_message})}
+                }]}
+            body = json.dumps({
+                "id": "chatcmpl-test", "object": "chat.completion", "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChatCompletionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_shared_llm_clients():
+    """Test that agents share chat models and one pooled HTTP connection"""
+    print("\n🔌 Testing Shared LLM Clients...\n")
+    
+    server = start_llm_stand_in()
+    factory = LLMClientFactory(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="sk-test")
+    response_cache = install_llm_cache(RedisManager())
+    
+    try:
+        model = factory.get_chat_model("gpt-3.5-turbo", temperature=0.1)
+        assert factory.get_chat_model("gpt-3.5-turbo", temperature=0.1) is model
+        assert factory.get_chat_model("gpt-3.5-turbo", temperature=0.7) is not model
+        
+        # Every call must reach the server, so skip the response cache
+        with response_cache.bypass():
+            for _ in range(5):
+                assert model.invoke("Hi").content == "Hello from the stand-in"
+            factory.get_chat_model("gpt-3.5-turbo", temperature=0.7).invoke("Hi")
+        
+        stats = factory.get_stats()
+        assert stats["requests"] == 6 and stats["errors"] == 0
+        assert stats["new_connections"] == 1 and stats["reused_connections"] == 5
+        assert stats["latency_ms"]["p50"] > 0
+        print(f"✅ Two models, one connection: {stats}")
+    finally:
+        factory.close()
+        server.shutdown()
+        server.server_close()
+    
+    # Agents built with the same settings share one chat model
+    redis_manager = RedisManager()
+    assert OrderLookupAgent(redis_manager).llm is FAQAgent(redis_manager).llm
+    print("✅ Agents share the chat model")
+
+def test_llm_response_cache():
+    """Test that repeated identical LLM requests are answered from Redis"""
+    print("\n💾 Testing LLM Response Cache...\n")
+    
+    redis_manager = RedisManager()
+    response_cache = install_llm_cache(redis_manager)
+    assert isinstance(response_cache, RedisLLMCache)
+    assert install_llm_cache(redis_manager) is response_cache
+    response_cache.clear()
+    
+    server = start_llm_stand_in()
+    factory = LLMClientFactory(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="sk-test")
+    
+    try:
+        model = factory.get_chat_model("gpt-3.5-turbo", temperature=0.1)
+        message = f"What is your return policy? {time.time()}"
+        
+        first = model.invoke(message)
+        assert factory.get_stats()["requests"] == 1
+        
+        # Same request again: no network call
+        assert model.invoke(message).content == first.content
+        assert factory.get_stats()["requests"] == 1
+        
+        # Different settings, messages or tools are separate entries
+        factory.get_chat_model("gpt-3.5-turbo", temperature=0.7).invoke(message)
+        model.invoke(message + "!")
+        tool = {"type": "function", "function": {"name": "lookup", "parameters": {"type": "object", "properties": {}}}}
+        model.bind(tools=[tool]).invoke(message)
+        assert factory.get_stats()["requests"] == 4
+        
+        with response_cache.bypass():
+            model.invoke(message)
+        assert factory.get_stats()["requests"] == 5
+        
+        stats = response_cache.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 4 and stats["entries"] == 4
+        print(f"✅ Repeated prompt served from Redis: {stats}")
+        
+        # Size limit: oldest entries are evicted
+        response_cache.clear()
+        small_cache = RedisLLMCache(redis_manager, ttl=60, max_entries=2)
+        for i in range(3):
+            small_cache.update(f"prompt {i}", "llm", [])
+        assert small_cache.lookup("prompt 0", "llm") is None
+        assert small_cache.lookup("prompt 2", "llm") == []
+        assert 0 < redis_manager.redis_client.ttl(small_cache.get_entry_key("prompt 2", "llm")) <= 60
+        assert small_cache.get_stats()["evictions"] == 1
+        print("✅ Oldest entries evicted beyond the size limit")
+    finally:
+        response_cache.clear()
+        factory.close()
+        server.shutdown()
+        server.server_close()
+
+def test_response_cache():
+    """Test that equivalent FAQ questions reuse a complete agent answer"""
+    print("\n🧠 Testing Semantic Response Cache...\n")
+    
+    redis_manager = RedisManager()
+    server = start_llm_stand_in()
+    factory = LLMClientFactory(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="sk-test")
+    
+    faq_agent = FAQAgent(redis_manager)
+    faq_agent.llm = factory.get_chat_model("gpt-3.5-turbo", temperature=0.1)
+    faq_agent._setup_agent()
+    faq_agent.response_cache.clear()
+    
+    try:
+        # Every agent run must reach the stand-in, so skip the exact-match LLM cache
+        with install_llm_cache(redis_manager).bypass():
+            run_id = int(time.time())
+            answer = faq_agent.process_message("What is your return policy?", f"response_cache_{run_id}_1")
+            assert answer == "Hello from the stand-in"
+            requests = factory.get_stats()["requests"]
+            assert requests == 2  # tool call, then the answer
+            assert faq_agent.response_cache.get_stats()["stores"] == 1
+            
+            # Equivalent wording in another session: no LLM call
+            assert faq_agent.process_message("whats your return policy", f"response_cache_{run_id}_2") == answer
+            assert factory.get_stats()["requests"] == requests
+            
+            # Order IDs and emails are never served from or stored in the cache
+            faq_agent.process_message("What is your return policy for ORD1001?", f"response_cache_{run_id}_3")
+            assert factory.get_stats()["requests"] == requests + 2
+            assert faq_agent.response_cache.get_stats()["rejected"] == 1
+            
+            # Follow-ups depend on the conversation, so they are not stored
+            session_id = f"response_cache_{run_id}_4"
+            redis_manager.add_message(session_id, "user", "Hi")
+            redis_manager.add_message(session_id, "assistant", "Hello")
+            faq_agent.process_message("Do you accept PayPal?", session_id)
+            assert faq_agent.response_cache.get_stats()["stores"] == 1
+        
+        stats = faq_agent.response_cache.get_stats()
+        assert stats["hits"] == 1
+        print(f"✅ Equivalent question answered from the cache: {stats}")
+    finally:
+        faq_agent.response_cache.clear()
+        factory.close()
+        server.shutdown()
+        server.server_close()
+    
+    # Sampled validation drops entries whose FAQs no longer match the question
+    faq_cache = FAQCacheManager(redis_manager, backend=FAQDatabase())
+    response_cache = SemanticResponseCache(redis_manager, faq_cache, validation_rate=1.0)
+    top_faq_id = faq_cache.search_faqs("What payment methods do you accept?")[0][0]
+    response_cache.store("What payment methods do you accept?", "We accept cards", [top_faq_id])
+    assert response_cache.lookup("Which payment methods do you accept?") == "We accept cards"
+    response_cache.store("How do I reset my password?", "Click 'Forgot password'", ["not-an-faq"])
+    assert response_cache.lookup("How do I reset my password?") is None
+    assert response_cache.get_stats()["validation_failures"] == 1
+    print("✅ Entry failing validation dropped")
+    
+    # A corpus change moves to a new namespace
+    faqs = dict(faq_cache.backend.get_all_faqs())
+    faqs[top_faq_id] = dict(faqs[top_faq_id], answer="Cash only")
+    faq_cache.reload_corpus(faqs)
+    assert response_cache.lookup("What payment methods do you accept?") is None
+    assert response_cache.get_stats()["invalidated"] == 1
+    response_cache.store("What payment methods do you accept?", "Cash only", [top_faq_id])
+    
+    # Another process still on the original corpus (also at its first version) keeps its own answers
+    other_cache = SemanticResponseCache(redis_manager, FAQCacheManager(redis_manager, backend=FAQDatabase()),
+                                        validation_rate=0.0)
+    assert other_cache.corpus_digest != response_cache.corpus_digest
+    assert other_cache.lookup("What payment methods do you accept?") == "We accept cards"
+    assert response_cache.lookup("What payment methods do you accept?") == "Cash only"
+    response_cache.clear()
+    print("✅ Entries keyed by corpus contents, not by a per-process version")
+
+def test_response_cache_through_router():
+    """Test that opening FAQ questions in routed sessions are cached despite the welcome message"""
+    print("\n🧭 Testing Response Cache Through the Router...\n")
+    
+    server = start_llm_stand_in()
+    factory = LLMClientFactory(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="sk-test")
+    
+    router = CustomerSupportRouter(warmup="lazy")
+    router.config.FAST_PATH_ENABLED = False  # the agent must answer
+    faq_agent = router.faq_agent
+    faq_agent.llm = factory.get_chat_model("gpt-3.5-turbo", temperature=0.1)
+    faq_agent._setup_agent()
+    faq_agent.response_cache.clear()
+    stores = faq_agent.response_cache.get_stats()["stores"]
+    
+    try:
+        with install_llm_cache(router.redis).bypass():
+            run_id = int(time.time())
+            session_id = f"routed_response_cache_{run_id}"
+            router.start_session(session_id)
+            result = router.process_message(session_id, "How long do refunds take?")
+            assert result["agent_used"] == "faq"
+            assert faq_agent.response_cache.get_stats()["stores"] == stores + 1
+            
+            # A later question in the same session follows earlier turns, so it is not stored
+            router.process_message(session_id, "Do you accept PayPal?")
+            assert faq_agent.response_cache.get_stats()["stores"] == stores + 1
+            
+            # The opening question of another session is answered from the cache
+            requests = factory.get_stats()["requests"]
+            other_session_id = f"routed_response_cache_{run_id}_other"
+            router.start_session(other_session_id)
+            assert router.process_message(other_session_id, "how long do refunds take")["response"] == result["response"]
+            assert factory.get_stats()["requests"] == requests
+        print(f"✅ Routed opening question cached: {faq_agent.response_cache.get_stats()}")
+    finally:
+        faq_agent.response_cache.clear()
+        factory.close()
+        server.shutdown()
+        server.server_close()
+
 def test_conversation_flow():
     """Test a complete conversation flow with both agents"""
     print("\n💬 Testing Complete Conversation Flow...\n")
@@ -174,6 +591,15 @@ def run_agent_tests():
         test_order_agent()
         test_faq_agent()
         test_agent_router()
+        test_routing_scanner()
+        test_batch_routing()
+        test_routing_cache()
+        test_session_context()
+        test_intent_classifier()
+        test_shared_llm_clients()
+        test_llm_response_cache()
+        test_response_cache()
+        test_response_cache_through_router()
         test_conversation_flow()
         
         print("\n🎉 All agent tests completed!")
@@ -7,6 +7,7 @@ import time
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from main_router import CustomerSupportRouter
+from agent_registry import AgentRegistry
 from main import CustomerSupportSystem
 
 def test_session_management():
@@ -156,6 +157,87 @@ def test_agent_routing_integration():
     assert stats["agent_switches"] >= 1  # Should have switched between agents
     print(f"✅ Agent switching tracked: {stats['agent_switches']} switches")
 
+def test_fast_path():
+    """Test that unambiguous requests are answered with one tool call instead of the LLM agent"""
+    print("\n⚡ Testing Fast Path...\n")
+    
+    router = CustomerSupportRouter()
+    session_id = "test_fast_path"
+    router.start_session(session_id)
+    
+    order_result = router.process_message(session_id, "What's the status of ORD1001?")
+    assert order_result["fast_path"] and order_result["agent_used"] == "order_lookup"
+    assert "Order Information for ORD1001" in order_result["response"]
+    
+    faq_result = router.process_message(session_id, "What is your return policy?")
+    assert faq_result["fast_path"] and faq_result["agent_used"] == "faq"
+    assert faq_result["response"] == router.faq_agent.faq_cache.render_search_answer("What is your return policy?")
+    print(f"✅ Fast path answers in {order_result['processing_time']:.3f}s and {faq_result['processing_time']:.3f}s")
+    
+    # Several order IDs, or a weak FAQ match, still need the agent
+    assert not router.process_message(session_id, "Check orders ORD1001 and ORD1002")["fast_path"]
+    
+    # So do requests to act on an order rather than look it up
+    for message in ["Can I cancel order ORD1001?", "Please change the shipping address on ORD1001",
+                    "I want to return ORD1001", "ORD1001 arrived damaged"]:
+        result = router.process_message(session_id, message)
+        assert not result["fast_path"], message
+    
+    order_agent = router.order_agent
+    for message in ["ORD1001", "Where is ORD1001?", "Has ORD1001 shipped yet?", "When will order ORD1001 arrive?"]:
+        assert order_agent.is_status_request(message), message
+    assert not router.process_message(session_id, "Can I get a refund?")["fast_path"]
+    
+    looked_up = router.redis.get_agent_state(session_id, "order_lookup")["looked_up_orders"]
+    assert looked_up[0] == "ORD1001"
+    
+    router.config.FAST_PATH_ENABLED = False
+    assert not router.process_message(session_id, "What's the status of ORD1001?")["fast_path"]
+    print("✅ Ambiguous requests fall back to the agent")
+
+def test_lazy_agents():
+    """Test that agents are only built when a message needs them"""
+    import threading
+    
+    print("\n💤 Testing Lazy Agent Registry...\n")
+    
+    builds = []
+    registry = AgentRegistry()
+    registry.register("slow", lambda: builds.append(time.sleep(0.05)) or object())
+    threads = [threading.Thread(target=registry.get, args=("slow",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1 and registry.get("missing") is None
+    print("✅ Concurrent first uses share one instance")
+    
+    start_time = time.time()
+    router = CustomerSupportRouter(warmup="lazy")
+    startup_time = time.time() - start_time
+    session_id = "test_lazy_agents"
+    
+    # Background workers wait for the router to serve a session
+    assert router.order_feed._thread is None
+    router.start_session(session_id)
+    assert router.order_feed._thread.is_alive()
+    
+    # Commands and session handling never build an agent
+    for command in ["/help", "/status", "/history"]:
+        router.process_message(session_id, command)
+    assert router.agents.get_status() == {"order_lookup": False, "faq": False}
+    print(f"✅ Router ready in {startup_time:.2f}s with no agents built")
+    
+    result = router.process_message(session_id, "What's the status of ORD1001?")
+    assert result["agent_used"] == "order_lookup"
+    assert router.agents.get_status() == {"order_lookup": True, "faq": False}
+    assert router.faq_agent.faq_cache is router.faq_cache
+    router.order_feed.stop()
+    
+    background_router = CustomerSupportRouter(warmup="background")
+    assert background_router.agents.wait_ready(timeout=60)
+    print("✅ Agents built on first use or by the background warmup")
+
 def test_conversation_flow():
     """Test complete conversation flow with context"""
     print("\n💬 Testing Complete Conversation Flow...\n")
@@ -349,6 +431,8 @@ def run_router_tests():
         test_command_handling()
         test_input_validation()
         test_agent_routing_integration()
+        test_fast_path()
+        test_lazy_agents()
         test_conversation_flow()
         test_error_handling()
         test_performance_metrics()